@@ -38,6 +38,10 @@ def _split_env_list(raw_value, default):
     return [item.strip() for item in raw_value.split(',') if item.strip()]
 
 
+def _optional_int(raw_value):
+    return int(raw_value) if raw_value not in (None, '') else None
+
+
 ALLOWED_HOSTS = _split_env_list(
     os.environ.get('DJANGO_ALLOWED_HOSTS'),
     ["localhost", "127.0.0.1"],
@@ -54,13 +58,15 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'equipment',
 ]
 
 MIDDLEWARE = [
+    'equipment.metrics.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'equipment.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -140,18 +146,68 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = Path(os.environ.get('DJANGO_MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Dataset retention (see equipment/retention.py); unset disables a policy.
+DATASET_RETENTION_MAX_COUNT = _optional_int(os.environ.get('DATASET_RETENTION_MAX_COUNT', '5'))
+DATASET_RETENTION_MAX_AGE_DAYS = _optional_int(os.environ.get('DATASET_RETENTION_MAX_AGE_DAYS'))
+DATASET_RETENTION_MAX_TOTAL_BYTES = _optional_int(os.environ.get('DATASET_RETENTION_MAX_TOTAL_BYTES'))
+
+# Hand report downloads to the front proxy instead of streaming them through
+# Django: '' (serve from Django), 'x-accel' (nginx) or 'x-sendfile'.
+# With 'x-accel', REPORT_OFFLOAD_PREFIX must be an `internal` nginx location
+# aliased to MEDIA_ROOT.
+REPORT_OFFLOAD = os.environ.get('REPORT_OFFLOAD', '').lower()
+REPORT_OFFLOAD_PREFIX = os.environ.get('REPORT_OFFLOAD_PREFIX', '/protected-media/')
+
+# Hash uploads as they stream in so repeated CSVs can be deduplicated.
+FILE_UPLOAD_HANDLERS = [
+    'equipment.uploadhandlers.HashingMemoryFileUploadHandler',
+    'equipment.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Resumable uploads (/api/uploads/): largest single PUT, and how long an
+# untouched session is kept before the worker discards it.
+UPLOAD_SESSION_MAX_CHUNK_BYTES = int(os.environ.get('UPLOAD_SESSION_MAX_CHUNK_BYTES', str(16 * 1024 * 1024)))
+UPLOAD_SESSION_STALE_HOURS = int(os.environ.get('UPLOAD_SESSION_STALE_HOURS', '24'))
+
+# Uncompressed uploads of at least SUMMARY_PARALLEL_MIN_BYTES are split into
+# byte ranges and summarized by a pool of SUMMARY_PARALLEL_WORKERS processes.
+# One worker (the default on a single-core host) keeps everything serial.
+SUMMARY_PARALLEL_MIN_BYTES = int(os.environ.get('SUMMARY_PARALLEL_MIN_BYTES', str(64 * 1024 * 1024)))
+SUMMARY_PARALLEL_WORKERS = int(os.environ.get('SUMMARY_PARALLEL_WORKERS', str(min(8, os.cpu_count() or 1))))
+
+# Offloaded API views (see equipment/offload.py), switched on by asgi.py: the
+# sync views run on ASYNC_OFFLOAD_WORKERS threads per process, each with its
+# own database connection; 0 runs them on Django's single sync thread.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', 'False').lower() == 'true'
+ASYNC_OFFLOAD_WORKERS = int(os.environ.get('ASYNC_OFFLOAD_WORKERS', '4'))
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.BasicAuthentication',
+        'equipment.authentication.ExpiringTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson when installed, with the same bytes as DRF's JSONRenderer.
+    'DEFAULT_RENDERER_CLASSES': [
+        'equipment.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Per-stage timings in a Server-Timing header plus Prometheus text at
+# /metrics. Off by default; when off, instrumentation is a no-op. /metrics
+# answers `Authorization: Bearer <METRICS_TOKEN>` and logged-in staff only.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Lifetime of tokens issued by /api/auth/token/.
+AUTH_TOKEN_TTL_SECONDS = int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', str(24 * 60 * 60)))
+
 # CORS_ALLOWED_ORIGINS = _split_env_list(
 #     os.environ.get('CORS_ALLOWED_ORIGINS'),
 #     [
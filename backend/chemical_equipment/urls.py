@@ -19,11 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from equipment.metrics import metrics_view
+
 from .views import api_root
 
 urlpatterns = [
     path('', api_root, name='api-root'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
 ] + [
     path('api/', include('equipment.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
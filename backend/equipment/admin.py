@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Dataset
+from django.db import transaction
+from .models import Dataset, HistoryVersion, ReportJob
 
 
 @admin.register(Dataset)
@@ -11,6 +12,25 @@ class DatasetAdmin(admin.ModelAdmin):
         'avg_flowrate',
         'avg_pressure',
         'avg_temperature',
+        'report_status',
     )
     readonly_fields = ('uploaded_at',)
     search_fields = ('original_filename',)
+
+    # Edits and bulk deletes move the history version like the API does.
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            HistoryVersion.bump([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            super().delete_queryset(request, queryset)
+            HistoryVersion.bump()
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('dataset', 'status', 'attempts', 'max_attempts', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,41 @@
+"""
+Expiring API tokens.
+
+Clients exchange username/password once at ``/api/auth/token/`` and then send
+``Authorization: Token <key>``. Verifying a token is a single indexed lookup,
+unlike Basic auth which re-runs the PBKDF2 password hash on every request.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def token_expires_at(token: Token) -> datetime:
+    return token.created + timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS)
+
+
+def token_expired(token: Token) -> bool:
+    return token_expires_at(token) <= timezone.now()
+
+
+def issue_token(user) -> Token:
+    """Return the user's live token, replacing it if it has expired."""
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token_expired(token):
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        if token_expired(token):
+            raise AuthenticationFailed('Token has expired.')
+        return user, token
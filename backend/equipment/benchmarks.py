@@ -0,0 +1,644 @@
+"""
+Micro-benchmarks for the ingestion and analysis pipeline.
+
+Run them with ``python manage.py run_benchmarks <name> --rows 100000``
+(without ``--rows``, each uses ``default_rows(name)``).
+Each benchmark takes a row count, a scratch directory and the synthetic CSV
+options (type cardinality, dirty-value rate) and returns a flat dict of
+measurements that the command prints as a table. Results can be saved to a
+JSON baseline and later runs compared against it with ``find_regressions``.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import importlib.util
+import multiprocessing
+import os
+import resource
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client, RequestFactory, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from rest_framework.renderers import JSONRenderer
+
+from . import parallel
+from .ingest import ingest_records
+from .fastjson import FastJSONRenderer
+from .models import Dataset
+from .reports import TypeRow, write_report
+from .serializers import DatasetSerializer, dataset_rows
+from .utils import (
+    CSV_CHUNK_ROWS,
+    CSV_NUMERIC_COLUMNS,
+    ColumnarDataset,
+    ColumnarWriter,
+    SummaryAccumulator,
+    compute_summary,
+    generate_pdf,
+    normalize_dataframe,
+    pyarrow,
+    summarize_csv,
+)
+
+SYNTHETIC_HEADER = 'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+GENERATOR_CHUNK_ROWS = 100_000
+DEFAULT_TYPE_COUNT = 8
+DEFAULT_ROWS = 100_000
+# Where ``rows`` counts requests or sizes concurrent uploads, the default is
+# scaled down so a bare ``run_benchmarks`` finishes in minutes.
+BENCHMARK_DEFAULT_ROWS = {'history_auth': 50, 'concurrency': 10_000}
+# Differences smaller than these never count as regressions (timer and RSS noise).
+REGRESSION_FLOOR_SECONDS = 0.005
+REGRESSION_FLOOR_MIB = 2.0
+
+
+def write_synthetic_csv(path: Path, rows: int, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0, seed: int = 0) -> Path:
+    """
+    Write an equipment CSV with ``rows`` rows, ``type_count`` distinct types and
+    roughly ``dirty_rate`` of numeric cells replaced by unparseable text.
+    """
+    rng = np.random.default_rng(seed)
+    types = np.array([f'Type{index}' for index in range(type_count)], dtype=object)
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        handle.write(SYNTHETIC_HEADER)
+        for start in range(0, rows, GENERATOR_CHUNK_ROWS):
+            size = min(GENERATOR_CHUNK_ROWS, rows - start)
+            frame = pd.DataFrame({
+                'Equipment Name': [f'Unit {start + offset}' for offset in range(size)],
+                'Type': types[rng.integers(0, type_count, size)],
+                'Flowrate': rng.normal(150, 30, size).round(2),
+                'Pressure': rng.normal(6, 1.5, size).round(2),
+                'Temperature': rng.normal(110, 25, size).round(2),
+            })
+            if dirty_rate:
+                for column in ('Flowrate', 'Pressure', 'Temperature'):
+                    mask = rng.random(size) < dirty_rate
+                    frame[column] = frame[column].astype(object)
+                    frame.loc[mask, column] = 'n/a'
+            frame.to_csv(handle, header=False, index=False)
+    return path
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def _current_rss_bytes() -> int:
+    with open('/proc/self/statm') as handle:
+        return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _measure_child(func, connection) -> None:
+    try:
+        baseline = _current_rss_bytes()
+        _, seconds = timed(func)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        connection.send((seconds, max(peak - baseline, 0) / 2 ** 20, None))
+    except Exception as exc:
+        connection.send((None, None, repr(exc)))
+    finally:
+        connection.close()
+
+
+def timed_with_peak_memory(func: Callable[[], Any]) -> Tuple[float, Optional[float]]:
+    """
+    Run ``func`` in a forked process and return (seconds, peak RSS growth in MiB).
+
+    A fresh process keeps one measurement's high-water mark from hiding the
+    next. Where fork or /proc is unavailable, only the time is measured.
+    """
+    if not os.path.exists('/proc/self/statm') or 'fork' not in multiprocessing.get_all_start_methods():
+        _, seconds = timed(func)
+        return seconds, None
+    receiver, sender = multiprocessing.get_context('fork').Pipe(duplex=False)
+    process = multiprocessing.get_context('fork').Process(target=_measure_child, args=(func, sender))
+    process.start()
+    seconds, peak_mib, error = receiver.recv()
+    process.join()
+    if error is not None:
+        raise RuntimeError(f'Benchmark failed in child process: {error}')
+    return seconds, peak_mib
+
+
+def record_time_and_memory(results: Dict[str, Any], key: str, func: Callable[[], Any]) -> None:
+    """Store ``<key>_s`` and ``<key>_peak_mib`` for one run of ``func``."""
+    seconds, peak_mib = timed_with_peak_memory(func)
+    results[f'{key}_s'] = round(seconds, 4)
+    results[f'{key}_peak_mib'] = round(peak_mib, 1) if peak_mib is not None else None
+
+
+@contextmanager
+def scratch_database(workdir: Path) -> Iterator[None]:
+    """
+    Point the default database at a throwaway, migrated copy and MEDIA_ROOT
+    at ``workdir``, as the test runner does, so benchmarks never create users,
+    datasets or files in the configured ones. On SQLite the copy is a file in
+    ``workdir``; other backends create (and drop) a uniquely named database on
+    the same server, which needs the CREATE DATABASE privilege.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    saved_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        test_settings['NAME'] = str(workdir / 'benchmark.sqlite3')
+    else:
+        test_settings['NAME'] = f'benchmark_{secrets.token_hex(4)}'
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(MEDIA_ROOT=str(workdir / 'media')):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = saved_test_name
+
+
+def bench_columnar(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """Compare re-parsing the CSV against memory-mapping the columnar sidecar."""
+    csv_path = write_synthetic_csv(workdir / 'columnar.csv', rows, type_count, dirty_rate)
+    sidecar = workdir / 'columnar_sidecar'
+
+    def build():
+        writer = ColumnarWriter(sidecar)
+        with open(csv_path, 'rb') as handle:
+            summarize_csv(handle, on_chunk=writer.write)
+        writer.close()
+
+    def csv_query():
+        frame = pd.read_csv(csv_path)
+        return float(pd.to_numeric(frame['Flowrate'], errors='coerce').mean())
+
+    def sidecar_query():
+        return float(np.nanmean(ColumnarDataset(sidecar).numeric('Flowrate')))
+
+    _, build_seconds = timed(build)
+    csv_mean, csv_seconds = timed(csv_query)
+    sidecar_mean, sidecar_seconds = timed(sidecar_query)
+    _, open_seconds = timed(lambda: ColumnarDataset(sidecar).numeric('Flowrate'))
+    assert abs(csv_mean - sidecar_mean) < 1e-6
+    return {
+        'rows': rows,
+        'build_sidecar_s': round(build_seconds, 4),
+        'csv_mean_flowrate_s': round(csv_seconds, 4),
+        'sidecar_open_s': round(open_seconds, 6),
+        'sidecar_mean_flowrate_s': round(sidecar_seconds, 4),
+        'speedup': round(csv_seconds / sidecar_seconds, 1) if sidecar_seconds else None,
+    }
+
+
+def bench_records(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """Measure EquipmentRecord ingest throughput on a scratch copy of the configured database."""
+    csv_path = write_synthetic_csv(workdir / 'records.csv', rows, type_count, dirty_rate)
+    sidecar = workdir / 'records_sidecar'
+    writer = ColumnarWriter(sidecar)
+    with open(csv_path, 'rb') as handle:
+        summarize_csv(handle, on_chunk=writer.write)
+    writer.close()
+
+    with scratch_database(workdir):
+        dataset = Dataset.objects.create(original_filename='benchmark.csv', total_records=rows)
+
+        def ingest():
+            with transaction.atomic():
+                return ingest_records(dataset, ColumnarDataset(sidecar))
+
+        inserted, seconds = timed(ingest)
+    return {
+        'rows': inserted,
+        'ingest_s': round(seconds, 3),
+        'rows_per_s': int(inserted / seconds) if seconds else None,
+    }
+
+
+def bench_history_auth(rows: int, workdir: Path, **synthetic) -> Dict[str, Any]:
+    """
+    Mean /api/history/ latency with Basic auth (password hash per request)
+    versus an expiring token. ``rows`` is the number of requests per mode.
+    """
+    username = 'bench'
+    password = secrets.token_urlsafe(16)
+    client = Client(HTTP_HOST='localhost')
+    with scratch_database(workdir):
+        get_user_model().objects.create_user(username, password=password)
+        token = client.post('/api/auth/token/', {'username': username, 'password': password}).json()['token']
+        basic = 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+
+        def latency(header: str) -> float:
+            samples = []
+            for _ in range(rows):
+                start = time.perf_counter()
+                response = client.get('/api/history/', HTTP_AUTHORIZATION=header)
+                samples.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+            return statistics.mean(samples) * 1000
+
+        basic_ms = latency(basic)
+        token_ms = latency(f'Token {token}')
+    return {
+        'requests': rows,
+        'basic_ms': round(basic_ms, 2),
+        'token_ms': round(token_ms, 2),
+        'speedup': round(basic_ms / token_ms, 1) if token_ms else None,
+    }
+
+
+def bench_parse(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    Time and peak memory per CSV engine, on a clean file and one with 1% junk
+    numeric cells: ``whole`` loads the frame with ``normalize_dataframe``,
+    ``stream`` runs the chunked ``summarize_csv`` used by uploads. ``legacy``
+    is the previous default-inference read followed by to_numeric per column.
+    The junk rate is fixed, so ``dirty_rate`` is ignored.
+    """
+    engines = ['c'] + (['pyarrow'] if pyarrow is not None else [])
+    results: Dict[str, Any] = {'rows': rows}
+
+    for label, rate in (('clean', 0.0), ('dirty', 0.01)):
+        csv_path = write_synthetic_csv(workdir / f'parse_{label}.csv', rows, type_count, rate)
+
+        def legacy_whole():
+            frame = pd.read_csv(csv_path)
+            frame.columns = [column.strip() for column in frame.columns]
+            return [pd.to_numeric(frame[column], errors='coerce') for column in CSV_NUMERIC_COLUMNS]
+
+        def legacy_stream():
+            accumulator = SummaryAccumulator()
+            with pd.read_csv(csv_path, chunksize=CSV_CHUNK_ROWS) as reader:
+                for chunk in reader:
+                    chunk.columns = [column.strip() for column in chunk.columns]
+                    accumulator.update(chunk)
+            return accumulator.result()
+
+        record_time_and_memory(results, f'{label}_whole_legacy', legacy_whole)
+        record_time_and_memory(results, f'{label}_stream_legacy', legacy_stream)
+        for engine in engines:
+            def whole(engine=engine):
+                with open(csv_path, 'rb') as handle:
+                    return normalize_dataframe(handle, engine=engine)
+
+            def stream(engine=engine):
+                with open(csv_path, 'rb') as handle:
+                    return summarize_csv(handle, engine=engine)
+
+            record_time_and_memory(results, f'{label}_whole_{engine}', whole)
+            record_time_and_memory(results, f'{label}_stream_{engine}', stream)
+    return results
+
+
+def _measure_upload(csv_path: Path, workdir: Path) -> Tuple[float, Optional[float]]:
+    """POST ``csv_path`` to /api/upload/ through the test client in a child process."""
+    with scratch_database(workdir):
+        user = get_user_model().objects.create_user('bench')
+        # The child must open its own database connection.
+        connections.close_all()
+        return timed_with_peak_memory(lambda: _upload(csv_path, user))
+
+
+def _upload(csv_path: Path, user) -> None:
+    client = Client(HTTP_HOST='localhost')
+    client.force_login(user)
+    with open(csv_path, 'rb') as handle:
+        response = client.post('/api/upload/', {'file': handle})
+    assert response.status_code == 201, response.status_code
+
+
+def bench_pipeline(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    Wall time and peak memory of each stage: ``normalize_dataframe``,
+    ``compute_summary`` on the loaded frame, ``generate_pdf`` and a full
+    /api/upload/ through the Django test client (which itself buffers the
+    multipart body, so upload memory includes one copy of the file).
+    """
+    csv_path = write_synthetic_csv(workdir / 'benchmark.csv', rows, type_count, dirty_rate)
+    results: Dict[str, Any] = {'rows': rows}
+
+    def load():
+        with open(csv_path, 'rb') as handle:
+            return normalize_dataframe(handle)
+
+    record_time_and_memory(results, 'normalize', load)
+    frame = load()
+    record_time_and_memory(results, 'summary', lambda: compute_summary(frame))
+    summary = compute_summary(frame)
+    del frame
+    record_time_and_memory(results, 'pdf', lambda: generate_pdf(summary, 'benchmark.csv'))
+    seconds, peak_mib = _measure_upload(csv_path, workdir)
+    results['upload_s'] = round(seconds, 4)
+    results['upload_peak_mib'] = round(peak_mib, 1) if peak_mib is not None else None
+    return results
+
+
+PARALLEL_WORKER_COUNTS = (1, 2, 4, 8)
+
+
+def bench_parallel(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    Scaling of ``summarize_csv_parallel`` (summary plus sidecar, as in an
+    upload) across worker counts; one worker is the serial path. Pools are
+    started before timing, so only steady-state work is measured.
+    """
+    csv_path = write_synthetic_csv(workdir / 'parallel.csv', rows, type_count, dirty_rate)
+    results: Dict[str, Any] = {'rows': rows, 'cpus': os.cpu_count()}
+    for workers in PARALLEL_WORKER_COUNTS:
+        if workers > 1:
+            executor = parallel.get_executor(workers)
+            list(executor.map(abs, range(workers)))
+        writer = ColumnarWriter(workdir / f'columns-{workers}')
+        summary, seconds = timed(lambda: parallel.summarize_csv_parallel(csv_path, workers, writer=writer))
+        writer.close()
+        results[f'w{workers}_s'] = round(seconds, 4)
+        results[f'w{workers}_speedup'] = round(results['w1_s'] / seconds, 2)
+    parallel.shutdown_executor()
+    return results
+
+
+SERIALIZATION_REPEATS = 5
+
+
+def bench_serialization(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, **synthetic) -> Dict[str, Any]:
+    """
+    Query plus JSON encoding of ``rows`` history rows (each with a
+    ``type_count``-entry type_distribution): ``DatasetSerializer`` rendered by
+    DRF's ``JSONRenderer`` versus ``dataset_rows`` over ``values()`` rendered by
+    ``FastJSONRenderer``. Best of SERIALIZATION_REPEATS runs, on a scratch
+    database.
+    """
+    request = RequestFactory(HTTP_HOST='localhost').get('/api/history/')
+    distribution = {f'Type{index}': index + 1 for index in range(type_count)}
+
+    def serializer_path():
+        queryset = Dataset.objects.order_by('-uploaded_at', '-id')[:rows]
+        return JSONRenderer().render(DatasetSerializer(queryset, many=True, context={'request': request}).data)
+
+    def fast_path():
+        queryset = Dataset.objects.values(*DatasetSerializer.Meta.fields).order_by('-uploaded_at', '-id')[:rows]
+        return FastJSONRenderer().render(dataset_rows(queryset, request=request))
+
+    with scratch_database(workdir):
+        Dataset.objects.bulk_create(
+            Dataset(
+                original_filename=f'bench-{index}.csv', total_records=1000 + index, avg_flowrate=150.25 + index,
+                avg_pressure=6.5, avg_temperature=110.75, type_distribution=distribution,
+                summary_pdf=f'reports/bench-{index}_summary.pdf',
+            )
+            for index in range(rows)
+        )
+        assert serializer_path() == fast_path(), 'fast path output differs from DatasetSerializer'
+        serializer_s = min(timed(serializer_path)[1] for _ in range(SERIALIZATION_REPEATS))
+        fast_s = min(timed(fast_path)[1] for _ in range(SERIALIZATION_REPEATS))
+    return {
+        'rows': rows,
+        'serializer_s': round(serializer_s, 5),
+        'fast_s': round(fast_s, 5),
+        'speedup': round(serializer_s / fast_s, 1) if fast_s else None,
+    }
+
+
+REPORT_TYPE_COUNTS = (10, 100, 1000, 10000)
+
+
+def _report_inputs(rows: int, type_count: int) -> Tuple[Dict[str, Any], List[TypeRow]]:
+    rng = np.random.default_rng(type_count)
+    counts = np.bincount(rng.zipf(1.5, rows) % type_count, minlength=type_count)
+    distribution = {f'Type{index}': int(count) for index, count in enumerate(counts) if count}
+    summary = {
+        'total_records': rows,
+        'avg_flowrate': 150.0,
+        'avg_pressure': 6.0,
+        'avg_temperature': 110.0,
+        'type_distribution': dict(sorted(distribution.items(), key=lambda item: (-item[1], item[0]))),
+    }
+    type_rows = [
+        TypeRow(label, count, *rng.normal((150, 6, 110), (30, 1.5, 25)).round(2).tolist())
+        for label, count in summary['type_distribution'].items()
+    ]
+    return summary, type_rows
+
+
+def bench_report(rows: int, workdir: Path, **synthetic) -> Dict[str, Any]:
+    """
+    Render time, peak memory and size of the PDF report against the number of
+    equipment types (``rows`` records spread over them), streamed to a file as
+    the report worker does. Pages grow with the per-type table.
+    """
+    results: Dict[str, Any] = {'rows': rows}
+    for type_count in REPORT_TYPE_COUNTS:
+        summary, type_rows = _report_inputs(rows, type_count)
+        path = workdir / f'report-{type_count}.pdf'
+
+        def render():
+            with open(path, 'wb') as handle:
+                return write_report(handle, summary, 'benchmark.csv', iter(type_rows))
+
+        record_time_and_memory(results, f't{type_count}', render)
+        results[f't{type_count}_pages'] = render()
+        results[f't{type_count}_kib'] = round(path.stat().st_size / 1024, 1)
+    return results
+
+
+# One server process, LOAD_CLIENTS clients each sending its upload in
+# LOAD_UPLOAD_PIECES pieces LOAD_PIECE_DELAY_S apart (a slow link), while a
+# probe keeps requesting the history.
+LOAD_CLIENTS = 8
+LOAD_UPLOAD_PIECES = 20
+LOAD_PIECE_DELAY_S = 0.05
+LOAD_SEND_BUFFER_BYTES = 16 * 1024
+LOAD_SERVERS = {
+    'sync': ('gunicorn', ['--workers', '1', '--bind', '127.0.0.1:{port}', 'chemical_equipment.wsgi:application']),
+    'async': ('uvicorn', ['--workers', '1', '--host', '127.0.0.1', '--port', '{port}', 'chemical_equipment.asgi:application']),
+}
+LOAD_STARTUP_TIMEOUT_S = 30.0
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+async def _http(port: int, method: str, target: str, headers: Dict[str, str], body: bytes = b'', pieces: int = 1, delay: float = 0.0) -> Tuple[int, float]:
+    """Send one request over a raw socket, the body in ``pieces`` ``delay`` apart; (status, seconds)."""
+    started = time.perf_counter()
+    # A small send buffer stops the client from running ahead of a server that isn't reading.
+    connection = socket.socket()
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, LOAD_SEND_BUFFER_BYTES)
+    connection.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(connection, ('127.0.0.1', port))
+    reader, writer = await asyncio.open_connection(sock=connection)
+    try:
+        lines = [f'{method} {target} HTTP/1.1', 'Host: localhost', 'Connection: close', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        step = max(1, -(-len(body) // pieces))
+        for offset in range(0, len(body), step):
+            writer.write(body[offset:offset + step])
+            await writer.drain()
+            await asyncio.sleep(delay)
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - started
+
+
+async def _load(port: int, token: str, uploads: List[bytes]) -> Dict[str, Any]:
+    auth = {'Authorization': f'Token {token}'}
+    upload_headers = dict(auth, **{'Content-Type': MULTIPART_CONTENT})
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_http(port, 'POST', '/api/upload/', upload_headers, body, LOAD_UPLOAD_PIECES, LOAD_PIECE_DELAY_S))
+        for body in uploads
+    ]
+    history = []
+    while not all(task.done() for task in tasks):
+        status_code, seconds = await _http(port, 'GET', '/api/history/?fields=id', auth)
+        assert status_code == 200, status_code
+        history.append(seconds)
+        await asyncio.sleep(LOAD_PIECE_DELAY_S)
+    results = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    assert all(status_code == 201 for status_code, _ in results), [status_code for status_code, _ in results]
+    return {
+        'wall_s': round(wall, 3),
+        'upload_max_s': round(max(seconds for _, seconds in results), 3),
+        'history_p95_s': round(float(np.percentile(history, 95)), 4),
+    }
+
+
+def _serve(command: List[str], env: Dict[str, str], port: int, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, 'wb')
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    deadline = time.monotonic() + LOAD_STARTUP_TIMEOUT_S
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    process.wait()
+    raise RuntimeError(f'{command[2]} did not start:\n{log_path.read_text()[-2000:]}')
+
+
+def bench_concurrency(rows: int, workdir: Path, type_count: int = DEFAULT_TYPE_COUNT, dirty_rate: float = 0.0) -> Dict[str, Any]:
+    """
+    Load test: LOAD_CLIENTS concurrent slow uploads of ``rows``-row CSVs to a
+    single worker process, sync gunicorn (WSGI) versus uvicorn (ASGI, the
+    same sync views offloaded to a thread pool), each against its own scratch
+    database and media root. Reports the time until every upload finished,
+    the slowest upload and the p95 latency of history requests made
+    meanwhile. A server whose package is not installed is skipped (its
+    metrics are None).
+    """
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{workdir / 'load.sqlite3'}?timeout=60",
+        DATASET_RETENTION_MAX_COUNT='',
+        SUMMARY_PARALLEL_WORKERS='1',
+        PYTHONUNBUFFERED='1',
+    )
+    manage = [sys.executable, 'manage.py']
+    subprocess.run(manage + ['migrate', '--noinput'], cwd=settings.BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    token = subprocess.run(
+        manage + ['shell', '-c', (
+            'from django.contrib.auth import get_user_model; from equipment.authentication import issue_token; '
+            "print(issue_token(get_user_model().objects.create_user('load-test')).key)"
+        )],
+        cwd=settings.BASE_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+    results: Dict[str, Any] = {'rows': rows, 'clients': LOAD_CLIENTS}
+    for number, (mode, (package, arguments)) in enumerate(LOAD_SERVERS.items()):
+        if importlib.util.find_spec(package) is None:
+            results.update({f'{mode}_wall_s': None, f'{mode}_upload_max_s': None, f'{mode}_history_p95_s': None})
+            continue
+        uploads = []
+        for index in range(LOAD_CLIENTS):
+            # Distinct contents, so no upload is answered as a duplicate.
+            seed = number * LOAD_CLIENTS + index
+            csv_path = write_synthetic_csv(workdir / f'{mode}-{index}.csv', rows, type_count, dirty_rate, seed=seed)
+            with open(csv_path, 'rb') as handle:
+                uploads.append(encode_multipart(BOUNDARY, {'file': handle}))
+        port = _free_port()
+        command = [sys.executable, '-m', package] + [argument.format(port=port) for argument in arguments]
+        process = _serve(command, dict(env, DJANGO_MEDIA_ROOT=str(workdir / f'media-{mode}')), port, workdir / f'{mode}.log')
+        try:
+            measured = asyncio.run(_load(port, token, uploads))
+        finally:
+            process.terminate()
+            process.wait()
+        results.update({f'{mode}_{key}': value for key, value in measured.items()})
+    measured_both = results['sync_wall_s'] and results['async_wall_s']
+    results['speedup'] = round(results['sync_wall_s'] / results['async_wall_s'], 1) if measured_both else None
+    return results
+
+
+def default_rows(name: str) -> int:
+    return BENCHMARK_DEFAULT_ROWS.get(name, DEFAULT_ROWS)
+
+
+def _lower_is_better(metric: str) -> Optional[float]:
+    """Noise floor for time and memory metrics; None for anything else (counts, speedups, rates)."""
+    if metric.endswith('_per_s'):
+        return None
+    if metric.endswith('_s'):
+        return REGRESSION_FLOOR_SECONDS
+    if metric.endswith('_mib'):
+        return REGRESSION_FLOOR_MIB
+    return None
+
+
+def find_regressions(
+    baseline: Dict[str, Dict[str, Dict[str, Any]]],
+    results: Dict[str, Dict[str, Dict[str, Any]]],
+    threshold: float,
+) -> List[str]:
+    """
+    Compare ``{benchmark: {rows: {metric: value}}}`` results with a baseline of
+    the same shape. A time or memory metric regresses when it grows by more
+    than ``threshold`` (0.25 = 25%) and by more than its noise floor.
+    """
+    regressions = []
+    for name, by_rows in results.items():
+        for rows, metrics in by_rows.items():
+            previous = baseline.get(name, {}).get(rows, {})
+            for metric, value in metrics.items():
+                floor = _lower_is_better(metric)
+                before = previous.get(metric)
+                if floor is None or value is None or before is None:
+                    continue
+                if value > before * (1 + threshold) and value - before > floor:
+                    regressions.append(f'{name} rows={rows} {metric}: {before} -> {value}')
+    return regressions
+
+
+BENCHMARKS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    'columnar': bench_columnar,
+    'concurrency': bench_concurrency,
+    'records': bench_records,
+    'history_auth': bench_history_auth,
+    'parse': bench_parse,
+    'pipeline': bench_pipeline,
+    'parallel': bench_parallel,
+    'report': bench_report,
+    'serialization': bench_serialization,
+}
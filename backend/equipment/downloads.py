@@ -0,0 +1,121 @@
+"""
+Download responses for immutable stored files (PDF reports).
+
+Supports strong ETags, single-range ``Range`` requests and handing the transfer
+to the front proxy via X-Accel-Redirect (nginx) or X-Sendfile (Apache/lighttpd),
+selected with the ``REPORT_OFFLOAD`` setting.
+"""
+from __future__ import annotations
+
+import mimetypes
+import re
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, quote_etag
+
+OFFLOAD_X_ACCEL = 'x-accel'
+OFFLOAD_X_SENDFILE = 'x-sendfile'
+STREAM_CHUNK_BYTES = 64 * 1024
+# Authenticated but immutable: browsers may cache privately, forever.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header into an inclusive (start, end) pair.
+
+    Returns None when the header is absent, malformed or asks for several
+    ranges (the full body is served instead). Raises ValueError when the range
+    is well-formed but unsatisfiable.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _iter_range(handle, start: int, length: int) -> Iterator[bytes]:
+    try:
+        handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = handle.read(min(STREAM_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def immutable_file_response(request, field_file, filename: str) -> HttpResponse:
+    """Serve a FieldFile that never changes once written."""
+    size = field_file.size
+    etag = quote_etag(f"{field_file.name.rsplit('/', 1)[-1]}-{size}")
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _build_body(request, field_file, size, etag)
+    if response.status_code == 416:
+        # Only Content-Range describes a refusal; it must not be cached as the file.
+        return response
+
+    content_type, _ = mimetypes.guess_type(filename)
+    if response.status_code != 304:
+        response.headers['Content-Type'] = content_type or 'application/octet-stream'
+        response.headers['Content-Disposition'] = content_disposition_header(True, filename)
+    response.headers['ETag'] = etag
+    response.headers['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    return response
+
+
+def _build_body(request, field_file, size: int, etag: str) -> HttpResponse:
+    offload = (getattr(settings, 'REPORT_OFFLOAD', '') or '').lower()
+    if offload == OFFLOAD_X_ACCEL:
+        # nginx serves the file (and any Range) from an `internal` location.
+        response = HttpResponse()
+        response.headers['X-Accel-Redirect'] = settings.REPORT_OFFLOAD_PREFIX.rstrip('/') + '/' + field_file.name
+        return response
+    if offload == OFFLOAD_X_SENDFILE:
+        response = HttpResponse()
+        response.headers['X-Sendfile'] = field_file.path
+        return response
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416, content_type='text/plain')
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = max(end - start + 1, 0)
+    response = StreamingHttpResponse(_iter_range(field_file.open('rb'), start, length))
+    response.headers['Content-Length'] = str(length)
+    if byte_range:
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,211 @@
+"""
+Streaming exports of normalized dataset rows.
+
+Rows come from the columnar sidecar in EXPORT_CHUNK_ROWS slices (or, for
+datasets uploaded before sidecars existed, from the stored CSV, parsed a chunk
+at a time), so an export holds one chunk in memory whatever the dataset size.
+Each format is a generator of byte chunks for ``StreamingHttpResponse``:
+CSV, JSON Lines and Parquet (one row group per chunk; needs pyarrow).
+
+``zip_chunks`` streams several datasets and their PDF reports as one ZIP.
+Members are written with data descriptors, so the archive never has to be
+seekable and is neither staged in memory nor on disk.
+"""
+from __future__ import annotations
+
+import io
+import json
+import zipfile
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .downloads import STREAM_CHUNK_BYTES
+from .fastjson import orjson
+from .models import Dataset
+from .utils import (
+    COLUMNAR_CATEGORICAL,
+    CSV_CHUNK_ROWS,
+    CSV_NUMERIC_COLUMNS,
+    CSV_TEXT_COLUMNS,
+    iter_normalized_chunks,
+    open_columnar,
+    pyarrow,
+)
+
+EXPORT_COLUMNS = list(CSV_TEXT_COLUMNS) + list(CSV_NUMERIC_COLUMNS)
+EXPORT_CHUNK_ROWS = CSV_CHUNK_ROWS
+# Buffered archive bytes are handed to the response once they pass this size.
+ZIP_FLUSH_BYTES = 256 * 1024
+
+
+class ExportFormat(NamedTuple):
+    extension: str
+    content_type: str
+    writer: Callable[[Iterable[pd.DataFrame]], Iterator[bytes]]
+    # Already-compressed formats are stored in ZIP archives as they are.
+    zip_compression: int
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional package that is not installed."""
+
+
+def iter_export_frames(dataset: Dataset, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Normalized rows of ``dataset`` in EXPORT_COLUMNS order (the columns it
+    has), with text trimmed and missing values as None/NaN.
+    """
+    columnar = open_columnar(dataset.pk)
+    if columnar is None:
+        yield from _csv_frames(dataset, chunk_rows)
+        return
+    columns = [column for column in EXPORT_COLUMNS if column in columnar.columns]
+    # A trailing None turns code -1 (missing) into None.
+    labels = {
+        column: np.array(columnar.categories(column) + [None], dtype=object)
+        for column in columns
+        if column in COLUMNAR_CATEGORICAL
+    }
+    for start in range(0, max(columnar.num_rows, 1), chunk_rows):
+        stop = min(start + chunk_rows, columnar.num_rows)
+        data = {}
+        for column in columns:
+            if column in labels:
+                data[column] = labels[column][columnar.codes(column)[start:stop]]
+            else:
+                data[column] = np.array(columnar.numeric(column)[start:stop])
+        yield pd.DataFrame(data, columns=columns)
+
+
+def _csv_frames(dataset: Dataset, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    with dataset.data_file.open('rb') as handle:
+        for chunk in iter_normalized_chunks(handle, chunksize=chunk_rows):
+            chunk = chunk[[column for column in EXPORT_COLUMNS if column in chunk.columns]]
+            for column in CSV_TEXT_COLUMNS:
+                if column in chunk.columns:
+                    text = chunk[column].astype('string').str.strip()
+                    chunk[column] = text.astype(object).where(text.notna(), None)
+            yield chunk
+
+
+def csv_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header, lineterminator='\n').encode('utf-8')
+        header = False
+
+
+def _json_line(record: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record) + b'\n'
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8') + b'\n'
+
+
+def jsonl_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    for frame in frames:
+        records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+        yield b''.join(map(_json_line, records))
+
+
+class _ByteSink(io.RawIOBase):
+    """A write-only, unseekable file whose contents are drained as they arrive."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.pending = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        self.pending = 0
+        return data
+
+
+def parquet_chunks(frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    check_format_available('parquet')
+    import pyarrow.parquet
+
+    sink = _ByteSink()
+    writer = None
+    try:
+        for frame in frames:
+            schema = pyarrow.schema([
+                (column, pyarrow.string() if column in CSV_TEXT_COLUMNS else pyarrow.float64())
+                for column in frame.columns
+            ])
+            table = pyarrow.Table.from_pandas(frame, schema=schema, preserve_index=False)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(sink, schema)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    'csv': ExportFormat('csv', 'text/csv; charset=utf-8', csv_chunks, zipfile.ZIP_DEFLATED),
+    'jsonl': ExportFormat('jsonl', 'application/x-ndjson', jsonl_chunks, zipfile.ZIP_DEFLATED),
+    'parquet': ExportFormat('parquet', 'application/vnd.apache.parquet', parquet_chunks, zipfile.ZIP_STORED),
+}
+
+
+def check_format_available(export_format: str) -> None:
+    """Raise ExportUnavailable before any bytes are streamed."""
+    if export_format == 'parquet' and pyarrow is None:
+        raise ExportUnavailable('Parquet export requires the pyarrow package on the server.')
+
+
+def export_filename(dataset: Dataset, export_format: str) -> str:
+    stem = dataset.original_filename
+    if stem.lower().endswith('.csv'):
+        stem = stem[:-4]
+    return f'{stem}.{EXPORT_FORMATS[export_format].extension}'
+
+
+def export_chunks(dataset: Dataset, export_format: str) -> Iterator[bytes]:
+    return EXPORT_FORMATS[export_format].writer(iter_export_frames(dataset))
+
+
+def _file_chunks(field_file) -> Iterator[bytes]:
+    with field_file.open('rb') as handle:
+        while True:
+            chunk = handle.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def zip_chunks(datasets: Iterable[Dataset], export_format: str, include_reports: bool = True) -> Iterator[bytes]:
+    """
+    A ZIP with ``<dataset id>/<name>.<format>`` per dataset, plus its
+    ``<name>_summary.pdf`` report when one has been rendered.
+    """
+    sink = _ByteSink()
+    spec = EXPORT_FORMATS[export_format]
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for dataset in datasets:
+            members = [(export_filename(dataset, export_format), export_chunks(dataset, export_format), spec.zip_compression)]
+            if include_reports and dataset.summary_pdf:
+                members.append((f'{dataset.original_filename}_summary.pdf', _file_chunks(dataset.summary_pdf), zipfile.ZIP_STORED))
+            for name, chunks, compression in members:
+                info = zipfile.ZipInfo(f'{dataset.pk}/{name}', date_time=dataset.uploaded_at.timetuple()[:6])
+                info.compress_type = compression
+                with archive.open(info, 'w', force_zip64=True) as member:
+                    for chunk in chunks:
+                        member.write(chunk)
+                        if sink.pending >= ZIP_FLUSH_BYTES:
+                            yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,65 @@
+"""
+JSON rendering through orjson, byte-identical to DRF's compact JSONRenderer.
+
+orjson and the stdlib agree on everything DRF emits by default (compact
+separators, UTF-8 rather than ``\\u`` escapes, insertion-ordered keys) except
+three cases, each detected and handed back to ``JSONRenderer``:
+
+* floats outside [1e-4, 1e16) are written ``1e16`` or ``0.00001`` rather
+  than ``1e+16`` or ``1e-05``, and NaN and infinity as ``null``; data holding
+  any such float falls back (so non-finite values still raise ValueError in
+  DRF's strict mode, as they would without orjson);
+* values orjson cannot encode natively, such as ``Decimal``, lazy strings,
+  non-string keys or integers over 64 bits, raise and fall back;
+* U+2028 and U+2029 are escaped afterwards, as DRF does.
+
+Without orjson installed every call falls back.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from rest_framework.renderers import JSONRenderer
+
+try:  # Optional: without it, responses are rendered by DRF's JSONRenderer.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _same_floats(value: Any) -> bool:
+    """True if every float in ``value`` is one orjson and ``repr`` format alike."""
+    kind = type(value)
+    if kind is float:
+        return not value or 1e-4 <= abs(value) < 1e16
+    if kind is str or kind is int or value is None or kind is bool:
+        return True
+    if isinstance(value, dict):
+        return all(map(_same_floats, value.values()))
+    if isinstance(value, (list, tuple)):
+        return all(map(_same_floats, value))
+    # Anything else is either rejected by orjson (so we fall back) or holds no floats.
+    return not isinstance(value, float)
+
+
+def dumps(data: Any) -> Optional[bytes]:
+    """``data`` as JSONRenderer would render it compactly, or None if orjson can't match it."""
+    if orjson is None or not _same_floats(data):
+        return None
+    try:
+        encoded = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+    except TypeError:
+        return None
+    return encoded.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that uses orjson for compact output when it yields the same bytes."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if data is not None and self.compact and not self.ensure_ascii and indent is None:
+            encoded = dumps(data)
+            if encoded is not None:
+                return encoded
+        return super().render(data, accepted_media_type, renderer_context)
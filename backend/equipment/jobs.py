@@ -0,0 +1,128 @@
+"""
+Database-backed queue for PDF report rendering.
+
+Uploads enqueue a ReportJob; ``manage.py run_report_worker`` claims due jobs,
+streams the PDF to storage and records the outcome on the Dataset.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import metrics
+from .models import Dataset, HistoryVersion, ReportJob
+from .reports import render_report
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 10
+# Running jobs untouched for this long are assumed to belong to a dead worker.
+STALE_LOCK_SECONDS = 600
+
+
+def enqueue_report(dataset: Dataset, max_attempts: int = MAX_ATTEMPTS) -> ReportJob:
+    return ReportJob.objects.create(dataset=dataset, max_attempts=max_attempts, run_after=timezone.now())
+
+
+def queue_depth() -> Dict[str, int]:
+    """Return job counts by status, plus how many pending jobs are due now."""
+    now = timezone.now()
+    counts = ReportJob.objects.aggregate(
+        pending=Count('pk', filter=Q(status=ReportJob.PENDING)),
+        due=Count('pk', filter=Q(status=ReportJob.PENDING, run_after__lte=now)),
+        running=Count('pk', filter=Q(status=ReportJob.RUNNING)),
+        failed=Count('pk', filter=Q(status=ReportJob.FAILED)),
+    )
+    return {key: int(value or 0) for key, value in counts.items()}
+
+
+def release_stale_jobs() -> int:
+    cutoff = timezone.now() - timedelta(seconds=STALE_LOCK_SECONDS)
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, locked_at__lt=cutoff).update(
+        status=ReportJob.PENDING, locked_at=None
+    )
+
+
+def claim_next_job() -> Optional[ReportJob]:
+    """
+    Atomically move the oldest due job to RUNNING.
+
+    The conditional UPDATE acts as the lock, so several workers can share the
+    queue on any database backend (including SQLite).
+    """
+    now = timezone.now()
+    candidates = ReportJob.objects.filter(status=ReportJob.PENDING, run_after__lte=now).values_list('pk', flat=True)
+    for job_id in candidates[:10]:
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ReportJob.objects.select_related('dataset').get(pk=job_id)
+    return None
+
+
+def run_job(job: ReportJob) -> bool:
+    """Render the report for a claimed job. Returns True on success."""
+    dataset = job.dataset
+    report = None
+    try:
+        # Recorded in the process that renders: the worker, or whoever calls run_pending_jobs.
+        with metrics.stage('pdf'):
+            report = render_report(dataset)
+        with transaction.atomic():
+            # The rendered file sits under MEDIA_ROOT, so storage renames it rather than copying.
+            dataset.summary_pdf.save(f"{dataset.id}_summary.pdf", report, save=False)
+            updated = Dataset.objects.filter(pk=dataset.pk).update(
+                summary_pdf=dataset.summary_pdf.name, report_status=Dataset.REPORT_READY, updated_at=timezone.now()
+            )
+            if not updated:
+                # The dataset was deleted while rendering; drop the orphaned PDF.
+                dataset.summary_pdf.storage.delete(dataset.summary_pdf.name)
+                return True
+            ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.DONE, locked_at=None, last_error='')
+            HistoryVersion.bump([dataset.pk])
+        return True
+    except Exception as exc:
+        logger.exception('Report job %s failed (attempt %s/%s)', job.pk, job.attempts, job.max_attempts)
+        _record_failure(job, exc)
+        return False
+    finally:
+        if report is not None:
+            report.close()
+            if os.path.exists(report.temporary_file_path()):
+                os.unlink(report.temporary_file_path())
+
+
+def _record_failure(job: ReportJob, exc: Exception) -> None:
+    if job.attempts < job.max_attempts:
+        delay = RETRY_BACKOFF_SECONDS * (2 ** (job.attempts - 1))
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.PENDING,
+            locked_at=None,
+            last_error=str(exc),
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+        return
+    with transaction.atomic():
+        ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.FAILED, locked_at=None, last_error=str(exc))
+        Dataset.objects.filter(pk=job.dataset_id).update(report_status=Dataset.REPORT_FAILED, updated_at=timezone.now())
+        HistoryVersion.bump([job.dataset_id])
+
+
+def run_pending_jobs(limit: Optional[int] = None) -> int:
+    """Process due jobs until the queue is drained (or ``limit`` is hit)."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
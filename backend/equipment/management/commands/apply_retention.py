@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from equipment.retention import enforce_retention, sweep_orphaned_files
+
+
+class Command(BaseCommand):
+    help = 'Delete datasets outside the retention policies and remove their files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-sweep', action='store_true', help='Leave orphaned files for the worker to sweep.')
+
+    def handle(self, *args, **options):
+        expired = enforce_retention()
+        self.stdout.write(f'Expired {expired} dataset(s).')
+        if options['no_sweep']:
+            return
+        swept = 0
+        while True:
+            batch = sweep_orphaned_files()
+            if not batch:
+                break
+            swept += batch
+        self.stdout.write(f'Removed {swept} orphaned file(s).')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from equipment.models import Dataset
+from equipment.rollups import rebuild_rollups
+from equipment.utils import open_columnar
+
+
+class Command(BaseCommand):
+    help = 'Build trend rollups for datasets that have none (e.g. uploaded before rollups existed).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild rollups for every dataset.')
+
+    def handle(self, *args, **options):
+        datasets = Dataset.objects.all() if options['all'] else Dataset.objects.filter(rollups__isnull=True)
+        rebuilt = 0
+        for dataset in datasets.order_by('uploaded_at').iterator():
+            with transaction.atomic():
+                rebuild_rollups(dataset, open_columnar(dataset.pk))
+            rebuilt += 1
+        self.stdout.write(f'Rebuilt rollups for {rebuilt} dataset(s).')
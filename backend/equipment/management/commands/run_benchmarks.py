@@ -0,0 +1,67 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.benchmarks import (
+    BENCHMARK_DEFAULT_ROWS,
+    BENCHMARKS,
+    DEFAULT_ROWS,
+    DEFAULT_TYPE_COUNT,
+    default_rows,
+    find_regressions,
+)
+
+
+class Command(BaseCommand):
+    help = 'Run pipeline micro-benchmarks against synthetic equipment CSVs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f"Benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all).")
+        parser.add_argument(
+            '--rows', type=int, nargs='+',
+            help=f'Row counts to benchmark (default {DEFAULT_ROWS}, except '
+            + ', '.join(f'{name}={rows}' for name, rows in sorted(BENCHMARK_DEFAULT_ROWS.items())) + ').',
+        )
+        parser.add_argument('--types', type=int, default=DEFAULT_TYPE_COUNT, help='Distinct equipment types in the synthetic CSV.')
+        parser.add_argument('--dirty-rate', type=float, default=0.0, help='Fraction of numeric cells replaced by junk text.')
+        parser.add_argument('--baseline', type=Path, help='JSON baseline to compare against (and update with --save-baseline).')
+        parser.add_argument('--save-baseline', action='store_true', help='Write these results into --baseline instead of comparing.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Relative growth in a time or memory metric that counts as a regression (default 0.25).',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+        if options['save_baseline'] and options['baseline'] is None:
+            raise CommandError('--save-baseline needs --baseline PATH.')
+
+        results = {}
+        for name in options['names'] or sorted(BENCHMARKS):
+            for rows in options['rows'] or [default_rows(name)]:
+                with tempfile.TemporaryDirectory() as workdir:
+                    result = BENCHMARKS[name](
+                        rows, Path(workdir), type_count=options['types'], dirty_rate=options['dirty_rate']
+                    )
+                results.setdefault(name, {})[str(rows)] = result
+                measurements = ', '.join(f'{key}={value}' for key, value in result.items())
+                self.stdout.write(f'{name}: {measurements}')
+
+        baseline_path = options['baseline']
+        if baseline_path is None:
+            return
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        if options['save_baseline']:
+            for name, by_rows in results.items():
+                baseline.setdefault(name, {}).update(by_rows)
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Baseline written to {baseline_path}.')
+            return
+        regressions = find_regressions(baseline, results, options['threshold'])
+        if regressions:
+            raise CommandError('Regressions against baseline:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from equipment.jobs import queue_depth, release_stale_jobs, run_pending_jobs
+from equipment.retention import enforce_retention, sweep_orphaned_files
+from equipment.upload_sessions import purge_stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Process queued PDF report jobs, apply dataset retention and sweep orphaned files and uploads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--status', action='store_true', help='Print queue depth and exit.')
+        parser.add_argument(
+            '--retention-interval', type=float, default=300.0,
+            help='Seconds between retention passes (age-based policies need periodic runs).',
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for key, value in queue_depth().items():
+                self.stdout.write(f'{key}: {value}')
+            return
+
+        self.stdout.write('Report worker started.')
+        next_retention = 0.0
+        while True:
+            release_stale_jobs()
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f'Processed {processed} report job(s).')
+            if time.monotonic() >= next_retention:
+                expired = enforce_retention()
+                if expired:
+                    self.stdout.write(f'Expired {expired} dataset(s).')
+                purged = purge_stale_sessions(settings.UPLOAD_SESSION_STALE_HOURS)
+                if purged:
+                    self.stdout.write(f'Discarded {purged} stale upload session(s).')
+                next_retention = time.monotonic() + options['retention_interval']
+            swept = sweep_orphaned_files()
+            if options['once']:
+                return
+            if not processed and not swept:
+                time.sleep(options['poll_interval'])
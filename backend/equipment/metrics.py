@@ -0,0 +1,297 @@
+"""
+Request-stage timing and Prometheus metrics.
+
+Wrap a hot-path step in ``with stage('parse'):``. When ``METRICS_ENABLED`` is
+set, the duration is added to the current response's ``Server-Timing`` header
+(via ``ServerTimingMiddleware``) and to a per-stage histogram served as
+Prometheus text from ``/metrics``. When it is off, ``stage`` returns a shared
+no-op context manager and the middleware removes itself at startup.
+
+Metrics are kept per process. Under several gunicorn workers each scrape sees
+one worker, so label or aggregate by instance in Prometheus.
+"""
+from __future__ import annotations
+
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROWS_PER_SECOND_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+# (stage, seconds) pairs recorded during the current request.
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+
+
+_enabled: Optional[bool] = None
+
+
+def enabled() -> bool:
+    global _enabled
+    if _enabled is None:
+        _enabled = bool(getattr(settings, 'METRICS_ENABLED', False))
+    return _enabled
+
+
+@receiver(setting_changed)
+def _metrics_setting_changed(setting, **kwargs):
+    global _enabled
+    if setting == 'METRICS_ENABLED':
+        _enabled = None
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], label: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._lock = threading.Lock()
+        # label value -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[str, list] = {}
+
+    def observe(self, value: float, label_value: str = '') -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+        for label_value, counts, total in snapshot:
+            labels = f'{self.label}="{label_value}",' if self.label else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels}le="{le}"}} {cumulative}')
+            plain = f'{{{labels.rstrip(",")}}}' if labels else ''
+            lines.append(f'{self.name}_sum{plain} {total}')
+            lines.append(f'{self.name}_count{plain} {cumulative}')
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter', f'{self.name} {self._value:g}']
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value = 0.0
+
+
+STAGE_SECONDS = Histogram('equipment_stage_seconds', 'Time spent in each instrumented stage.', LATENCY_BUCKETS, 'stage')
+REQUEST_SECONDS = Histogram('equipment_request_seconds', 'Request latency by view.', LATENCY_BUCKETS, 'view')
+UPLOAD_ROWS_PER_SECOND = Histogram(
+    'equipment_upload_rows_per_second', 'Rows processed per second for each upload.', ROWS_PER_SECOND_BUCKETS
+)
+UPLOAD_BYTES = Counter('equipment_upload_bytes_total', 'Bytes of CSV ingested (as stored).')
+UPLOAD_ROWS = Counter('equipment_upload_rows_total', 'CSV rows ingested.')
+REGISTRY = (STAGE_SECONDS, REQUEST_SECONDS, UPLOAD_ROWS_PER_SECOND, UPLOAD_BYTES, UPLOAD_ROWS)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name: str):
+    """Time the enclosed block as ``name``; a shared no-op when metrics are off."""
+    if not enabled():
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def _record(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+class StageClock:
+    """
+    Sums time per stage over many short blocks (e.g. once per CSV chunk) and
+    records each total once with ``finish``.
+    """
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+
+    def __call__(self, name: str):
+        return _ClockBlock(self, name)
+
+    def finish(self) -> None:
+        for name, seconds in self.totals.items():
+            _record(name, seconds)
+        self.totals = {}
+
+
+class _ClockBlock:
+    __slots__ = ('clock', 'name', 'started')
+
+    def __init__(self, clock: StageClock, name: str):
+        self.clock = clock
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        totals = self.clock.totals
+        totals[self.name] = totals.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+
+class _NullClock:
+    def __call__(self, name: str):
+        return _NULL_STAGE
+
+    def finish(self) -> None:
+        pass
+
+
+_NULL_CLOCK = _NullClock()
+
+
+def clock():
+    """A StageClock, or a shared no-op one when metrics are off."""
+    if not enabled():
+        return _NULL_CLOCK
+    return StageClock()
+
+
+def observe_upload(size_bytes: int, rows: int, seconds: float) -> None:
+    if not enabled():
+        return
+    UPLOAD_BYTES.inc(size_bytes)
+    UPLOAD_ROWS.inc(rows)
+    if seconds > 0:
+        UPLOAD_ROWS_PER_SECOND.observe(rows / seconds)
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    for metric in REGISTRY:
+        metric.clear()
+
+
+class ServerTimingMiddleware:
+    """Collects ``stage`` timings per request into a ``Server-Timing`` header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_timings.set([])
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_timings.set([])
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response, started)
+        finally:
+            _request_timings.reset(token)
+
+    @staticmethod
+    def _finish(request, response, started: float):
+        total = time.perf_counter() - started
+        response.headers['Server-Timing'] = server_timing_header(_request_timings.get(), total)
+        match = getattr(request, 'resolver_match', None)
+        REQUEST_SECONDS.observe(total, match.view_name if match else 'unmatched')
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition; 404 unless metrics are enabled. Readable with
+    ``Authorization: Bearer <METRICS_TOKEN>`` or by a logged-in staff user,
+    never anonymously (an empty METRICS_TOKEN leaves staff only).
+    """
+    if not enabled():
+        raise Http404('Metrics are disabled')
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    bearer = token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    user = getattr(request, 'user', None)
+    if not bearer and not (user is not None and user.is_staff):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
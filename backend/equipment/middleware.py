@@ -0,0 +1,42 @@
+"""
+WhiteNoise static file serving that also runs natively under ASGI.
+
+``WhiteNoiseMiddleware`` is sync only, and a single sync middleware makes
+Django run everything below it, views included, on its one shared thread
+under ASGI. This subclass keeps WhiteNoise's lookup and responses and adds the
+async path, streaming files through the offload pool (see ``offload``).
+"""
+from __future__ import annotations
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .offload import iterate_blocking
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        # Django would otherwise read the whole file into memory before sending it.
+        response.streaming_content = iterate_blocking(response.streaming_content)
+        return response
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.11 on 2026-10-17 23:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_existing_reports_ready(apps, schema_editor):
+    Dataset = apps.get_model('equipment', 'Dataset')
+    Dataset.objects.exclude(summary_pdf='').exclude(summary_pdf__isnull=True).update(report_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='report_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=16),
+        ),
+        migrations.RunPython(mark_existing_reports_ready, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField()),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='equipment.dataset')),
+            ],
+            options={
+                'ordering': ['run_after', 'created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='equipment_r_status_947dc3_idx')],
+            },
+        ),
+    ]
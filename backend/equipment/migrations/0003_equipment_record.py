@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-17 23:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_report_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.PositiveIntegerField()),
+                ('equipment_name', models.CharField(blank=True, max_length=255)),
+                ('equipment_type', models.CharField(blank=True, max_length=255)),
+                ('flowrate', models.FloatField(blank=True, null=True)),
+                ('pressure', models.FloatField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='equipment.dataset')),
+            ],
+            options={
+                'ordering': ['row_number'],
+                'indexes': [models.Index(fields=['dataset', 'equipment_type'], name='equipment_e_dataset_9a9ee7_idx'), models.Index(fields=['dataset', 'flowrate'], name='equipment_e_dataset_64bdbe_idx'), models.Index(fields=['dataset', 'pressure'], name='equipment_e_dataset_d36e8a_idx'), models.Index(fields=['dataset', 'temperature'], name='equipment_e_dataset_7d37b1_idx')],
+            },
+        ),
+    ]
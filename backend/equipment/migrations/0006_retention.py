@@ -0,0 +1,41 @@
+# Generated by Django 4.2.11 on 2026-10-17 23:28
+
+from django.db import migrations, models
+
+
+def backfill_data_size(apps, schema_editor):
+    Dataset = apps.get_model('equipment', 'Dataset')
+    for dataset in Dataset.objects.exclude(data_file=''):
+        try:
+            size = dataset.data_file.size
+        except OSError:
+            continue
+        Dataset.objects.filter(pk=dataset.pk).update(data_size=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_dataset_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrphanedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('file', 'Storage file'), ('columnar', 'Columnar sidecar')], default='file', max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='data_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_data_size, migrations.RunPython.noop),
+    ]
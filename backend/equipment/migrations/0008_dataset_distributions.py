@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='distributions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_dataset_distributions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DatasetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uploaded_at', models.DateTimeField()),
+                ('equipment_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('flowrate_sum', models.FloatField(default=0.0)),
+                ('flowrate_count', models.PositiveIntegerField(default=0)),
+                ('pressure_sum', models.FloatField(default=0.0)),
+                ('pressure_count', models.PositiveIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_count', models.PositiveIntegerField(default=0)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='equipment.dataset')),
+            ],
+            options={
+                'ordering': ['uploaded_at'],
+                'indexes': [models.Index(fields=['equipment_type', 'uploaded_at'], name='equipment_d_equipme_cb4e36_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_dataset_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dataset',
+            index=models.Index(fields=['uploaded_at', 'id'], name='equipment_d_uploade_13bd03_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    # Existing datasets all count as changed in version 1.
+    apps.get_model('equipment', 'HistoryVersion').objects.create(pk=1, value=1)
+    apps.get_model('equipment', 'Dataset').objects.update(change_seq=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_dataset_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:55
+
+from django.db import migrations, models
+
+
+def forget_duplicate_hashes(apps, schema_editor):
+    # Racing uploads may already have stored the same content twice; the
+    # newest copy stays the one later uploads are deduplicated against.
+    Dataset = apps.get_model('equipment', 'Dataset')
+    seen = set()
+    for pk, content_sha256 in Dataset.objects.exclude(content_sha256='').order_by('-uploaded_at').values_list(
+        'pk', 'content_sha256'
+    ).iterator():
+        if content_sha256 in seen:
+            Dataset.objects.filter(pk=pk).update(content_sha256='')
+        seen.add(content_sha256)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0011_history_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_duplicate_hashes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dataset',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_sha256', ''), _negated=True), fields=('content_sha256',), name='equipment_dataset_unique_content_sha256'),
+        ),
+    ]
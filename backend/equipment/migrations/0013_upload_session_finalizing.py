@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_dataset_unique_content_sha256'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('open', 'Open'), ('finalizing', 'Finalizing'), ('finalized', 'Finalized')], default='open', max_length=16),
+        ),
+    ]
@@ -1,37 +1,270 @@
+import shutil
 import uuid
-from django.db import models
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+
+from .utils import columnar_dir
+
+# Equipment names and types longer than this are truncated when loaded into
+# the database (the stored CSV and sidecar keep them whole).
+EQUIPMENT_TEXT_MAX_LENGTH = 255
 
 
 class Dataset(models.Model):
     """
     Stores metadata and summary statistics for an uploaded equipment CSV file.
-    Only the five most recent Dataset entries are retained.
+    Old entries are pruned by the retention policies in ``equipment.retention``.
     """
 
+    REPORT_PENDING = 'pending'
+    REPORT_READY = 'ready'
+    REPORT_FAILED = 'failed'
+    REPORT_STATUS_CHOICES = [
+        (REPORT_PENDING, 'Pending'),
+        (REPORT_READY, 'Ready'),
+        (REPORT_FAILED, 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     original_filename = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     data_file = models.FileField(upload_to='datasets/')
+    content_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    data_size = models.PositiveBigIntegerField(default=0)
     total_records = models.PositiveIntegerField(default=0)
     avg_flowrate = models.FloatField(null=True, blank=True)
     avg_pressure = models.FloatField(null=True, blank=True)
     avg_temperature = models.FloatField(null=True, blank=True)
     type_distribution = models.JSONField(default=dict, blank=True)
+    # Per numeric column: a serialised QuantileSketch and a fixed-bin histogram
+    # (see ``equipment.sketches``).
+    distributions = models.JSONField(default=dict, blank=True)
     summary_pdf = models.FileField(upload_to='reports/', null=True, blank=True)
+    report_status = models.CharField(max_length=16, choices=REPORT_STATUS_CHOICES, default=REPORT_PENDING)
+    # The HistoryVersion of the transaction that last changed this row.
+    change_seq = models.BigIntegerField(default=0, db_index=True)
 
     class Meta:
         ordering = ['-uploaded_at']
+        # Keyset pagination of the history walks this index backwards.
+        indexes = [models.Index(fields=['uploaded_at', 'id'])]
+        # One dataset per upload content, even when identical files race.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_sha256'],
+                condition=~models.Q(content_sha256=''),
+                name='equipment_dataset_unique_content_sha256',
+            )
+        ]
 
     def __str__(self) -> str:
         return f"{self.original_filename} ({self.uploaded_at:%Y-%m-%d %H:%M})"
 
+    def as_summary(self) -> dict:
+        return {
+            'total_records': self.total_records,
+            'avg_flowrate': self.avg_flowrate,
+            'avg_pressure': self.avg_pressure,
+            'avg_temperature': self.avg_temperature,
+            'type_distribution': self.type_distribution,
+        }
+
     def delete(self, *args, **kwargs):
         storage = self.data_file.storage if self.data_file else None
         pdf_storage = self.summary_pdf.storage if self.summary_pdf else None
         data_file_name = self.data_file.name if self.data_file else None
         pdf_file_name = self.summary_pdf.name if self.summary_pdf else None
-        super().delete(*args, **kwargs)
+        columns_path = columnar_dir(self.pk)
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            HistoryVersion.bump()
         if storage and data_file_name:
             storage.delete(data_file_name)
         if pdf_storage and pdf_file_name:
             pdf_storage.delete(pdf_file_name)
+        shutil.rmtree(columns_path, ignore_errors=True)
+        return result
+
+
+class HistoryVersion(models.Model):
+    """
+    A single counter row, incremented by every transaction that changes the
+    dataset history (uploads, deletions, report status).
+
+    ``bump`` must be the last statement of the transaction: the row lock is
+    held until commit, so versions are handed out in commit order and a client
+    that has seen version N has seen every change numbered N or lower. The
+    history ETag and the desktop client's incremental sync are built on it.
+    """
+
+    SINGLETON_PK = 1
+
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"History version {self.value}"
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=cls.SINGLETON_PK).values_list('value', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, dataset_ids=()) -> int:
+        """Increment the version and stamp it on ``dataset_ids``. Call inside transaction.atomic()."""
+        if not cls.objects.filter(pk=cls.SINGLETON_PK).update(value=F('value') + 1):
+            # Created by migration 0011; only missing after a flush.
+            cls.objects.get_or_create(pk=cls.SINGLETON_PK, defaults={'value': 1})
+        version = cls.current()
+        if dataset_ids:
+            Dataset.objects.filter(pk__in=list(dataset_ids)).update(change_seq=version)
+        return version
+
+
+class EquipmentRecord(models.Model):
+    """
+    One row of an uploaded CSV, so filters and range queries run in the database.
+    """
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='records')
+    row_number = models.PositiveIntegerField()
+    equipment_name = models.CharField(max_length=EQUIPMENT_TEXT_MAX_LENGTH, blank=True)
+    equipment_type = models.CharField(max_length=EQUIPMENT_TEXT_MAX_LENGTH, blank=True)
+    flowrate = models.FloatField(null=True, blank=True)
+    pressure = models.FloatField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['row_number']
+        indexes = [
+            models.Index(fields=['dataset', 'equipment_type']),
+            models.Index(fields=['dataset', 'flowrate']),
+            models.Index(fields=['dataset', 'pressure']),
+            models.Index(fields=['dataset', 'temperature']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.equipment_name or 'Row'} #{self.row_number} ({self.equipment_type})"
+
+
+class DatasetRollup(models.Model):
+    """
+    Per-dataset aggregates kept for the trends endpoint: one row for the whole
+    dataset (``equipment_type`` is NULL) and one per equipment type.
+
+    Sums and counts rather than means, so rollups from several datasets
+    combine into exact weighted averages with a single SUM query.
+    ``uploaded_at`` is copied from the dataset so trends never join to it.
+    """
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='rollups')
+    uploaded_at = models.DateTimeField()
+    equipment_type = models.CharField(max_length=EQUIPMENT_TEXT_MAX_LENGTH, null=True, blank=True)
+    record_count = models.PositiveIntegerField(default=0)
+    flowrate_sum = models.FloatField(default=0.0)
+    flowrate_count = models.PositiveIntegerField(default=0)
+    pressure_sum = models.FloatField(default=0.0)
+    pressure_count = models.PositiveIntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['uploaded_at']
+        indexes = [models.Index(fields=['equipment_type', 'uploaded_at'])]
+
+    def __str__(self) -> str:
+        return f"Rollup of {self.dataset_id} ({self.equipment_type or 'all types'})"
+
+
+class ReportJob(models.Model):
+    """
+    A queued PDF rendering task for a Dataset, processed by ``run_report_worker``.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='report_jobs')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self) -> str:
+        return f"Report job for {self.dataset_id} ({self.status})"
+
+
+class OrphanedFile(models.Model):
+    """
+    A stored file or sidecar directory whose Dataset row is gone.
+
+    Retention deletes rows in bulk and records their files here; the sweeper
+    removes them from storage later, outside the request.
+    """
+
+    KIND_FILE = 'file'
+    KIND_COLUMNAR = 'columnar'
+    KIND_CHOICES = [
+        (KIND_FILE, 'Storage file'),
+        (KIND_COLUMNAR, 'Columnar sidecar'),
+    ]
+
+    name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=KIND_FILE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self) -> str:
+        return f"{self.kind}: {self.name}"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload: chunks are PUT by offset into a partial file and the
+    CSV is processed like a normal upload once the client finalizes it.
+    """
+
+    OPEN = 'open'
+    FINALIZING = 'finalizing'
+    FINALIZED = 'finalized'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (FINALIZING, 'Finalizing'),
+        (FINALIZED, 'Finalized'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    expected_size = models.PositiveBigIntegerField(null=True, blank=True)
+    received_bytes = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=OPEN)
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.received_bytes} bytes, {self.status})"
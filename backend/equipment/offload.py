@@ -0,0 +1,118 @@
+"""
+Sync views served under ASGI from a bounded thread pool.
+
+Under ASGI Django runs every sync view on one shared thread, so a process
+serves one request at a time however many clients are connected, and it
+buffers a sync ``StreamingHttpResponse`` whole before sending any of it.
+``offloaded(view)`` wraps a sync view in a coroutine; the view is not
+rewritten as async. The event loop reads and writes the sockets (request
+bodies are spooled by Django before the view runs), while the whole sync
+view, parsing, summaries, queries and rendering, runs on a pool of
+ASYNC_OFFLOAD_WORKERS threads. Streaming bodies are pulled from
+their iterator one chunk per pool task, so a slow download holds a socket,
+not a thread.
+
+Each pool thread keeps its own database connection, closed between views as
+Django does between requests. ``ASYNC_OFFLOAD_WORKERS = 0`` runs the work on
+Django's shared thread instead (needed where the database cannot be shared
+between threads, such as in-memory SQLite under the test runner).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+_EXHAUSTED = object()
+
+
+def offload_workers() -> int:
+    return max(0, int(getattr(settings, 'ASYNC_OFFLOAD_WORKERS', 4)))
+
+
+def get_offload_executor(workers: int) -> ThreadPoolExecutor:
+    """A thread pool shared by all requests, recreated if the worker count changes."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='offload')
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_offload_executor() -> None:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+        _executor_workers = 0
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    ``func(*args)`` on the offload pool, in a copy of the caller's context
+    (so ``metrics.stage`` timings reach the request's Server-Timing header).
+    Callers queue once all workers are busy.
+    """
+    workers = offload_workers()
+    if workers == 0:
+        return await sync_to_async(func, thread_sensitive=True)(*args)
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_offload_executor(workers), functools.partial(context.run, func, *args))
+
+
+async def iterate_blocking(iterator: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """Yield each item of a blocking iterator, produced on the offload pool."""
+    iterator = iter(iterator)
+    while True:
+        item = await run_blocking(next, iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+def _respond(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    # DRF responses are rendered here rather than on Django's shared thread.
+    if callable(getattr(response, 'render', None)):
+        response = response.render()
+    return response
+
+
+def _respond_on_pool(view, request, args, kwargs):
+    # Django's request_started/finished handlers only see the shared thread's
+    # connections, so pool threads expire their own.
+    close_old_connections()
+    try:
+        return _respond(view, request, args, kwargs)
+    finally:
+        close_old_connections()
+
+
+def offloaded(view: Callable[..., Any]) -> Callable[..., Any]:
+    """An async version of the sync ``view`` (keeping attributes such as ``csrf_exempt``)."""
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        respond = _respond_on_pool if offload_workers() else _respond
+        response = await run_blocking(respond, view, request, args, kwargs)
+        if response.streaming and not response.is_async:
+            # The sync iterator stays registered for response.close().
+            response.streaming_content = iterate_blocking(response.streaming_content)
+        return response
+
+    return async_view
@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination for the dataset history.
+
+Pages are ordered newest first by ``(uploaded_at, id)`` and a cursor is the
+key of the last row served, so fetching any page is one indexed range query
+no matter how deep it is, and rows uploaded or pruned meanwhile never shift
+later pages. The body stays a plain list (what existing clients expect); the
+next page is advertised in a ``Link: <...>; rel="next"`` header.
+"""
+from __future__ import annotations
+
+import base64
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+HISTORY_PAGE_SIZE = 5
+HISTORY_MAX_PAGE_SIZE = 100
+KEYSET_ORDERING = ('-uploaded_at', '-id')
+
+
+def encode_cursor(uploaded_at: datetime, pk: uuid.UUID) -> str:
+    raw = f'{uploaded_at.isoformat()}|{pk}'.encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of ``encode_cursor``. Raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        stamp, pk = raw.split('|')
+        uploaded_at = parse_datetime(stamp)
+        if uploaded_at is None:
+            raise ValueError(cursor)
+        return uploaded_at, uuid.UUID(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'Invalid cursor {cursor!r}.') from None
+
+
+class HistoryPagination(BasePagination):
+    """``?page_size=N&cursor=<opaque>`` over datasets."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        """The page's rows from ``queryset``, a ``values()`` queryset including id and uploaded_at."""
+        self.request = request
+        self.page_size = self._page_size(request)
+        raw_cursor = request.query_params.get(self.cursor_query_param)
+        queryset = queryset.order_by(*KEYSET_ORDERING)
+        if raw_cursor:
+            try:
+                uploaded_at, pk = decode_cursor(raw_cursor)
+            except ValueError as exc:
+                raise ParseError(str(exc)) from None
+            queryset = queryset.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk))
+        # One extra row tells whether a next page exists without a COUNT.
+        rows = list(queryset[:self.page_size + 1])
+        self.next_cursor: Optional[str] = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            self.next_cursor = encode_cursor(rows[-1]['uploaded_at'], rows[-1]['id'])
+        return rows
+
+    def _page_size(self, request) -> int:
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw is None:
+            return HISTORY_PAGE_SIZE
+        if not raw.isdigit() or not 1 <= int(raw) <= HISTORY_MAX_PAGE_SIZE:
+            raise ParseError(f'page_size must be an integer from 1 to {HISTORY_MAX_PAGE_SIZE}.')
+        return int(raw)
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        response = Response(data)
+        next_link = self.get_next_link()
+        if next_link is not None:
+            response.headers['Link'] = f'<{next_link}>; rel="next"'
+        return response
@@ -0,0 +1,254 @@
+"""
+Parallel summaries for large uncompressed CSVs.
+
+The file is cut into byte ranges at line boundaries, each range is parsed and
+aggregated by a worker process (optionally writing its own columnar sidecar
+part), and the partial ``SummaryAccumulator`` objects are merged in file
+order. Sums are exact and type ties are ordered by label, so the result is
+identical to ``summarize_csv`` on the same file.
+
+A cut is only placed after a newline preceded by an even number of ``"``
+characters, so a quoted field that spans lines is never split.
+"""
+from __future__ import annotations
+
+import io
+import mmap
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .utils import (
+    ColumnarDataset,
+    ColumnarWriter,
+    SummaryAccumulator,
+    _untimed,
+    accumulate_csv,
+)
+
+# Bytes scanned per step when counting quotes up to a cut.
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def parallel_workers() -> int:
+    return max(1, int(getattr(settings, 'SUMMARY_PARALLEL_WORKERS', 1)))
+
+
+def parallel_path(stored_file, compression: Optional[str]) -> Optional[str]:
+    """
+    The local path of ``stored_file`` (a ``Dataset.data_file``) if it should be
+    summarized in parallel: uncompressed, on local storage, at least
+    SUMMARY_PARALLEL_MIN_BYTES, and more than one worker configured. None otherwise.
+    """
+    if compression is not None or parallel_workers() < 2:
+        return None
+    if stored_file.size < getattr(settings, 'SUMMARY_PARALLEL_MIN_BYTES', 64 * 1024 * 1024):
+        return None
+    try:
+        return stored_file.path
+    except NotImplementedError:  # remote storage
+        return None
+
+
+def split_ranges(path, parts: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """
+    Return (header line, byte ranges) covering the rows of the CSV at ``path``
+    in about ``parts`` ranges, each starting at the beginning of a row.
+    """
+    with open(path, 'rb') as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size == 0:
+            return b'', []
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header_end = mapped.find(b'\n') + 1
+            if header_end == 0:
+                return mapped[:], []
+            header = mapped[:header_end]
+            ranges: List[Tuple[int, int]] = []
+            start = scanned = header_end
+            quotes = 0
+            for index in range(1, parts):
+                target = header_end + (size - header_end) * index // parts
+                cut = max(target, start)
+                while cut < size:
+                    newline = mapped.find(b'\n', cut)
+                    if newline == -1:
+                        cut = size
+                        break
+                    cut = newline + 1
+                    quotes += _count_quotes(mapped, scanned, cut)
+                    scanned = cut
+                    if quotes % 2 == 0:
+                        break
+                if cut >= size:
+                    break
+                ranges.append((start, cut))
+                start = cut
+            if start < size:
+                ranges.append((start, size))
+    return header, ranges
+
+
+def _count_quotes(mapped: mmap.mmap, start: int, end: int) -> int:
+    return sum(
+        mapped[block:min(block + SCAN_BLOCK_BYTES, end)].count(b'"')
+        for block in range(start, end, SCAN_BLOCK_BYTES)
+    )
+
+
+class _RangeReader(io.RawIOBase):
+    """A seekable file of ``header`` followed by bytes [start, end) of ``handle``."""
+
+    def __init__(self, handle, header: bytes, start: int, end: int):
+        self._handle = handle
+        self._header = header
+        self._start = start
+        self._length = len(header) + end - start
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self._length}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        wanted = min(len(view), self._length - self._position)
+        if wanted <= 0:
+            return 0
+        header_length = len(self._header)
+        if self._position < header_length:
+            count = min(wanted, header_length - self._position)
+            view[:count] = self._header[self._position:self._position + count]
+        else:
+            self._handle.seek(self._start + self._position - header_length)
+            count = self._handle.readinto(view[:wanted])
+        self._position += count
+        return count
+
+
+def _summarize_range(
+    path: str, header: bytes, start: int, end: int, engine: Optional[str], sidecar: Optional[str]
+) -> SummaryAccumulator:
+    """Worker: aggregate one byte range, writing a sidecar part if asked."""
+    writer = ColumnarWriter(Path(sidecar)) if sidecar else None
+    try:
+        with open(path, 'rb') as handle:
+            stream = io.BufferedReader(_RangeReader(handle, header, start, end))
+            accumulator = accumulate_csv(stream, on_chunk=writer.write if writer else None, engine=engine)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        writer.close()
+    return accumulator
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool shared by all requests, recreated if the worker count
+    changes. Workers are spawned, not forked, so they never inherit the
+    parent's database connections or threads.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        _executor_workers = 0
+
+
+def summarize_csv_parallel(
+    path,
+    workers: Optional[int] = None,
+    writer: Optional[ColumnarWriter] = None,
+    engine: Optional[str] = None,
+    clock: Optional[Callable[[str], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    ``summarize_csv`` for the uncompressed CSV at ``path`` using ``workers``
+    processes (default SUMMARY_PARALLEL_WORKERS). Rows are appended to
+    ``writer`` in file order, exactly as a serial pass would write them.
+    ``clock`` times the 'parse' (all workers) and 'sidecar' (merge) steps.
+    """
+    workers = workers or parallel_workers()
+    clock = clock or _untimed
+    header, ranges = split_ranges(path, workers)
+    if len(ranges) < 2:
+        with open(path, 'rb') as handle:
+            return accumulate_csv(
+                handle, on_chunk=writer.write if writer else None, engine=engine, clock=clock
+            ).result()
+
+    part_dirs = [writer.directory / f'part-{index}' for index in range(len(ranges))] if writer else []
+    try:
+        with clock('parse'):
+            executor = get_executor(workers)
+            futures = [
+                executor.submit(
+                    _summarize_range,
+                    str(path),
+                    header,
+                    start,
+                    end,
+                    engine,
+                    str(part_dirs[index]) if writer else None,
+                )
+                for index, (start, end) in enumerate(ranges)
+            ]
+            try:
+                partials = [future.result() for future in futures]
+            except BrokenProcessPool:
+                shutdown_executor()
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+                # Wait for the rest so no worker is still writing a part below.
+                for future in futures:
+                    if not future.cancelled():
+                        future.exception()
+
+        accumulator = SummaryAccumulator()
+        for partial in partials:
+            accumulator.merge(partial)
+        if writer is not None:
+            with clock('sidecar'):
+                for part_dir in part_dirs:
+                    writer.append(ColumnarDataset(part_dir))
+    finally:
+        for part_dir in part_dirs:
+            shutil.rmtree(part_dir, ignore_errors=True)
+    return accumulator.result()
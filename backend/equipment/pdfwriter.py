@@ -0,0 +1,225 @@
+"""
+A minimal PDF writer that streams each page to the output file as it is
+finished.
+
+ReportLab's canvas keeps every page of a document in memory until ``save``;
+reports for datasets with thousands of types made that the largest allocation
+of the worker. ``PdfStreamWriter`` writes a page's compressed content stream
+and page object immediately and keeps only object offsets and page ids, so
+memory is bounded by one page. Fonts are the standard Helvetica faces (not
+embedded) and repeated page furniture is drawn from a shared Form XObject.
+
+``Page`` collects drawing operators for one page: text, rectangles, lines and
+pie wedges, all as vector paths.
+"""
+from __future__ import annotations
+
+import math
+import zlib
+from functools import lru_cache
+from typing import BinaryIO, Dict, List, Sequence, Tuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+Color = Tuple[float, float, float]
+
+# Resource name -> base font. Metrics come from ReportLab's built-in AFM data.
+FONTS = {'F1': 'Helvetica', 'F2': 'Helvetica-Bold'}
+_FONT_BY_NAME = {base: name for name, base in FONTS.items()}
+COMPRESSION_LEVEL = 6
+
+
+def _number(value: float) -> str:
+    # PDF has no NaN or infinity; geometry derived from missing data collapses to 0.
+    if not math.isfinite(value):
+        return '0'
+    return f'{value:.2f}'.rstrip('0').rstrip('.') if value != int(value) else str(int(value))
+
+
+def escape_text(text: str) -> bytes:
+    """Encode ``text`` for a WinAnsi string literal; unmappable characters become '?'."""
+    encoded = text.encode('cp1252', errors='replace')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'').replace(b'\n', b' ')
+
+
+@lru_cache(maxsize=4096)
+def text_width(text: str, font: str, size: float) -> float:
+    return stringWidth(text, font, size)
+
+
+def fit_text(text: str, font: str, size: float, width: float) -> str:
+    """``text`` shortened with an ellipsis so it fits in ``width`` points."""
+    if text_width(text, font, size) <= width:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(text[:middle] + '...', font, size) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '...'
+
+
+class Page:
+    """Drawing operators for one page (or one Form XObject)."""
+
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+        self._operators: List[bytes] = []
+
+    def content(self) -> bytes:
+        return b'\n'.join(self._operators)
+
+    def _emit(self, operator: str) -> None:
+        self._operators.append(operator.encode('ascii'))
+
+    def fill_color(self, color: Color) -> None:
+        self._emit(' '.join(_number(channel) for channel in color) + ' rg')
+
+    def stroke_color(self, color: Color) -> None:
+        self._emit(' '.join(_number(channel) for channel in color) + ' RG')
+
+    def text(self, x: float, y: float, text: str, font: str = 'Helvetica', size: float = 10, align: str = 'left') -> None:
+        if align != 'left':
+            offset = text_width(text, font, size)
+            x -= offset if align == 'right' else offset / 2
+        self._operators.append(
+            f'BT /{_FONT_BY_NAME[font]} {_number(size)} Tf {_number(x)} {_number(y)} Td ('.encode('ascii')
+            + escape_text(text)
+            + b') Tj ET'
+        )
+
+    def rect(self, x: float, y: float, width: float, height: float, fill: bool = True) -> None:
+        self._emit(f'{_number(x)} {_number(y)} {_number(width)} {_number(height)} re {"f" if fill else "S"}')
+
+    def line(self, x1: float, y1: float, x2: float, y2: float, width: float = 0.5) -> None:
+        self._emit(f'{_number(width)} w {_number(x1)} {_number(y1)} m {_number(x2)} {_number(y2)} l S')
+
+    def wedge(self, cx: float, cy: float, radius: float, start: float, extent: float) -> None:
+        """Filled pie slice from ``start`` degrees, ``extent`` degrees counter-clockwise."""
+        angle = math.radians(start)
+        rim = f'{_number(cx + radius * math.cos(angle))} {_number(cy + radius * math.sin(angle))}'
+        if extent >= 359.999:
+            parts = [f'{rim} m']
+        else:
+            parts = [f'{_number(cx)} {_number(cy)} m', f'{rim} l']
+        segments = max(1, math.ceil(extent / 90))
+        step = math.radians(extent) / segments
+        control = 4 / 3 * math.tan(step / 4) * radius
+        for _ in range(segments):
+            end = angle + step
+            parts.append(' '.join(_number(value) for value in (
+                cx + radius * math.cos(angle) - control * math.sin(angle),
+                cy + radius * math.sin(angle) + control * math.cos(angle),
+                cx + radius * math.cos(end) + control * math.sin(end),
+                cy + radius * math.sin(end) - control * math.cos(end),
+                cx + radius * math.cos(end),
+                cy + radius * math.sin(end),
+            )) + ' c')
+            angle = end
+        parts.append('h f')
+        self._emit(' '.join(parts))
+
+    def draw_template(self, name: str) -> None:
+        self._emit(f'/{name} Do')
+
+
+class PdfStreamWriter:
+    """
+    Writes a PDF to ``handle`` incrementally: ``add_template`` and
+    ``add_page`` write their objects immediately; ``close`` writes the page
+    tree, shared resources, cross-reference table and trailer.
+    """
+
+    def __init__(self, handle: BinaryIO, page_size: Sequence[float] = letter):
+        self._handle = handle
+        self.width, self.height = page_size
+        self._offsets: Dict[int, int] = {}
+        self._next_id = 1
+        self._page_ids: List[int] = []
+        self._templates: Dict[str, int] = {}
+        self._position = 0
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._catalog_id = self._reserve()
+        self._pages_id = self._reserve()
+        self._resources_id = self._reserve()
+        self._font_ids = {}
+        for name, base in FONTS.items():
+            font_id = self._reserve()
+            self._object(font_id, _font_object(base))
+            self._font_ids[name] = font_id
+
+    def _write(self, data: bytes) -> None:
+        self._handle.write(data)
+        self._position += len(data)
+
+    def _reserve(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _object(self, object_id: int, body: bytes) -> None:
+        self._offsets[object_id] = self._position
+        self._write(b'%d 0 obj\n' % object_id + body + b'\nendobj\n')
+
+    def _stream(self, object_id: int, dictionary: bytes, content: bytes) -> None:
+        compressed = zlib.compress(content, COMPRESSION_LEVEL)
+        self._object(
+            object_id,
+            b'<< ' + dictionary + b' /Filter /FlateDecode /Length %d >>\nstream\n' % len(compressed)
+            + compressed + b'\nendstream',
+        )
+
+    def new_page(self) -> Page:
+        return Page(self.width, self.height)
+
+    def add_template(self, name: str, content: bytes) -> None:
+        """Register a Form XObject that pages draw with ``Page.draw_template(name)``."""
+        template_id = self._reserve()
+        self._stream(
+            template_id,
+            b'/Type /XObject /Subtype /Form /BBox [0 0 %s %s] /Resources %d 0 R'
+            % (_number(self.width).encode(), _number(self.height).encode(), self._resources_id),
+            content,
+        )
+        self._templates[name] = template_id
+
+    def add_page(self, page: Page) -> None:
+        content_id = self._reserve()
+        self._stream(content_id, b'', page.content())
+        page_id = self._reserve()
+        self._object(
+            page_id,
+            b'<< /Type /Page /Parent %d 0 R /Resources %d 0 R /Contents %d 0 R >>'
+            % (self._pages_id, self._resources_id, content_id),
+        )
+        self._page_ids.append(page_id)
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def close(self) -> None:
+        fonts = b' '.join(b'/%s %d 0 R' % (name.encode(), font_id) for name, font_id in self._font_ids.items())
+        xobjects = b' '.join(b'/%s %d 0 R' % (name.encode(), template_id) for name, template_id in self._templates.items())
+        self._object(self._resources_id, b'<< /Font << %s >> /XObject << %s >> >>' % (fonts, xobjects))
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self._page_ids)
+        self._object(
+            self._pages_id,
+            b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 %s %s] >>'
+            % (kids, len(self._page_ids), _number(self.width).encode(), _number(self.height).encode()),
+        )
+        self._object(self._catalog_id, b'<< /Type /Catalog /Pages %d 0 R >>' % self._pages_id)
+        xref_offset = self._position
+        lines = [b'xref\n0 %d\n' % self._next_id, b'0000000000 65535 f \n']
+        lines.extend(b'%010d 00000 n \n' % self._offsets[object_id] for object_id in range(1, self._next_id))
+        self._write(b''.join(lines))
+        self._write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self._next_id, self._catalog_id, xref_offset))
+
+
+@lru_cache(maxsize=None)
+def _font_object(base: str) -> bytes:
+    return b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base.encode()
@@ -0,0 +1,312 @@
+"""
+Dataset summary reports.
+
+``write_report`` lays out a report as it streams it through
+``PdfStreamWriter``. The first page holds the key metrics, a pie chart of the
+type mix and a bar chart of the most common types. It is followed by a
+per-type table that spans as many pages as needed. The type rows are consumed
+from an iterator, one page at a time, so memory does not grow with the number
+of types. The page furniture (header band, rules) is compiled once per process
+and shared by every page as a Form XObject.
+
+``render_report`` writes a dataset's report to a temporary file under
+MEDIA_ROOT, which storage then moves into place without copying.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.files import File
+from reportlab.lib.pagesizes import letter
+
+from .pdfwriter import Page, PdfStreamWriter, fit_text
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 50
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+HEADER_HEIGHT = 28
+TEXT_COLOR = (0.13, 0.15, 0.2)
+MUTED_COLOR = (0.45, 0.48, 0.55)
+RULE_COLOR = (0.8, 0.82, 0.86)
+STRIPE_COLOR = (0.95, 0.96, 0.97)
+PALETTE = [
+    (0.23, 0.47, 0.85), (0.96, 0.55, 0.16), (0.2, 0.66, 0.4), (0.86, 0.26, 0.27),
+    (0.55, 0.4, 0.78), (0.55, 0.36, 0.3), (0.89, 0.47, 0.76), (0.5, 0.5, 0.5),
+]
+OTHER_COLOR = (0.75, 0.76, 0.78)
+PIE_SLICES = len(PALETTE)
+BAR_TYPES = 12
+TABLE_ROW_HEIGHT = 15
+TABLE_COLUMNS = (
+    # (heading, x position, alignment); numbers are right-aligned at x.
+    ('Type', MARGIN + 4, 'left'),
+    ('Records', MARGIN + 250, 'right'),
+    ('Share', MARGIN + 305, 'right'),
+    ('Avg flowrate', MARGIN + 375, 'right'),
+    ('Avg pressure', MARGIN + 443, 'right'),
+    ('Avg temp.', MARGIN + CONTENT_WIDTH - 4, 'right'),
+)
+TYPE_COLUMN_WIDTH = 180
+TEMPLATE = 'Page'
+
+
+class TypeRow(NamedTuple):
+    equipment_type: str
+    records: int
+    avg_flowrate: Optional[float] = None
+    avg_pressure: Optional[float] = None
+    avg_temperature: Optional[float] = None
+
+
+@lru_cache(maxsize=None)
+def _page_template() -> bytes:
+    """Header band and footer rule shared by every page of every report."""
+    page = Page(PAGE_WIDTH, PAGE_HEIGHT)
+    page.fill_color((0.16, 0.29, 0.48))
+    page.rect(0, PAGE_HEIGHT - HEADER_HEIGHT, PAGE_WIDTH, HEADER_HEIGHT)
+    page.fill_color((1, 1, 1))
+    page.text(MARGIN, PAGE_HEIGHT - 18, 'Chemical Equipment Summary Report', 'Helvetica-Bold', 10)
+    page.stroke_color(RULE_COLOR)
+    page.line(MARGIN, MARGIN - 12, PAGE_WIDTH - MARGIN, MARGIN - 12)
+    return page.content()
+
+
+def _format(value: Any) -> str:
+    if value is None:
+        return 'N/A'
+    if isinstance(value, float):
+        return f'{value:,.2f}'
+    if isinstance(value, int):
+        return f'{value:,}'
+    return str(value)
+
+
+class _ReportPages:
+    def __init__(self, writer: PdfStreamWriter, dataset_name: str):
+        self.writer = writer
+        self.dataset_name = dataset_name
+        self.page: Optional[Page] = None
+
+    def start(self) -> Page:
+        self.page = self.writer.new_page()
+        self.page.draw_template(TEMPLATE)
+        self.page.fill_color(MUTED_COLOR)
+        self.page.text(MARGIN, MARGIN - 26, fit_text(self.dataset_name, 'Helvetica', 8, 380), 'Helvetica', 8)
+        self.page.text(
+            PAGE_WIDTH - MARGIN, MARGIN - 26, f'Page {self.writer.page_count + 1}', 'Helvetica', 8, align='right'
+        )
+        self.page.fill_color(TEXT_COLOR)
+        return self.page
+
+    def finish(self) -> None:
+        if self.page is not None:
+            self.writer.add_page(self.page)
+            self.page = None
+
+
+def _draw_metrics(page: Page, summary: Dict[str, Any], top: float) -> float:
+    cards = [
+        ('Total records', summary.get('total_records', 0)),
+        ('Avg flowrate', summary.get('avg_flowrate')),
+        ('Avg pressure', summary.get('avg_pressure')),
+        ('Avg temperature', summary.get('avg_temperature')),
+    ]
+    gap = 10
+    width = (CONTENT_WIDTH - gap * (len(cards) - 1)) / len(cards)
+    for index, (label, value) in enumerate(cards):
+        x = MARGIN + index * (width + gap)
+        page.fill_color(STRIPE_COLOR)
+        page.rect(x, top - 48, width, 48)
+        page.fill_color(MUTED_COLOR)
+        page.text(x + 8, top - 16, label, 'Helvetica', 8)
+        page.fill_color(TEXT_COLOR)
+        page.text(x + 8, top - 37, fit_text(_format(value), 'Helvetica-Bold', 15, width - 16), 'Helvetica-Bold', 15)
+    return top - 48
+
+
+def _pie_slices(distribution: Dict[str, int]) -> List[tuple]:
+    ranked = sorted(distribution.items(), key=lambda item: (-item[1], item[0]))
+    slices = [(label, count, PALETTE[index]) for index, (label, count) in enumerate(ranked[:PIE_SLICES - 1])]
+    rest = ranked[PIE_SLICES - 1:]
+    if len(rest) == 1:
+        slices.append((rest[0][0], rest[0][1], PALETTE[PIE_SLICES - 1]))
+    elif rest:
+        slices.append((f'Other ({len(rest):,} types)', sum(count for _, count in rest), OTHER_COLOR))
+    return slices
+
+
+def _draw_pie(page: Page, distribution: Dict[str, int], top: float) -> float:
+    total = sum(distribution.values())
+    radius = 70
+    cx, cy = MARGIN + radius, top - radius
+    start = 90.0
+    slices = _pie_slices(distribution)
+    for label, count, color in slices:
+        extent = 360.0 * count / total
+        page.fill_color(color)
+        page.wedge(cx, cy, radius, start - extent, extent)
+        start -= extent
+    legend_y = top - 10
+    for label, count, color in slices:
+        page.fill_color(color)
+        page.rect(MARGIN + 2 * radius + 30, legend_y - 1, 8, 8)
+        page.fill_color(TEXT_COLOR)
+        page.text(MARGIN + 2 * radius + 44, legend_y, fit_text(label, 'Helvetica', 9, 200), 'Helvetica', 9)
+        page.text(PAGE_WIDTH - MARGIN, legend_y, f'{count:,} ({100 * count / total:.1f}%)', 'Helvetica', 9, align='right')
+        legend_y -= 16
+    return top - 2 * radius
+
+
+def _draw_bars(page: Page, distribution: Dict[str, int], top: float) -> float:
+    ranked = sorted(distribution.items(), key=lambda item: (-item[1], item[0]))[:BAR_TYPES]
+    largest = ranked[0][1] or 1
+    label_width = 130
+    bar_left = MARGIN + label_width + 6
+    bar_space = CONTENT_WIDTH - label_width - 60
+    y = top
+    for index, (label, count) in enumerate(ranked):
+        y -= 18
+        page.fill_color(TEXT_COLOR)
+        page.text(MARGIN + label_width, y + 3, fit_text(label, 'Helvetica', 9, label_width), 'Helvetica', 9, align='right')
+        page.fill_color(PALETTE[index % len(PALETTE)])
+        page.rect(bar_left, y, max(bar_space * count / largest, 1), 12)
+        page.fill_color(TEXT_COLOR)
+        page.text(bar_left + bar_space * count / largest + 4, y + 3, f'{count:,}', 'Helvetica', 8)
+    return y
+
+
+def _table_header(page: Page, y: float) -> float:
+    page.fill_color(TEXT_COLOR)
+    for heading, x, align in TABLE_COLUMNS:
+        page.text(x, y, heading, 'Helvetica-Bold', 9, align=align)
+    page.stroke_color(RULE_COLOR)
+    page.line(MARGIN, y - 5, PAGE_WIDTH - MARGIN, y - 5)
+    return y - TABLE_ROW_HEIGHT - 2
+
+
+def _table_rows(pages: _ReportPages, rows: Iterator[TypeRow], total: int, top: float) -> None:
+    page = pages.page
+    y = _table_header(page, top)
+    for index, row in enumerate(rows):
+        if y < MARGIN:
+            pages.finish()
+            page = pages.start()
+            y = _table_header(page, PAGE_HEIGHT - HEADER_HEIGHT - 30)
+        if index % 2:
+            page.fill_color(STRIPE_COLOR)
+            page.rect(MARGIN, y - 4, CONTENT_WIDTH, TABLE_ROW_HEIGHT)
+        page.fill_color(TEXT_COLOR)
+        share = f'{100 * row.records / total:.1f}%' if total else 'N/A'
+        cells = (
+            fit_text(row.equipment_type or '(blank)', 'Helvetica', 9, TYPE_COLUMN_WIDTH),
+            _format(row.records),
+            share,
+            _format(row.avg_flowrate),
+            _format(row.avg_pressure),
+            _format(row.avg_temperature),
+        )
+        for value, (_, x, align) in zip(cells, TABLE_COLUMNS):
+            page.text(x, y, value, 'Helvetica', 9, align=align)
+        y -= TABLE_ROW_HEIGHT
+
+
+def write_report(
+    handle: BinaryIO,
+    summary: Dict[str, Any],
+    dataset_name: str,
+    type_rows: Optional[Iterable[TypeRow]] = None,
+    generated_at: Optional[datetime] = None,
+) -> int:
+    """
+    Write the report PDF to ``handle`` and return its page count.
+
+    ``type_rows`` (ordered by record count, descending) fills the per-type
+    table; without it the table lists ``summary['type_distribution']``.
+    """
+    writer = PdfStreamWriter(handle, letter)
+    writer.add_template(TEMPLATE, _page_template())
+    pages = _ReportPages(writer, dataset_name)
+    page = pages.start()
+
+    y = PAGE_HEIGHT - HEADER_HEIGHT - 36
+    page.text(MARGIN, y, fit_text(dataset_name, 'Helvetica-Bold', 18, CONTENT_WIDTH), 'Helvetica-Bold', 18)
+    y -= 18
+    page.fill_color(MUTED_COLOR)
+    page.text(MARGIN, y, f"Generated {generated_at or datetime.utcnow():%Y-%m-%d %H:%M} UTC", 'Helvetica', 9)
+    page.fill_color(TEXT_COLOR)
+    y = _draw_metrics(page, summary, y - 16) - 30
+
+    page.text(MARGIN, y, 'Equipment Type Distribution', 'Helvetica-Bold', 13)
+    y -= 16
+    distribution = summary.get('type_distribution') or {}
+    if not distribution or not sum(distribution.values()):
+        page.text(MARGIN, y - 4, 'No type information available.', 'Helvetica', 10)
+        pages.finish()
+        writer.close()
+        return writer.page_count
+
+    y = _draw_pie(page, distribution, y) - 24
+    page.text(MARGIN, y, f'Most common types (top {min(BAR_TYPES, len(distribution))})', 'Helvetica-Bold', 11)
+    _draw_bars(page, distribution, y - 4)
+    pages.finish()
+
+    page = pages.start()
+    page.text(MARGIN, PAGE_HEIGHT - HEADER_HEIGHT - 30, 'Per-type breakdown', 'Helvetica-Bold', 13)
+    if type_rows is None:
+        ranked = sorted(distribution.items(), key=lambda item: (-item[1], item[0]))
+        type_rows = (TypeRow(label, count) for label, count in ranked)
+    _table_rows(pages, iter(type_rows), sum(distribution.values()), PAGE_HEIGHT - HEADER_HEIGHT - 54)
+    pages.finish()
+    writer.close()
+    return writer.page_count
+
+
+def dataset_type_rows(dataset, batch_size: int = 2000) -> Optional[Iterator[TypeRow]]:
+    """Per-type rows from the dataset's rollups, or None if it has none."""
+    rollups = dataset.rollups.filter(equipment_type__isnull=False).order_by('-record_count', 'equipment_type')
+    if not rollups.exists():
+        return None
+
+    def mean(total, count):
+        return round(total / count, 2) if count else None
+
+    fields = (
+        'equipment_type', 'record_count', 'flowrate_sum', 'flowrate_count',
+        'pressure_sum', 'pressure_count', 'temperature_sum', 'temperature_count',
+    )
+    return (
+        TypeRow(label, records, mean(flow_sum, flow_count), mean(pressure_sum, pressure_count), mean(temp_sum, temp_count))
+        for label, records, flow_sum, flow_count, pressure_sum, pressure_count, temp_sum, temp_count
+        in rollups.values_list(*fields).iterator(chunk_size=batch_size)
+    )
+
+
+class RenderedReport(File):
+    """A finished report on disk; storage moves it into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def render_report(dataset) -> RenderedReport:
+    """
+    Render ``dataset``'s report into a temporary file next to MEDIA_ROOT's
+    contents (so saving it is a rename) and return it open for reading.
+    The caller saves it to storage, which removes the temporary file.
+    """
+    directory = Path(settings.MEDIA_ROOT) / 'reports'
+    directory.mkdir(parents=True, exist_ok=True)
+    descriptor, path = tempfile.mkstemp(dir=directory, prefix='.render-', suffix='.pdf')
+    try:
+        with os.fdopen(descriptor, 'wb') as handle:
+            write_report(handle, dataset.as_summary(), dataset.original_filename, dataset_type_rows(dataset))
+    except BaseException:
+        os.unlink(path)
+        raise
+    return RenderedReport(open(path, 'rb'), name=os.path.basename(path))
@@ -0,0 +1,111 @@
+"""
+Dataset retention.
+
+Policies (all optional, configured in settings):
+
+* ``DATASET_RETENTION_MAX_COUNT``       keep only the newest N datasets
+* ``DATASET_RETENTION_MAX_AGE_DAYS``    drop datasets older than N days
+* ``DATASET_RETENTION_MAX_TOTAL_BYTES`` keep the newest datasets whose uploads fit in N bytes
+
+An upload is never evicted by its own request: it still counts towards the
+policies, so older datasets make room for it, but it is passed as ``keep``.
+
+``enforce_retention`` selects every expired dataset with set-based queries and
+deletes them in one transaction, serialized by an advisory lock on PostgreSQL.
+Their files are recorded as OrphanedFile rows and removed from storage in
+batches by ``sweep_orphaned_files`` (run by the background worker).
+"""
+from __future__ import annotations
+
+import logging
+import shutil
+from datetime import timedelta
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Sum, Window
+from django.utils import timezone
+
+from .models import Dataset, HistoryVersion, OrphanedFile
+from .utils import columnar_dir
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key for pg_advisory_xact_lock.
+RETENTION_LOCK_KEY = 0x45515550
+SWEEP_BATCH_SIZE = 200
+
+
+def _setting(name: str) -> Optional[int]:
+    value = getattr(settings, name, None)
+    return int(value) if value not in (None, '') else None
+
+
+def _lock() -> None:
+    # SQLite already serializes writers; PostgreSQL needs an explicit lock so
+    # concurrent uploads don't compute overlapping victim sets.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [RETENTION_LOCK_KEY])
+
+
+def expired_dataset_ids(keep: Iterable = ()) -> List:
+    newest_first = Dataset.objects.order_by('-uploaded_at', '-pk')
+    expired = set()
+
+    max_count = _setting('DATASET_RETENTION_MAX_COUNT')
+    if max_count is not None:
+        expired.update(newest_first.values_list('pk', flat=True)[max_count:])
+
+    max_age_days = _setting('DATASET_RETENTION_MAX_AGE_DAYS')
+    if max_age_days is not None:
+        cutoff = timezone.now() - timedelta(days=max_age_days)
+        expired.update(Dataset.objects.filter(uploaded_at__lt=cutoff).values_list('pk', flat=True))
+
+    max_total_bytes = _setting('DATASET_RETENTION_MAX_TOTAL_BYTES')
+    if max_total_bytes is not None:
+        running = newest_first.annotate(
+            running_bytes=Window(Sum('data_size'), order_by=[F('uploaded_at').desc(), F('pk').desc()])
+        ).values_list('pk', 'running_bytes')
+        expired.update(pk for pk, running_bytes in running if running_bytes > max_total_bytes)
+
+    return list(expired.difference(keep))
+
+
+def enforce_retention(keep: Iterable = ()) -> int:
+    """
+    Delete every dataset outside the configured policies, except those in
+    ``keep``. Returns the count.
+    """
+    with transaction.atomic():
+        _lock()
+        expired = expired_dataset_ids(keep)
+        if not expired:
+            return 0
+        victims = Dataset.objects.filter(pk__in=expired)
+        orphans = []
+        for pk, data_file, summary_pdf in victims.values_list('pk', 'data_file', 'summary_pdf'):
+            orphans.extend(OrphanedFile(name=name) for name in (data_file, summary_pdf) if name)
+            orphans.append(OrphanedFile(name=str(pk), kind=OrphanedFile.KIND_COLUMNAR))
+        OrphanedFile.objects.bulk_create(orphans)
+        # Records and report jobs cascade as single DELETE ... WHERE IN queries.
+        victims.delete()
+        HistoryVersion.bump()
+    return len(expired)
+
+
+def sweep_orphaned_files(batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Remove one batch of orphaned files from storage. Returns how many were handled."""
+    batch = list(OrphanedFile.objects.order_by('created_at')[:batch_size])
+    for orphan in batch:
+        try:
+            if orphan.kind == OrphanedFile.KIND_COLUMNAR:
+                shutil.rmtree(columnar_dir(orphan.name), ignore_errors=True)
+            else:
+                default_storage.delete(orphan.name)
+        except Exception:  # pragma: no cover - storage specific
+            logger.exception('Could not remove orphaned %s', orphan)
+    OrphanedFile.objects.filter(pk__in=[orphan.pk for orphan in batch]).delete()
+    return len(batch)
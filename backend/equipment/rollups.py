@@ -0,0 +1,193 @@
+"""
+Precomputed per-dataset rollups and the cross-dataset trend queries they serve.
+
+``store_rollups`` runs at ingest, inside the upload transaction, and reads the
+columnar sidecar (never the CSV): one ``DatasetRollup`` row for the whole
+dataset plus one per equipment type, each holding record counts and per-column
+sums and counts. ``trend_points`` combines those rows per dataset or per
+calendar period with one aggregate query per series, so its cost depends on
+the number of datasets kept by retention, not on their size.
+"""
+from __future__ import annotations
+
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import EQUIPMENT_TEXT_MAX_LENGTH, Dataset, DatasetRollup
+from .utils import COLUMNAR_NUMERIC, ColumnarDataset, ColumnarWriter, summarize_csv
+
+MISSING_TYPE = 'Unknown'
+TREND_BUCKETS = {
+    'dataset': None,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+TREND_DEFAULT_LIMIT = 100
+TREND_MAX_LIMIT = 1000
+
+
+def build_rollups(dataset: Dataset, columnar: ColumnarDataset) -> List[DatasetRollup]:
+    """Unsaved rollup rows for ``dataset`` from its sidecar."""
+    if 'Type' in columnar.columns:
+        # Code -1 (missing) moves to group 0; categories shift up by one.
+        groups = columnar.codes('Type').astype(np.int64) + 1
+        labels = [MISSING_TYPE] + columnar.categories('Type')
+    else:
+        groups = np.zeros(columnar.num_rows, dtype=np.int64)
+        labels = [MISSING_TYPE]
+    size = len(labels)
+    records = np.bincount(groups, minlength=size)
+    totals = {}
+    for column in COLUMNAR_NUMERIC:
+        if column in columnar.columns:
+            values = columnar.numeric(column)
+            valid = np.isfinite(values)
+            sums = np.bincount(groups, weights=np.where(valid, values, 0.0), minlength=size)
+            counts = np.bincount(groups, weights=valid, minlength=size).astype(np.int64)
+        else:
+            sums = np.zeros(size)
+            counts = np.zeros(size, dtype=np.int64)
+        totals[column.lower()] = (sums, counts)
+
+    by_type: Dict[str, Dict[str, Any]] = {}
+    for index, label in enumerate(labels):
+        if not records[index]:
+            continue
+        # A literal "Unknown" category folds into the missing-type group, and
+        # types are truncated as in EquipmentRecord (so equal prefixes merge).
+        entry = by_type.setdefault(label[:EQUIPMENT_TEXT_MAX_LENGTH], {'record_count': 0})
+        entry['record_count'] += int(records[index])
+        for column, (sums, counts) in totals.items():
+            entry[f'{column}_sum'] = entry.get(f'{column}_sum', 0.0) + float(sums[index])
+            entry[f'{column}_count'] = entry.get(f'{column}_count', 0) + int(counts[index])
+
+    overall = {'record_count': columnar.num_rows}
+    for column, (sums, counts) in totals.items():
+        overall[f'{column}_sum'] = float(sums.sum())
+        overall[f'{column}_count'] = int(counts.sum())
+    rows = [DatasetRollup(dataset=dataset, uploaded_at=dataset.uploaded_at, equipment_type=None, **overall)]
+    rows.extend(
+        DatasetRollup(dataset=dataset, uploaded_at=dataset.uploaded_at, equipment_type=label, **fields)
+        for label, fields in by_type.items()
+    )
+    return rows
+
+
+def store_rollups(dataset: Dataset, columnar: ColumnarDataset) -> int:
+    """Replace ``dataset``'s rollups. Returns the number of rows written."""
+    rows = build_rollups(dataset, columnar)
+    DatasetRollup.objects.filter(dataset=dataset).delete()
+    DatasetRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_rollups(dataset: Dataset, columnar: Optional[ColumnarDataset]) -> int:
+    """
+    Backfill for datasets uploaded before rollups existed. Without a sidecar
+    the CSV is parsed once into a temporary one.
+    """
+    if columnar is not None:
+        return store_rollups(dataset, columnar)
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ColumnarWriter(directory)
+        with dataset.data_file.open('rb') as handle:
+            summarize_csv(handle, on_chunk=writer.write)
+        writer.close()
+        return store_rollups(dataset, ColumnarDataset(directory))
+
+
+def _mean(total: Optional[float], count: Optional[int]) -> Optional[float]:
+    return round(total / count, 2) if count else None
+
+
+def _series(rollups, bucket: str, by_type: bool = False):
+    truncate = TREND_BUCKETS[bucket]
+    group = ['equipment_type'] if by_type else []
+    if truncate is None:
+        rows = rollups.annotate(period=F('uploaded_at')).values('dataset_id', 'period', *group)
+    else:
+        rows = rollups.annotate(period=truncate('uploaded_at')).values('period', *group)
+    return rows.annotate(
+        records=Sum('record_count'),
+        flowrate_sum_total=Sum('flowrate_sum'),
+        flowrate_count_total=Sum('flowrate_count'),
+        pressure_sum_total=Sum('pressure_sum'),
+        pressure_count_total=Sum('pressure_count'),
+        temperature_sum_total=Sum('temperature_sum'),
+        temperature_count_total=Sum('temperature_count'),
+    )
+
+
+def _averages(row: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    return {
+        f'avg_{column}': _mean(row[f'{column}_sum_total'], row[f'{column}_count_total'])
+        for column in ('flowrate', 'pressure', 'temperature')
+    }
+
+
+def _period_key(row: Dict[str, Any]):
+    return row['dataset_id'] if 'dataset_id' in row else row['period']
+
+
+def trend_points(
+    bucket: str = 'dataset',
+    equipment_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = TREND_DEFAULT_LIMIT,
+) -> List[Dict[str, Any]]:
+    """
+    Oldest-first points for the newest ``limit`` datasets or periods.
+
+    Without ``equipment_type`` each point has the overall averages and the
+    record count per type; with it, the averages of that type alone and its
+    share of all records in the period.
+    """
+    rollups = DatasetRollup.objects.all()
+    if since is not None:
+        rollups = rollups.filter(uploaded_at__gte=since)
+    if until is not None:
+        rollups = rollups.filter(uploaded_at__lt=until)
+
+    totals = list(_series(rollups.filter(equipment_type__isnull=True), bucket).order_by('-period')[:limit])
+    if not totals:
+        return []
+    totals.reverse()
+    # Only the periods kept above are needed from the per-type series.
+    window = rollups.filter(uploaded_at__gte=totals[0]['period'])
+    if equipment_type is not None:
+        typed = _series(window.filter(equipment_type=equipment_type), bucket)
+    else:
+        typed = _series(window.filter(equipment_type__isnull=False), bucket, by_type=True)
+    by_period: Dict[Any, List[Dict[str, Any]]] = {}
+    for row in typed:
+        by_period.setdefault(_period_key(row), []).append(row)
+
+    points = []
+    for total in totals:
+        key = _period_key(total)
+        point: Dict[str, Any] = {'period': total['period']}
+        if 'dataset_id' in total:
+            point['dataset'] = str(total['dataset_id'])
+        typed_rows = by_period.get(key, [])
+        if equipment_type is not None:
+            row = typed_rows[0] if typed_rows else None
+            records = row['records'] if row else 0
+            point['records'] = records
+            point.update(_averages(row) if row else {'avg_flowrate': None, 'avg_pressure': None, 'avg_temperature': None})
+            point['share'] = round(records / total['records'], 4) if total['records'] else None
+        else:
+            point['records'] = total['records']
+            point.update(_averages(total))
+            point['type_mix'] = {
+                row['equipment_type']: row['records']
+                for row in sorted(typed_rows, key=lambda row: (-row['records'], row['equipment_type']))
+            }
+        points.append(point)
+    return points
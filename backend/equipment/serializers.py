@@ -1,24 +1,80 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.db.models.fields.files import FieldFile
 from rest_framework import serializers
-from .models import Dataset
+from .models import Dataset, UploadSession
 
 
 class DatasetSerializer(serializers.ModelSerializer):
+    """Pass ``fields`` to serialize a subset of the fields (a sparse fieldset)."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Dataset
         fields = [
             'id',
             'original_filename',
             'uploaded_at',
+            'updated_at',
             'total_records',
             'avg_flowrate',
             'avg_pressure',
             'avg_temperature',
             'type_distribution',
             'summary_pdf',
+            'report_status',
+            'content_sha256',
         ]
         read_only_fields = fields
 
 
+def _value_converter(field: serializers.Field) -> Callable[[Any], Any]:
+    """``field.to_representation`` for a raw ``values()`` column."""
+    if isinstance(field, serializers.FileField):
+        # values() gives the stored name; DRF builds the URL from a FieldFile.
+        model_field = Dataset._meta.get_field(field.source)
+        return lambda name: field.to_representation(FieldFile(None, model_field, name))
+    return field.to_representation
+
+
+def dataset_rows(rows: Iterable[Dict[str, Any]], fields: Optional[Sequence[str]] = None, request=None) -> List[Dict[str, Any]]:
+    """
+    What ``DatasetSerializer(..., many=True).data`` returns, built from
+    ``Dataset.objects.values(...)`` rows: the fields are bound once, not per
+    row, and no model instances are created.
+    """
+    serializer = DatasetSerializer(fields=fields, context={'request': request})
+    converters = [(name, field.source, _value_converter(field)) for name, field in serializer.fields.items()]
+    return [
+        {name: None if row[source] is None else convert(row[source]) for name, source, convert in converters}
+        for row in rows
+    ]
+
+
 class UploadResponseSerializer(serializers.Serializer):
     dataset = DatasetSerializer()
     message = serializers.CharField()
+    duplicate = serializers.BooleanField()
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(source='expected_size', required=False, allow_null=True, min_value=0)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id',
+            'filename',
+            'size',
+            'received_bytes',
+            'status',
+            'dataset',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['id', 'received_bytes', 'status', 'dataset', 'created_at', 'updated_at']
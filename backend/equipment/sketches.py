@@ -0,0 +1,208 @@
+"""
+Mergeable distribution sketches for numeric columns.
+
+``QuantileSketch`` is a DDSketch: every value lands in a logarithmic bucket
+whose bounds are within ``relative_accuracy`` of each other, so any quantile
+it reports is within that relative error of a true sample value. Merging two
+sketches adds their bucket counts, so the result does not depend on how rows
+were split into chunks or worker ranges. The sketch is also a fine-grained
+histogram, and fixed-width histograms over [min, max] are re-binned from it
+without touching the rows again.
+
+Sketches serialise to small JSON dicts (a few hundred integers for typical
+equipment readings) stored on ``Dataset.distributions``.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SKETCH_RELATIVE_ACCURACY = 0.01
+# Buckets kept per sign; beyond this the smallest magnitudes are folded together.
+SKETCH_MAX_BUCKETS = 2048
+HISTOGRAM_BINS = 20
+MAX_HISTOGRAM_BINS = 200
+DEFAULT_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+# Magnitudes below this count as zero (their log would underflow the keys).
+_MIN_INDEXABLE = 1e-300
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # bucket key -> count; key k covers magnitudes in (gamma**(k-1), gamma**k].
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray) -> 'QuantileSketch':
+        """Add finite float64 ``values``."""
+        if not values.size:
+            return self
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > _MIN_INDEXABLE]
+        negative = -values[values < -_MIN_INDEXABLE]
+        self.zero_count += int(values.size - positive.size - negative.size)
+        self._add(self.positive, positive)
+        self._add(self.negative, negative)
+        return self
+
+    def _add(self, store: Dict[int, int], magnitudes: np.ndarray) -> None:
+        if not magnitudes.size:
+            return
+        keys = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        lowest = int(keys.min())
+        counts = np.bincount(keys - lowest)
+        for offset in np.flatnonzero(counts).tolist():
+            key = lowest + offset
+            store[key] = store.get(key, 0) + int(counts[offset])
+        self._collapse(store)
+
+    @staticmethod
+    def _collapse(store: Dict[int, int]) -> None:
+        if len(store) <= SKETCH_MAX_BUCKETS:
+            return
+        keys = sorted(store)
+        floor = keys[-SKETCH_MAX_BUCKETS]
+        store[floor] += sum(store.pop(key) for key in keys[:-SKETCH_MAX_BUCKETS])
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracy.')
+        for store, incoming in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in incoming.items():
+                store[key] = store.get(key, 0) + count
+            self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _value(self, key: int) -> float:
+        # The point minimising relative error over the bucket.
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _buckets(self) -> Iterable[Tuple[float, int]]:
+        """(representative value, count) in ascending value order."""
+        for key in sorted(self.negative, reverse=True):
+            yield -self._value(key), self.negative[key]
+        if self.zero_count:
+            yield 0.0, self.zero_count
+        for key in sorted(self.positive):
+            yield self._value(key), self.positive[key]
+
+    def quantiles(self, fractions: Iterable[float]) -> List[Optional[float]]:
+        """Values at each fraction in [0, 1] (None for an empty sketch)."""
+        fractions = list(fractions)
+        if not self.count:
+            return [None] * len(fractions)
+        ranks = sorted((fraction * (self.count - 1), index) for index, fraction in enumerate(fractions))
+        results: List[Optional[float]] = [None] * len(fractions)
+        position = 0
+        seen = 0
+        for value, count in self._buckets():
+            seen += count
+            while position < len(ranks) and ranks[position][0] < seen:
+                results[ranks[position][1]] = min(max(value, self.min), self.max)
+                position += 1
+        for rank, index in ranks[position:]:
+            results[index] = self.max
+        return results
+
+    def histogram(self, bins: int = HISTOGRAM_BINS) -> Dict[str, List[float]]:
+        """
+        ``bins`` equal-width bins over [min, max]. Each sketch bucket is
+        counted in the bin holding its representative value, so a bin edge is
+        accurate to ``relative_accuracy``.
+        """
+        if not self.count:
+            return {'edges': [], 'counts': []}
+        if self.min == self.max:
+            return {'edges': [self.min, self.max], 'counts': [self.count]}
+        edges = np.linspace(self.min, self.max, bins + 1)
+        values, counts = zip(*self._buckets())
+        positions = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+        totals = np.bincount(positions, weights=counts, minlength=bins)
+        return {'edges': edges.tolist(), 'counts': totals.astype(np.int64).tolist()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'zero_count': self.zero_count,
+            'positive': _pairs(self.positive),
+            'negative': _pairs(self.negative),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.count = data['count']
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        sketch.zero_count = data['zero_count']
+        sketch.positive = _store(data['positive'])
+        sketch.negative = _store(data['negative'])
+        return sketch
+
+
+def _pairs(store: Dict[int, int]) -> Dict[str, List[int]]:
+    keys = sorted(store)
+    return {'keys': keys, 'counts': [store[key] for key in keys]}
+
+
+def _store(data: Dict[str, List[int]]) -> Dict[int, int]:
+    return dict(zip(data['keys'], data['counts']))
+
+
+def describe_distribution(
+    sketch: QuantileSketch, percentiles: Iterable[float] = DEFAULT_PERCENTILES, bins: int = HISTOGRAM_BINS
+) -> Dict[str, Any]:
+    """Percentiles and a histogram in the shape returned by the distribution endpoint."""
+    percentiles = list(percentiles)
+    values = sketch.quantiles(percentile / 100 for percentile in percentiles)
+    return {
+        'count': sketch.count,
+        'min': sketch.min if sketch.count else None,
+        'max': sketch.max if sketch.count else None,
+        'percentiles': {f'p{percentile:g}': value for percentile, value in zip(percentiles, values)},
+        'histogram': sketch.histogram(bins),
+    }
+
+
+def parse_percentiles(raw: str) -> List[float]:
+    """Validate a comma separated percentile list such as ``50,90,99.9``. Raises ValueError."""
+    percentiles = []
+    for item in raw.split(','):
+        if not item.strip():
+            continue
+        try:
+            value = float(item)
+        except ValueError:
+            raise ValueError(f'Percentile {item.strip()!r} is not a number.') from None
+        if not 0 <= value <= 100:
+            raise ValueError(f'Percentile {item.strip()} is outside 0-100.')
+        percentiles.append(value)
+    if not percentiles:
+        raise ValueError('At least one percentile is required.')
+    return list(dict.fromkeys(percentiles))
+
+
+def parse_bins(raw: str) -> int:
+    """Validate a histogram bin count (1 to MAX_HISTOGRAM_BINS). Raises ValueError."""
+    if not raw.strip().isdigit() or not 1 <= int(raw) <= MAX_HISTOGRAM_BINS:
+        raise ValueError(f'bins must be an integer from 1 to {MAX_HISTOGRAM_BINS}.')
+    return int(raw)
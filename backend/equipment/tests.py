@@ -1,3 +1,996 @@
-from django.test import TestCase
+import asyncio
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.move import file_move_safe
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock, skipUnless
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import fastjson, metrics, offload, parallel, upload_sessions
+from .authentication import issue_token
+from .benchmarks import find_regressions
+from .fastjson import FastJSONRenderer
+from .ingest import iter_row_batches
+from .jobs import queue_depth, run_pending_jobs
+from .models import (
+    EQUIPMENT_TEXT_MAX_LENGTH,
+    Dataset,
+    DatasetRollup,
+    EquipmentRecord,
+    HistoryVersion,
+    OrphanedFile,
+    ReportJob,
+    UploadSession,
+)
+from .pdfwriter import Page
+from .reports import TypeRow, write_report
+from .retention import enforce_retention, sweep_orphaned_files
+from .serializers import DatasetSerializer
+from .sketches import QuantileSketch
+from .urls import api_urlpatterns
+from .utils import (
+    ARROW_BLOCK_BYTES,
+    ColumnarDataset,
+    ColumnarWriter,
+    columnar_dir,
+    compute_summary,
+    normalize_dataframe,
+    open_columnar,
+    pyarrow,
+    summarize_csv,
+    zstandard,
+)
+
+SAMPLE_CSV = (
+    b"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+    b"Pump A,Pump,120,30,80\n"
+    b"Valve B,Valve,100,25,75\n"
+    b"Pump C, Pump ,n/a,35,\n"
+    b"Reactor D,,200,40,150\n"
+)
+
+
+class SummaryTests(TestCase):
+    def test_chunked_summary_matches_dataframe_summary(self):
+        expected = compute_summary(normalize_dataframe(BytesIO(SAMPLE_CSV)))
+        self.assertEqual(summarize_csv(BytesIO(SAMPLE_CSV), chunksize=1), expected)
+        self.assertEqual(expected['total_records'], 4)
+        self.assertEqual(expected['avg_flowrate'], 140.0)
+        self.assertEqual(expected['type_distribution'], {'Pump': 2, 'Valve': 1, 'Unknown': 1})
+
+    def test_parsers_agree_on_messy_csv(self):
+        messy = (
+            b"\xef\xbb\xbf equipment name ,TYPE,Notes,flowrate,Pressure,Temperature\n"
+            b"Pump A,Pump,ok,120,abc,80\n"
+            b"Valve B,,\"x, y\",NA, 25 ,1e2\n"
+        )
+        engines = ['c'] + (['pyarrow'] if pyarrow is not None else [])
+        for engine in engines:
+            with self.subTest(engine=engine):
+                frame = normalize_dataframe(BytesIO(messy), engine=engine)
+                self.assertEqual(list(frame.columns), ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+                self.assertEqual(frame['Pressure'].dtype, 'float64')
+                self.assertEqual(frame['Pressure'].tolist()[1], 25.0)
+                self.assertTrue(pd.isna(frame['Pressure'].tolist()[0]))
+                self.assertTrue(pd.isna(frame['Flowrate'].tolist()[1]))
+                self.assertTrue(pd.isna(frame['Type'].tolist()[1]))
+                self.assertEqual(frame['Temperature'].tolist(), [80.0, 100.0])
+
+    def test_parallel_summary_and_sidecar_match_serial(self):
+        rows = [b'Equipment Name,Type,Flowrate,Pressure,Temperature']
+        for index in range(400):
+            name = b'"Pump %d\nspare, rebuilt"' % index if index % 7 == 0 else b'Unit %d' % index
+            kind = [b'Pump', b'Valve', b'', b'Reactor'][index % 4]
+            flowrate = b'n/a' if index % 50 == 3 else b'%r' % (0.1 * index + 1e15 * (index % 3 == 0))
+            rows.append(b'%s,%s,%s,%d,%r' % (name, kind, flowrate, index, index / 3))
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.addCleanup(parallel.shutdown_executor)
+        path = directory / 'plant.csv'
+        path.write_bytes(b'\n'.join(rows) + b'\n')
+
+        serial_writer = ColumnarWriter(directory / 'serial')
+        with open(path, 'rb') as handle:
+            expected = summarize_csv(handle, chunksize=64, on_chunk=serial_writer.write)
+        serial_writer.close()
+        parallel_writer = ColumnarWriter(directory / 'parallel')
+        summary = parallel.summarize_csv_parallel(path, workers=3, writer=parallel_writer)
+        parallel_writer.close()
+
+        self.assertEqual(len(parallel.split_ranges(path, 3)[1]), 3)
+        self.assertEqual(summary, expected)
+        self.assertEqual(list(summary['type_distribution']), ['Pump', 'Reactor', 'Unknown', 'Valve'])
+        for stored in sorted((directory / 'serial').iterdir()):
+            self.assertEqual(stored.read_bytes(), (directory / 'parallel' / stored.name).read_bytes(), stored.name)
+        self.assertEqual(sorted(os.listdir(directory / 'parallel')), sorted(os.listdir(directory / 'serial')))
+
+
+class QuantileSketchTests(TestCase):
+    def test_merge_is_order_independent_and_within_relative_accuracy(self):
+        values = np.random.default_rng(0).lognormal(3, 1, 20_000)
+        whole = QuantileSketch().update(values)
+        merged = QuantileSketch().update(values[15_000:]).merge(QuantileSketch().update(values[:15_000]))
+        self.assertEqual(merged.to_dict(), whole.to_dict())
+        self.assertEqual(QuantileSketch.from_dict(whole.to_dict()).to_dict(), whole.to_dict())
+        for fraction, estimate in zip((0.01, 0.5, 0.99), whole.quantiles((0.01, 0.5, 0.99))):
+            exact = np.quantile(values, fraction, method='lower')
+            self.assertLess(abs(estimate - exact) / exact, 0.02)
+        self.assertEqual(sum(whole.histogram(10)['counts']), 20_000)
+
+
+class ReportTests(TestCase):
+    def assertValidPdf(self, data):
+        self.assertTrue(data.startswith(b'%PDF-1.4'))
+        self.assertTrue(data.endswith(b'%%EOF\n'))
+        xref = int(data.rsplit(b'startxref\n', 1)[1].split()[0])
+        entries = data[xref:].split(b'\n')
+        for object_id in range(1, int(entries[1].split()[1])):
+            offset = int(entries[2 + object_id][:10])
+            self.assertTrue(data[offset:].startswith(b'%d 0 obj' % object_id))
+
+    def test_type_table_spans_pages(self):
+        distribution = {f'Type {index}': 500 - index for index in range(300)}
+        summary = {'total_records': sum(distribution.values()), 'avg_flowrate': 1.5, 'avg_pressure': None,
+                   'avg_temperature': 2.0, 'type_distribution': distribution}
+        rows = (TypeRow(label, count, 1.0, None, 2.0) for label, count in distribution.items())
+        buffer = BytesIO()
+        pages = write_report(buffer, summary, 'plant (north).csv', rows)
+        self.assertGreater(pages, 5)
+        self.assertValidPdf(buffer.getvalue())
+        self.assertIn(b'/Count %d' % pages, buffer.getvalue())
+
+    def test_report_without_types(self):
+        buffer = BytesIO()
+        self.assertEqual(write_report(buffer, {'total_records': 0, 'type_distribution': {}}, 'empty.csv'), 1)
+        self.assertValidPdf(buffer.getvalue())
+
+
+    def test_non_finite_coordinates_are_written_as_zero(self):
+        page = Page(100, 100)
+        page.rect(float('nan'), 1.5, float('inf'), -float('inf'))
+        self.assertEqual(page.content(), b'0 1.5 0 0 re f')
+
+class BenchmarkBaselineTests(TestCase):
+    def test_only_time_and_memory_growth_past_threshold_regresses(self):
+        baseline = {'pipeline': {'1000': {'upload_s': 1.0, 'upload_peak_mib': 100.0, 'pdf_s': 0.001, 'rows_per_s': 500}}}
+        results = {'pipeline': {'1000': {'upload_s': 1.2, 'upload_peak_mib': 140.0, 'pdf_s': 0.003, 'rows_per_s': 9000}}}
+        self.assertEqual(
+            find_regressions(baseline, results, threshold=0.25),
+            ['pipeline rows=1000 upload_peak_mib: 100.0 -> 140.0'],
+        )
+        self.assertEqual(find_regressions({}, results, threshold=0.25), [])
+
+
+class MediaTestCase(TestCase):
+    """Runs each test against a throwaway MEDIA_ROOT, with an authenticated API client."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.user = get_user_model().objects.create_user('tester', password='secret-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content=SAMPLE_CSV, name='plant.csv', content_type='text/csv'):
+        return self.client.post(
+            '/api/upload/',
+            {'file': SimpleUploadedFile(name, content, content_type=content_type)},
+            format='multipart',
+        )
+
+
+class UploadTests(MediaTestCase):
+    def test_upload_stores_summary_and_file(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        dataset = Dataset.objects.get(pk=response.data['dataset']['id'])
+        self.assertEqual(dataset.total_records, 4)
+        with dataset.data_file.open('rb') as stored:
+            self.assertEqual(stored.read(), SAMPLE_CSV)
+
+    def test_repeated_upload_reuses_existing_dataset(self):
+        first = self.upload()
+        with mock.patch('equipment.views.summarize_csv') as summarize:
+            second = self.upload(name='plant-retry.csv')
+        summarize.assert_not_called()
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data['duplicate'])
+        self.assertEqual(second.data['dataset']['id'], first.data['dataset']['id'])
+        self.assertEqual(Dataset.objects.count(), 1)
+        self.assertEqual(len(first.data['dataset']['content_sha256']), 64)
+
+    def test_identical_upload_racing_past_the_lookup_reuses_the_winner(self):
+        first = self.upload()
+        with mock.patch('equipment.views._find_duplicate', side_effect=[None, Dataset.objects.get()]):
+            second = self.upload(name='plant-retry.csv')
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data['duplicate'])
+        self.assertEqual(second.data['dataset']['id'], first.data['dataset']['id'])
+        self.assertEqual(Dataset.objects.count(), 1)
+        self.assertEqual(len(list(Path(self.media_root, 'datasets').iterdir())), 1)
+
+    def test_gzip_upload_is_parsed_streaming_and_stored_compressed(self):
+        compressed = gzip.compress(SAMPLE_CSV)
+        response = self.upload(compressed, name='plant.csv.gz', content_type='application/gzip')
+        self.assertEqual(response.status_code, 201)
+        dataset = Dataset.objects.get(pk=response.data['dataset']['id'])
+        self.assertEqual(dataset.total_records, 4)
+        self.assertEqual(dataset.original_filename, 'plant.csv')
+        self.assertEqual(dataset.data_size, len(compressed))
+        with dataset.data_file.open('rb') as stored:
+            self.assertEqual(stored.read(), compressed)
+            stored.seek(0)
+            self.assertEqual(len(normalize_dataframe(stored)), 4)
+
+    def test_declared_compression_must_match_content(self):
+        response = self.upload(name='plant.csv.gz', content_type='application/gzip')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+    @skipUnless(zstandard, 'zstandard is not installed')
+    def test_zstd_upload(self):
+        compressed = zstandard.ZstdCompressor().compress(SAMPLE_CSV)
+        response = self.upload(compressed, name='plant.csv.zst')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['dataset']['total_records'], 4)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0, SUMMARY_PARALLEL_WORKERS=2, SUMMARY_PARALLEL_MIN_BYTES=0)
+    def test_large_upload_is_summarized_in_parallel(self):
+        self.addCleanup(parallel.shutdown_executor)
+        content = SAMPLE_CSV + b''.join(b'Pump %d,Pump,%d,30,80\n' % (index, index) for index in range(200))
+        with mock.patch.object(parallel, 'summarize_csv_parallel', wraps=parallel.summarize_csv_parallel) as spy:
+            response = self.upload(content)
+        spy.assert_called_once()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['dataset']['total_records'], 204)
+        self.assertEqual(response.data['dataset']['avg_flowrate'], summarize_csv(BytesIO(content))['avg_flowrate'])
+        self.assertEqual(open_columnar(response.data['dataset']['id']).num_rows, 204)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_spooled_upload_is_moved_into_storage_not_copied(self):
+        with mock.patch('django.core.files.storage.filesystem.file_move_safe', wraps=file_move_safe) as move:
+            response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        move.assert_called_once()
+
+    def test_unparseable_upload_is_rejected_and_its_file_removed(self):
+        response = self.upload(gzip.compress(SAMPLE_CSV)[:20], name='plant.csv.gz')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Dataset.objects.count(), 0)
+        self.assertEqual(list(Path(self.media_root, 'datasets').iterdir()), [])
+
+    def test_server_faults_while_parsing_are_not_reported_as_bad_csv(self):
+        with mock.patch('equipment.views.summarize_csv', side_effect=RuntimeError('pool is gone')):
+            with self.assertRaises(RuntimeError):
+                self.upload()
+        self.assertEqual(Dataset.objects.count(), 0)
+        self.assertEqual(list(Path(self.media_root, 'datasets').iterdir()), [])
+
+    def test_ragged_row_past_the_first_arrow_block_is_accepted(self):
+        rows = [b'Unit %d,Pump,%d,2,3' % (index, index) for index in range(80_000)]
+        rows.insert(70_000, b'Short,Valve,7')
+        content = SAMPLE_CSV + b'\n'.join(rows) + b'\n'
+        self.assertGreater(content.index(b'Short,'), ARROW_BLOCK_BYTES)
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['dataset']['total_records'], 80_005)
+        expected = summarize_csv(BytesIO(content), engine='c')
+        self.assertEqual(response.data['dataset']['avg_flowrate'], expected['avg_flowrate'])
+        self.assertEqual(response.data['dataset']['type_distribution'], expected['type_distribution'])
+        record = EquipmentRecord.objects.get(dataset_id=response.data['dataset']['id'], row_number=70_004)
+        self.assertEqual((record.equipment_name, record.flowrate, record.pressure), ('Short', 7.0, None))
+
+    def test_upload_ingests_equipment_records(self):
+        response = self.upload()
+        records = EquipmentRecord.objects.filter(dataset_id=response.data['dataset']['id'])
+        self.assertEqual(records.count(), 4)
+        self.assertEqual(
+            list(records.filter(equipment_type='Pump').values_list('equipment_name', 'flowrate')),
+            [('Pump A', 120.0), ('Pump C', None)],
+        )
+        self.assertEqual(records.get(row_number=3).equipment_type, 'Unknown')
+
+    def test_long_names_and_types_are_truncated_to_the_column_length(self):
+        name, equipment_type = 'N' * 300, 'T' * 300
+        content = SAMPLE_CSV + f'{name},{equipment_type},1,2,3\n'.encode()
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 201)
+        record = EquipmentRecord.objects.get(dataset_id=response.data['dataset']['id'], row_number=4)
+        self.assertEqual(record.equipment_name, name[:EQUIPMENT_TEXT_MAX_LENGTH])
+        self.assertEqual(record.equipment_type, equipment_type[:EQUIPMENT_TEXT_MAX_LENGTH])
+        # The summary keeps the full type.
+        self.assertIn(equipment_type, response.data['dataset']['type_distribution'])
+        rollup = DatasetRollup.objects.get(dataset_id=response.data['dataset']['id'], equipment_type__startswith='T')
+        self.assertEqual(rollup.equipment_type, equipment_type[:EQUIPMENT_TEXT_MAX_LENGTH])
+
+    def test_ingest_decodes_categories_once_per_column(self):
+        response = self.upload()
+        columnar = open_columnar(response.data['dataset']['id'])
+        categories = ColumnarDataset.categories
+        with mock.patch.object(ColumnarDataset, 'categories', autospec=True, side_effect=categories) as spy:
+            batches = list(iter_row_batches(columnar, batch_size=1))
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(spy.call_count, 2)
+        self.assertEqual([batch[0][1:3] for batch in batches][2], ('Pump C', 'Pump'))
+
+    def test_upload_writes_memory_mapped_sidecar(self):
+        response = self.upload()
+        columnar = open_columnar(response.data['dataset']['id'])
+        self.assertEqual(columnar.num_rows, 4)
+        self.assertEqual(columnar.numeric('Pressure').tolist(), [30.0, 25.0, 35.0, 40.0])
+        self.assertEqual(columnar.codes('Type').tolist(), [0, 1, 0, -1])
+        self.assertEqual(columnar.categories('Type'), ['Pump', 'Valve'])
+
+        Dataset.objects.get(pk=response.data['dataset']['id']).delete()
+        self.assertIsNone(open_columnar(response.data['dataset']['id']))
+
+    def test_upload_queues_report_for_worker(self):
+        response = self.upload()
+        self.assertEqual(response.data['dataset']['report_status'], Dataset.REPORT_PENDING)
+        self.assertIsNone(response.data['dataset']['summary_pdf'])
+        self.assertEqual(queue_depth()['due'], 1)
+
+        self.assertEqual(run_pending_jobs(), 1)
+        dataset = Dataset.objects.get(pk=response.data['dataset']['id'])
+        self.assertEqual(dataset.report_status, Dataset.REPORT_READY)
+        self.assertTrue(dataset.summary_pdf.name.endswith('_summary.pdf'))
+        with dataset.summary_pdf.open('rb') as handle:
+            self.assertTrue(handle.read().startswith(b'%PDF'))
+        self.assertEqual(os.listdir(Path(self.media_root) / 'reports'), [os.path.basename(dataset.summary_pdf.name)])
+        self.assertEqual(queue_depth()['pending'], 0)
+
+    def test_failed_report_is_retried_then_marked_failed(self):
+        response = self.upload()
+        job = ReportJob.objects.get(dataset_id=response.data['dataset']['id'])
+        with mock.patch('equipment.jobs.render_report', side_effect=RuntimeError('boom')), self.assertLogs('equipment.jobs', 'ERROR'):
+            for _ in range(job.max_attempts):
+                ReportJob.objects.filter(pk=job.pk).update(run_after=job.run_after)
+                run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertEqual(job.dataset.report_status, Dataset.REPORT_FAILED)
+
+
+class UploadSessionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        created = self.client.post('/api/uploads/', {'filename': 'plant.csv', 'size': len(SAMPLE_CSV)}, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.url = f"/api/uploads/{created.data['id']}/"
+
+    def put_chunk(self, offset, data):
+        return self.client.put(f'{self.url}?offset={offset}', data, content_type='application/octet-stream')
+
+    def test_chunks_resume_after_offset_conflict(self):
+        self.assertEqual(self.put_chunk(0, SAMPLE_CSV[:50]).data['received_bytes'], 50)
+        conflict = self.put_chunk(60, SAMPLE_CSV[60:])
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.data['session']['received_bytes'], 50)
+
+        # A different process (no running hash) picks the upload back up.
+        upload_sessions._running_hashes.clear()
+        self.assertEqual(self.client.get(self.url).data['received_bytes'], 50)
+        self.assertEqual(self.put_chunk(50, SAMPLE_CSV[50:]).data['received_bytes'], len(SAMPLE_CSV))
+
+        finalized = self.client.post(f'{self.url}finalize/')
+        self.assertEqual(finalized.status_code, 201)
+        dataset = Dataset.objects.get(pk=finalized.data['dataset']['id'])
+        self.assertEqual(dataset.total_records, 4)
+        self.assertEqual(dataset.content_sha256, hashlib.sha256(SAMPLE_CSV).hexdigest())
+        with dataset.data_file.open('rb') as stored:
+            self.assertEqual(stored.read(), SAMPLE_CSV)
+        self.assertFalse(upload_sessions.partial_path(UploadSession.objects.get()).exists())
+
+        retried = self.client.post(f'{self.url}finalize/')
+        self.assertEqual(retried.status_code, 200)
+        self.assertEqual(retried.data['dataset']['id'], str(dataset.pk))
+
+    def test_finalize_requires_all_declared_bytes(self):
+        self.put_chunk(0, SAMPLE_CSV[:10])
+        response = self.client.post(f'{self.url}finalize/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+    def test_session_being_finalized_rejects_chunks_and_second_finalize(self):
+        self.put_chunk(0, SAMPLE_CSV)
+        UploadSession.objects.update(status=UploadSession.FINALIZING)
+        with mock.patch('equipment.views.process_upload') as process:
+            self.assertEqual(self.client.post(f'{self.url}finalize/').status_code, 409)
+        process.assert_not_called()
+        self.assertEqual(self.put_chunk(len(SAMPLE_CSV), b'x').status_code, 409)
+        self.assertEqual(self.client.delete(self.url).status_code, 409)
+        self.assertEqual(Dataset.objects.count(), 0)
+
+    def test_rejected_file_reopens_the_session_from_zero(self):
+        created = self.client.post('/api/uploads/', {'filename': 'broken.csv.gz'}, format='json')
+        url = f"/api/uploads/{created.data['id']}/"
+        broken = gzip.compress(SAMPLE_CSV)[:20]
+        self.client.put(f'{url}?offset=0', broken, content_type='application/octet-stream')
+        self.assertEqual(self.client.post(f'{url}finalize/').status_code, 400)
+        session = self.client.get(url).data
+        self.assertEqual((session['status'], session['received_bytes']), (UploadSession.OPEN, 0))
+
+    def test_chunk_past_declared_size_is_rejected(self):
+        response = self.put_chunk(0, SAMPLE_CSV + b'extra\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url).data['received_bytes'], 0)
+
+
+class MetricsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape')
+    def test_upload_reports_stage_timings_and_metrics(self):
+        response = self.upload()
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        for name in ('hash', 'dedup', 'parse', 'summarize', 'sidecar', 'store', 'db', 'retention', 'total'):
+            self.assertIn(name, stages)
+
+        exposition = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+        self.assertIn('equipment_stage_seconds_count{stage="parse"} 1', exposition)
+        self.assertIn('equipment_upload_rows_total 4', exposition)
+        self.assertIn('equipment_request_seconds_count{view="upload-dataset"} 1', exposition)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='scrape')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+    def test_metrics_without_token_are_staff_only(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 401)
+        self.client.force_login(get_user_model().objects.create_user('ops', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_disabled_by_default(self):
+        response = self.upload()
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(metrics.STAGE_SECONDS.render()[2:], [])
+
+
+class StatsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        response = self.upload()
+        self.dataset_id = response.data['dataset']['id']
+
+    def test_grouped_stats_by_type(self):
+        response = self.client.get(
+            f'/api/datasets/{self.dataset_id}/stats/',
+            {'group_by': 'Type', 'metrics': 'count,mean,p50,max', 'columns': 'pressure'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['groups']['Pump']['Pressure'], {'count': 2, 'mean': 32.5, 'p50': 32.5, 'max': 35.0})
+        self.assertEqual(response.data['groups']['Unknown']['Pressure']['count'], 1)
+
+    def test_stats_are_cached_per_query(self):
+        url = f'/api/datasets/{self.dataset_id}/stats/'
+        first = self.client.get(url, {'metrics': 'mean'})
+        with mock.patch('equipment.views.compute_grouped_stats') as compute:
+            second = self.client.get(url, {'metrics': 'mean'})
+        compute.assert_not_called()
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.data['groups']['all']['Flowrate']['mean'], 140.0)
+
+    def test_rejects_unknown_metric(self):
+        response = self.client.get(f'/api/datasets/{self.dataset_id}/stats/', {'metrics': 'mode'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DistributionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.upload()
+        self.dataset_id = response.data['dataset']['id']
+        self.url = f'/api/datasets/{self.dataset_id}/distribution/'
+
+    def test_percentiles_and_histogram_from_stored_sketch(self):
+        self.assertIn('Pressure', Dataset.objects.get(pk=self.dataset_id).distributions)
+        with mock.patch('equipment.views.DatasetStatsView._load_frame') as load:
+            response = self.client.get(self.url, {'columns': 'pressure', 'percentiles': '0,50,100', 'bins': 2})
+        load.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        pressure = response.data['columns']['Pressure']
+        self.assertEqual((pressure['count'], pressure['min'], pressure['max']), (4, 25.0, 40.0))
+        self.assertEqual(pressure['percentiles']['p0'], 25.0)
+        self.assertAlmostEqual(pressure['percentiles']['p50'], 30.0, delta=0.3)
+        self.assertEqual(pressure['percentiles']['p100'], 40.0)
+        self.assertEqual(pressure['histogram'], {'edges': [25.0, 32.5, 40.0], 'counts': [2, 2]})
+
+    def test_sketches_are_backfilled_for_older_datasets(self):
+        Dataset.objects.filter(pk=self.dataset_id).update(distributions={})
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['columns']), ['Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(response.data['columns']['Flowrate']['count'], 3)
+        self.assertEqual(len(response.data['columns']['Flowrate']['histogram']['counts']), 20)
+        self.assertTrue(Dataset.objects.get(pk=self.dataset_id).distributions)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'percentiles': '101'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'bins': '0'}).status_code, 400)
+
+
+class TrendsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset_ids = []
+        for name, content in (('first.csv', SAMPLE_CSV), ('second.csv', SAMPLE_CSV + b"Pump E,Pump,300,50,90\n")):
+            response = self.upload(content, name=name)
+            self.dataset_ids.append(response.data['dataset']['id'])
+
+    def test_series_per_dataset_with_type_mix(self):
+        with mock.patch('equipment.utils.normalize_dataframe') as parse:
+            response = self.client.get('/api/datasets/trends/')
+        parse.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        points = response.data['points']
+        self.assertEqual([point['dataset'] for point in points], self.dataset_ids)
+        self.assertEqual(points[0]['avg_flowrate'], 140.0)
+        self.assertEqual(points[1]['records'], 5)
+        self.assertEqual(points[1]['type_mix'], {'Pump': 3, 'Unknown': 1, 'Valve': 1})
+
+    def test_type_filter_and_calendar_buckets(self):
+        response = self.client.get('/api/datasets/trends/', {'type': 'Pump', 'bucket': 'day'})
+        self.assertEqual(response.status_code, 200)
+        [point] = response.data['points']
+        self.assertEqual(point['records'], 5)
+        self.assertEqual(point['avg_flowrate'], 180.0)
+        self.assertEqual(point['share'], round(5 / 9, 4))
+        self.assertEqual(self.client.get('/api/datasets/trends/', {'bucket': 'year'}).status_code, 400)
+
+    def test_rollups_follow_dataset_deletion_and_can_be_rebuilt(self):
+        Dataset.objects.get(pk=self.dataset_ids[0]).delete()
+        self.assertEqual(len(self.client.get('/api/datasets/trends/').data['points']), 1)
+        DatasetRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+        self.assertEqual(DatasetRollup.objects.filter(equipment_type='Pump').get().record_count, 3)
+
+
+class HistoryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload()
+
+    def test_history_answers_if_none_match_with_304(self):
+        first = self.client.get('/api/history/')
+        self.assertEqual(first.status_code, 200)
+
+        with mock.patch.object(DatasetSerializer, 'to_representation') as serialize:
+            second = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        serialize.assert_not_called()
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+
+    def test_since_version_returns_only_changed_rows(self):
+        dataset = Dataset.objects.get()
+        version = self.client.get('/api/history/', {'since_version': 0}).data['version']
+        unchanged = self.client.get('/api/history/', {'since_version': version})
+        self.assertEqual(unchanged.data, {'version': version, 'datasets': [], 'live_ids': [str(dataset.pk)]})
+
+        run_pending_jobs()
+        changed = self.client.get('/api/history/', {'since_version': version})
+        self.assertGreater(changed.data['version'], version)
+        self.assertEqual([row['id'] for row in changed.data['datasets']], [str(dataset.pk)])
+        self.assertEqual(changed.data['datasets'][0]['report_status'], Dataset.REPORT_READY)
+
+        self.assertEqual(self.client.get('/api/history/', {'since_version': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/history/', {'since_version': '-1'}).status_code, 400)
+
+    def test_since_version_sees_rows_committed_after_newer_timestamps(self):
+        version = self.client.get('/api/history/', {'since_version': 0}).data['version']
+        # Stamped before the client synced, committed after it.
+        late = Dataset.objects.create(original_filename='late.csv')
+        Dataset.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(minutes=5))
+        with transaction.atomic():
+            HistoryVersion.bump([late.pk])
+        changed = self.client.get('/api/history/', {'since_version': version})
+        self.assertEqual([row['id'] for row in changed.data['datasets']], [str(late.pk)])
+
+    def test_since_version_pages_cover_every_live_id(self):
+        for index in range(11):
+            Dataset.objects.create(original_filename=f'{index}.csv')
+        live_ids, url = [], '/api/history/?since_version=0&page_size=5'
+        while url:
+            response = self.client.get(url)
+            live_ids.extend(response.data['live_ids'])
+            url = response.headers.get('Link', '').partition('>')[0].lstrip('<')
+        self.assertCountEqual(live_ids, [str(pk) for pk in Dataset.objects.values_list('pk', flat=True)])
+
+    def test_history_etag_changes_when_a_late_commit_keeps_older_timestamps(self):
+        first = self.client.get('/api/history/')
+        # Same row count and newest updated_at as before, but a new commit.
+        Dataset.objects.update(original_filename='renamed.csv', updated_at=Dataset.objects.get().updated_at)
+        with transaction.atomic():
+            HistoryVersion.bump(Dataset.objects.values_list('pk', flat=True))
+        second = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data[0]['original_filename'], 'renamed.csv')
+
+    def test_history_etag_changes_when_report_is_ready(self):
+        first = self.client.get('/api/history/')
+        run_pending_jobs()
+        second = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data[0]['report_status'], Dataset.REPORT_READY)
+
+    def test_cursor_pages_follow_link_header_without_gaps(self):
+        created = [Dataset.objects.create(original_filename=f'{index}.csv') for index in range(11)]
+        # Ties on uploaded_at are broken by id.
+        Dataset.objects.filter(pk__in=[dataset.pk for dataset in created[3:7]]).update(uploaded_at=created[3].uploaded_at)
+        expected = [str(pk) for pk in Dataset.objects.order_by('-uploaded_at', '-id').values_list('pk', flat=True)]
+
+        seen, url, pages = [], '/api/history/?page_size=5', 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data)
+            pages += 1
+            url = response.headers.get('Link', '').partition('>')[0].lstrip('<')
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+        self.assertEqual(self.client.get('/api/history/', {'cursor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/history/', {'page_size': '0'}).status_code, 400)
+
+    def test_fast_path_is_byte_identical_to_serializer(self):
+        def assert_identical(fields=None):
+            params = {'page_size': 10, **({'fields': ','.join(fields)} if fields else {})}
+            response = self.client.get('/api/history/', params)
+            expected = DatasetSerializer(
+                Dataset.objects.order_by('-uploaded_at', '-id'), many=True, fields=fields,
+                context={'request': response.wsgi_request},
+            ).data
+            self.assertEqual(response.content, JSONRenderer().render(expected))
+
+        Dataset.objects.create(
+            original_filename='Ünïcode\u2028"name".csv', avg_flowrate=0.1 + 0.2, avg_pressure=-0.0,
+            type_distribution={'Pump': 3, 'Wärme': 1}, summary_pdf='reports/x ü(1)_summary.pdf',
+        )
+        assert_identical()
+        assert_identical(['summary_pdf', 'id', 'avg_flowrate'])
+        # Floats orjson formats differently send the response through the stdlib encoder.
+        Dataset.objects.create(original_filename='tiny.csv', avg_flowrate=1e-05, avg_temperature=2e16)
+        assert_identical()
+
+    @skipUnless(fastjson.orjson, 'orjson is not installed')
+    def test_fast_json_defers_to_stdlib_where_output_would_differ(self):
+        self.assertEqual(fastjson.dumps({'a': [1, None, 'x\u2029']}), b'{"a":[1,null,"x\\u2029"]}')
+        self.assertIsNone(fastjson.dumps({'a': 1e-05}))
+        self.assertIsNone(fastjson.dumps({1: 'non-string key'}))
+        self.assertIsNone(fastjson.dumps({'a': 2 ** 70}))
+
+    def test_fast_json_rejects_non_finite_floats_like_drf(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                self.assertIsNone(fastjson.dumps({'a': [value]}))
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({'a': [value]})
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({'a': [value]})
+
+    def test_sparse_fieldset_selects_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/history/', {'fields': 'id,original_filename'})
+        self.assertEqual(list(response.data[0]), ['id', 'original_filename'])
+        self.assertFalse(any('type_distribution' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(self.client.get('/api/history/', {'fields': 'id,data_file'}).status_code, 400)
+
+
+class ReportDownloadTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.upload()
+        run_pending_jobs()
+        self.dataset = Dataset.objects.get(pk=response.data['dataset']['id'])
+        self.url = f'/api/datasets/{self.dataset.pk}/report/'
+        with self.dataset.summary_pdf.open('rb') as handle:
+            self.pdf = handle.read()
+
+    def test_full_download_is_immutable_with_strong_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.pdf)
+        self.assertEqual(response.headers['Content-Type'], 'application/pdf')
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_range_requests(self):
+        partial = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b''.join(partial.streaming_content), self.pdf[10:20])
+        self.assertEqual(partial.headers['Content-Range'], f'bytes 10-19/{len(self.pdf)}')
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), self.pdf[-5:])
+
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.pdf)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable.headers['Content-Range'], f'bytes */{len(self.pdf)}')
+        self.assertEqual(unsatisfiable.headers['Content-Type'], 'text/plain')
+        self.assertNotIn('immutable', unsatisfiable.headers.get('Cache-Control', ''))
+        self.assertNotIn('Content-Disposition', unsatisfiable.headers)
+
+    @override_settings(REPORT_OFFLOAD='x-accel', REPORT_OFFLOAD_PREFIX='/protected-media/')
+    def test_x_accel_offload_hands_file_to_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-media/{self.dataset.summary_pdf.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+
+    @override_settings(REPORT_OFFLOAD='x-sendfile')
+    def test_x_sendfile_offload_uses_absolute_path(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.headers['X-Sendfile'], self.dataset.summary_pdf.path)
+
+
+class ExportTests(MediaTestCase):
+    EXPECTED_CSV = (
+        'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+        'Pump A,Pump,120.0,30.0,80.0\n'
+        'Valve B,Valve,100.0,25.0,75.0\n'
+        'Pump C,Pump,,35.0,\n'
+        'Reactor D,,200.0,40.0,150.0\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.datasets = []
+        for name, content in (('plant.csv', SAMPLE_CSV), ('other.csv', SAMPLE_CSV + b'Pump E,Pump,1,2,3\n')):
+            response = self.upload(content, name=name)
+            self.datasets.append(Dataset.objects.get(pk=response.data['dataset']['id']))
+        self.dataset = self.datasets[0]
+
+    def export(self, export_format, dataset=None):
+        response = self.client.get(f'/api/datasets/{(dataset or self.dataset).pk}/export/{export_format}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_from_sidecar_matches_csv_fallback(self):
+        self.assertEqual(self.export('csv').decode(), self.EXPECTED_CSV)
+        shutil.rmtree(columnar_dir(self.dataset.pk))
+        self.assertEqual(self.export('csv').decode(), self.EXPECTED_CSV)
+
+    def test_json_lines(self):
+        lines = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[2], {'Equipment Name': 'Pump C', 'Type': 'Pump', 'Flowrate': None, 'Pressure': 35.0, 'Temperature': None})
+        self.assertIsNone(lines[3]['Type'])
+
+    @skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        table = pyarrow.parquet.read_table(BytesIO(self.export('parquet')))
+        self.assertEqual(table.column_names, ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature'])
+        self.assertEqual(table.column('Type').to_pylist(), ['Pump', 'Valve', 'Pump', None])
+
+    def test_bulk_zip_streams_datasets_and_reports(self):
+        run_pending_jobs()
+        response = self.client.get('/api/datasets/export/csv/', {'ids': ','.join(str(dataset.pk) for dataset in self.datasets)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(sorted(archive.namelist()), sorted(
+            [f'{dataset.pk}/{dataset.original_filename[:-4]}.csv' for dataset in self.datasets]
+            + [f'{dataset.pk}/{dataset.original_filename}_summary.pdf' for dataset in self.datasets]
+        ))
+        self.assertEqual(archive.read(f'{self.dataset.pk}/plant.csv').decode(), self.EXPECTED_CSV)
+        self.assertTrue(archive.read(f'{self.dataset.pk}/plant.csv_summary.pdf').startswith(b'%PDF'))
+
+        without_reports = self.client.get('/api/datasets/export/jsonl/', {'reports': 'false'})
+        names = zipfile.ZipFile(BytesIO(b''.join(without_reports.streaming_content))).namelist()
+        self.assertEqual(len(names), 2)
+
+    def test_rejects_unknown_format_and_ids(self):
+        self.assertEqual(self.client.get(f'/api/datasets/{self.dataset.pk}/export/xlsx/').status_code, 400)
+        self.assertEqual(self.client.get('/api/datasets/export/csv/', {'ids': 'nope'}).status_code, 400)
+
+
+class RetentionTests(MediaTestCase):
+    def upload_dataset(self, index):
+        content = SAMPLE_CSV + f'Extra {index},Pump,1,1,1\n'.encode()
+        response = self.upload(content, name=f'plant-{index}.csv')
+        return Dataset.objects.get(pk=response.data['dataset']['id'])
+
+    @override_settings(DATASET_RETENTION_MAX_COUNT=2)
+    def test_count_policy_defers_file_removal_to_sweeper(self):
+        oldest = self.upload_dataset(0)
+        data_path = oldest.data_file.path
+        self.upload_dataset(1)
+        self.upload_dataset(2)
+
+        self.assertFalse(Dataset.objects.filter(pk=oldest.pk).exists())
+        self.assertFalse(EquipmentRecord.objects.filter(dataset_id=oldest.pk).exists())
+        self.assertTrue(os.path.exists(data_path))
+        self.assertEqual(OrphanedFile.objects.count(), 2)
+
+        sweep_orphaned_files()
+        self.assertFalse(os.path.exists(data_path))
+        self.assertIsNone(open_columnar(oldest.pk))
+        self.assertEqual(OrphanedFile.objects.count(), 0)
+
+    @override_settings(DATASET_RETENTION_MAX_COUNT=None, DATASET_RETENTION_MAX_AGE_DAYS=30)
+    def test_age_policy(self):
+        old = self.upload_dataset(0)
+        recent = self.upload_dataset(1)
+        Dataset.objects.filter(pk=old.pk).update(uploaded_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(enforce_retention(), 1)
+        self.assertEqual(list(Dataset.objects.values_list('pk', flat=True)), [recent.pk])
+
+    @override_settings(DATASET_RETENTION_MAX_COUNT=None)
+    def test_total_bytes_policy_keeps_newest_that_fit(self):
+        datasets = [self.upload_dataset(index) for index in range(3)]
+        with override_settings(DATASET_RETENTION_MAX_TOTAL_BYTES=datasets[0].data_size * 2):
+            self.assertEqual(enforce_retention(), 1)
+        self.assertFalse(Dataset.objects.filter(pk=datasets[0].pk).exists())
+        self.assertEqual(Dataset.objects.count(), 2)
+
+    @override_settings(DATASET_RETENTION_MAX_COUNT=None, DATASET_RETENTION_MAX_TOTAL_BYTES=1)
+    def test_upload_is_not_evicted_by_its_own_retention_pass(self):
+        older = self.upload_dataset(0)
+        newest = self.upload_dataset(1)
+        self.assertEqual(list(Dataset.objects.values_list('pk', flat=True)), [newest.pk])
+        self.assertFalse(Dataset.objects.filter(pk=older.pk).exists())
+
+
+class TokenAuthTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('tester', password='secret-pass')
+        self.client = APIClient()
+
+    def obtain(self):
+        return self.client.post('/api/auth/token/', {'username': 'tester', 'password': 'secret-pass'})
+
+    def test_token_authenticates_without_password_check(self):
+        token = self.obtain().data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        with mock.patch.object(get_user_model(), 'check_password') as check_password:
+            response = self.client.get('/api/history/')
+        check_password.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(AUTH_TOKEN_TTL_SECONDS=60)
+    def test_expired_token_is_rejected_and_rotated_on_login(self):
+        first = self.obtain().data['token']
+        Token.objects.filter(key=first).update(created=timezone.now() - timedelta(seconds=61))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {first}')
+        self.assertEqual(self.client.get('/api/history/').status_code, 401)
+
+        self.client.credentials()
+        second = self.obtain().data['token']
+        self.assertNotEqual(first, second)
+
+    def test_delete_revokes_token(self):
+        token = self.obtain().data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(self.client.delete('/api/auth/token/').status_code, 204)
+        self.assertEqual(self.client.get('/api/history/').status_code, 401)
+
+
+class AsyncURLConf:
+    """The project URLs as asgi.py serves them."""
+
+    urlpatterns = [path('api/', include(api_urlpatterns(async_views=True)))]
+
+
+# Pool threads would open their own connection to the test database, outside
+# the test's transaction, so the views run on Django's shared thread here.
+@override_settings(ROOT_URLCONF=AsyncURLConf, ASYNC_OFFLOAD_WORKERS=0)
+class AsyncViewTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        token = issue_token(self.user)
+        self.auth = {'headers': {'Authorization': f'Token {token.key}'}}
+
+    async def upload(self):
+        return await self.async_client.post(
+            '/api/upload/', {'file': SimpleUploadedFile('plant.csv', SAMPLE_CSV, content_type='text/csv')}, **self.auth
+        )
+
+    async def test_upload_history_and_streamed_report(self):
+        response = await self.upload()
+        self.assertEqual(response.status_code, 201)
+        dataset_id = response.json()['dataset']['id']
+
+        history = await self.async_client.get('/api/history/?fields=id', **self.auth)
+        self.assertEqual(history.json(), [{'id': dataset_id}])
+
+        await sync_to_async(run_pending_jobs)()
+        report = await self.async_client.get(f'/api/datasets/{dataset_id}/report/', **self.auth)
+        self.assertEqual(report.status_code, 200)
+        # An async iterator, so Django streams it instead of buffering it whole.
+        self.assertTrue(report.is_async)
+        body = b''.join([chunk async for chunk in report.streaming_content])
+        self.assertTrue(body.startswith(b'%PDF'))
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/history/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(METRICS_ENABLED=True)
+    async def test_server_timing_under_asgi(self):
+        response = await self.upload()
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        self.assertIn('parse', stages)
+        self.assertIn('total', stages)
+
+
+class OffloadTests(TestCase):
+    @override_settings(ASYNC_OFFLOAD_WORKERS=2)
+    def test_pool_is_bounded_and_keeps_context(self):
+        self.addCleanup(offload.shutdown_offload_executor)
+        marker = contextvars.ContextVar('marker')
+        lock = threading.Lock()
+        running = set()
+        peak = 0
+
+        def work(index):
+            nonlocal peak
+            with lock:
+                running.add(index)
+                peak = max(peak, len(running))
+            time.sleep(0.02)
+            with lock:
+                running.discard(index)
+            return marker.get(), threading.current_thread().name
+
+        async def requests():
+            marker.set('request')
+            return await asyncio.gather(*(offload.run_blocking(work, index) for index in range(6)))
+
+        results = asyncio.run(requests())
+        self.assertEqual(peak, 2)
+        self.assertEqual({value for value, _ in results}, {'request'})
+        self.assertTrue(all(name.startswith('offload') for _, name in results))
+
+    def test_iterate_blocking(self):
+        async def collect():
+            return [chunk async for chunk in offload.iterate_blocking(iter([b'a', b'b']))]
+
+        self.assertEqual(asyncio.run(collect()), [b'a', b'b'])
@@ -0,0 +1,152 @@
+"""
+Resumable upload sessions.
+
+Chunks are written at their offset into ``MEDIA_ROOT/upload_sessions/<id>.part``.
+A running SHA-256 is kept per process; if a chunk lands on a worker that has
+not seen the earlier ones (or after a restart) the digest is rebuilt from the
+partial file, so finalize always knows the hash of the complete body.
+"""
+from __future__ import annotations
+
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from pathlib import Path
+from typing import Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import UploadSession
+
+READ_BYTES = 64 * 1024
+MAX_TRACKED_HASHES = 128
+STALE_SESSION_HOURS = 24
+
+_hash_lock = threading.Lock()
+# session id -> (bytes hashed so far, hashlib object)
+_running_hashes: 'OrderedDict[str, Tuple[int, object]]' = OrderedDict()
+
+
+class SessionFile(File):
+    """The finished partial file; storage moves it into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def partial_path(session: UploadSession) -> Path:
+    return Path(settings.MEDIA_ROOT) / 'upload_sessions' / f'{session.pk}.part'
+
+
+def _rebuild_hash(path: Path, length: int):
+    sha256 = hashlib.sha256()
+    remaining = length
+    if remaining:
+        with open(path, 'rb') as handle:
+            while remaining > 0:
+                chunk = handle.read(min(READ_BYTES, remaining))
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                remaining -= len(chunk)
+    return sha256
+
+
+def _hash_at(session: UploadSession, offset: int):
+    """Return a hash object covering exactly the first ``offset`` bytes."""
+    key = str(session.pk)
+    with _hash_lock:
+        tracked = _running_hashes.pop(key, None)
+    if tracked is not None and tracked[0] == offset:
+        return tracked[1]
+    return _rebuild_hash(partial_path(session), offset)
+
+
+def _remember_hash(session: UploadSession, offset: int, sha256) -> None:
+    key = str(session.pk)
+    with _hash_lock:
+        _running_hashes[key] = (offset, sha256)
+        while len(_running_hashes) > MAX_TRACKED_HASHES:
+            _running_hashes.popitem(last=False)
+
+
+def spool_chunk(stream, max_bytes: int):
+    """
+    Read a request body into a temporary file, rewound, before any lock is
+    taken. Raises ValueError if the body exceeds ``max_bytes``.
+    """
+    spooled = tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR)
+    written = 0
+    try:
+        while True:
+            chunk = stream.read(READ_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise ValueError(f'Chunk exceeds the {max_bytes} byte limit.')
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+def write_chunk(session: UploadSession, offset: int, spooled) -> int:
+    """
+    Copy a spooled chunk (see ``spool_chunk``) to ``offset`` and return the
+    new end offset.
+
+    Writing is positional and truncates after the chunk, so a retried PUT of
+    the same chunk is harmless.
+    """
+    path = partial_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sha256 = _hash_at(session, offset)
+    written = 0
+    with open(path, 'r+b' if path.exists() else 'w+b') as handle:
+        handle.seek(offset)
+        while True:
+            chunk = spooled.read(READ_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            handle.write(chunk)
+            sha256.update(chunk)
+        handle.truncate(offset + written)
+    _remember_hash(session, offset + written, sha256)
+    return offset + written
+
+
+def finished_file(session: UploadSession) -> Tuple[SessionFile, str]:
+    """Open the completed partial file and return it with its SHA-256."""
+    sha256 = _hash_at(session, session.received_bytes)
+    path = partial_path(session)
+    session_file = SessionFile(open(path, 'rb'), name=session.filename)
+    session_file.sha256 = sha256.hexdigest()
+    return session_file, session_file.sha256
+
+
+def discard(session: UploadSession) -> None:
+    with _hash_lock:
+        _running_hashes.pop(str(session.pk), None)
+    partial_path(session).unlink(missing_ok=True)
+
+
+def purge_stale_sessions(max_age_hours: int = STALE_SESSION_HOURS) -> int:
+    """
+    Delete unfinished sessions nobody has touched for ``max_age_hours``,
+    including finalizes whose process died.
+    """
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    unfinished = [UploadSession.OPEN, UploadSession.FINALIZING]
+    stale = list(UploadSession.objects.filter(status__in=unfinished, updated_at__lt=cutoff))
+    for session in stale:
+        discard(session)
+    UploadSession.objects.filter(pk__in=[session.pk for session in stale]).delete()
+    return len(stale)
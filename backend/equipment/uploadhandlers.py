@@ -0,0 +1,49 @@
+"""
+Upload handlers that hash file bodies while Django streams them in.
+
+Each finished UploadedFile gets a ``sha256`` attribute, so the upload view can
+detect repeated files without reading them a second time.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class Sha256UploadMixin:
+    def new_file(self, *args, **kwargs):
+        # Set before super(): MemoryFileUploadHandler.new_file raises
+        # StopFutureHandlers once it decides to keep the file in memory.
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self.sha256.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(Sha256UploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(Sha256UploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def uploaded_file_sha256(uploaded_file) -> str:
+    """Return the streamed digest, hashing the file now if another handler stored it."""
+    digest = getattr(uploaded_file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        sha256.update(chunk)
+    uploaded_file.seek(0)
+    return sha256.hexdigest()
@@ -1,9 +1,40 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import DatasetHistoryView, DatasetReportView, UploadDatasetView
+from .offload import offloaded
+from .views import (
+    DatasetBulkExportView,
+    DatasetDistributionView,
+    DatasetExportView,
+    DatasetHistoryView,
+    DatasetReportView,
+    DatasetStatsView,
+    DatasetTrendsView,
+    ObtainTokenView,
+    UploadDatasetView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadSessionFinalizeView,
+)
 
-urlpatterns = [
-    path('upload/', UploadDatasetView.as_view(), name='upload-dataset'),
-    path('history/', DatasetHistoryView.as_view(), name='dataset-history'),
-    path('datasets/<uuid:dataset_id>/report/', DatasetReportView.as_view(), name='dataset-report'),
-]
+
+def api_urlpatterns(async_views: bool) -> list:
+    """The API routes; with ``async_views`` each view runs through ``offloaded``."""
+    wrap = offloaded if async_views else (lambda view: view)
+    return [
+        path('auth/token/', wrap(ObtainTokenView.as_view()), name='obtain-token'),
+        path('upload/', wrap(UploadDatasetView.as_view()), name='upload-dataset'),
+        path('uploads/', wrap(UploadSessionCreateView.as_view()), name='upload-session-create'),
+        path('uploads/<uuid:session_id>/', wrap(UploadSessionDetailView.as_view()), name='upload-session-detail'),
+        path('uploads/<uuid:session_id>/finalize/', wrap(UploadSessionFinalizeView.as_view()), name='upload-session-finalize'),
+        path('history/', wrap(DatasetHistoryView.as_view()), name='dataset-history'),
+        path('datasets/trends/', wrap(DatasetTrendsView.as_view()), name='dataset-trends'),
+        path('datasets/export/<str:export_format>/', wrap(DatasetBulkExportView.as_view()), name='dataset-bulk-export'),
+        path('datasets/<uuid:dataset_id>/report/', wrap(DatasetReportView.as_view()), name='dataset-report'),
+        path('datasets/<uuid:dataset_id>/stats/', wrap(DatasetStatsView.as_view()), name='dataset-stats'),
+        path('datasets/<uuid:dataset_id>/export/<str:export_format>/', wrap(DatasetExportView.as_view()), name='dataset-export'),
+        path('datasets/<uuid:dataset_id>/distribution/', wrap(DatasetDistributionView.as_view()), name='dataset-distribution'),
+    ]
+
+
+urlpatterns = api_urlpatterns(settings.ASYNC_VIEWS)
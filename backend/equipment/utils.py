@@ -1,12 +1,35 @@
 from __future__ import annotations
 
-from datetime import datetime
+import csv
+import gzip
+import io
+import json
+import shutil
+import zlib
+from collections import Counter
+from contextlib import nullcontext
 from io import BytesIO
-from typing import Dict, Any
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.conf import settings
+
+from .reports import write_report
+from .sketches import HISTOGRAM_BINS, QuantileSketch
+
+try:  # zstd uploads are accepted only when the optional package is installed.
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+try:  # Faster CSV tokenizer; pandas' C parser is used without it.
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+except ImportError:  # pragma: no cover - depends on the environment
+    pyarrow = None
 
 NUMERIC_COLUMNS = {
     'flowrate': 'avg_flowrate',
@@ -14,100 +37,648 @@ NUMERIC_COLUMNS = {
     'temperature': 'avg_temperature',
 }
 
+# Rows parsed per chunk when streaming a CSV; bounds peak memory per upload.
+CSV_CHUNK_ROWS = 50_000
+
+
+# Compressed uploads are recognised by their magic bytes and stored as sent.
+COMPRESSION_MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+COMPRESSION_SUFFIXES = {
+    'gzip': ('.gz', '.gzip'),
+    'zstd': ('.zst', '.zstd'),
+}
+COMPRESSION_CONTENT_TYPES = {
+    'application/gzip': 'gzip',
+    'application/x-gzip': 'gzip',
+    'application/zstd': 'zstd',
+}
+
+
+def sniff_compression(file_like) -> Optional[str]:
+    """Return 'gzip', 'zstd' or None; the stream position is left unchanged."""
+    if not getattr(file_like, 'seekable', lambda: False)():
+        return None
+    position = file_like.tell()
+    head = file_like.read(4)
+    file_like.seek(position)
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def strip_compression_suffix(filename: str, compression: Optional[str]) -> str:
+    for suffix in COMPRESSION_SUFFIXES.get(compression, ()):
+        if filename.lower().endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+# What parsing raises for an upload that is not a readable CSV: bad encodings,
+# malformed rows and missing headers are ValueErrors, corrupt or truncated
+# compressed streams raise the rest. Anything else is a server fault.
+CSV_PARSE_ERRORS = (ValueError, EOFError, gzip.BadGzipFile, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+
+def open_csv_stream(file_like):
+    """
+    Return a binary stream of CSV bytes, decompressing gzip or zstd on the fly.
+
+    Nothing is written to disk; the decompressor reads from ``file_like`` as
+    pandas consumes the stream.
+    """
+    compression = sniff_compression(file_like)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=file_like, mode='rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError('zstd-compressed CSVs require the zstandard package on the server.')
+        # Buffered so the header can be read with readline().
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(file_like, closefd=False))
+    return file_like
+
+
+# Schema-aware parsing
+#
+# Only the known columns are read (matched case- and whitespace-insensitively
+# from the header) and numeric columns are converted to float64 exactly once,
+# here; later stages see float64 and skip to_numeric. Cells that are not numbers
+# become NaN. pyarrow's multithreaded reader is used when it is installed.
+CSV_TEXT_COLUMNS = ('Equipment Name', 'Type')
+CSV_NUMERIC_COLUMNS = tuple(column.title() for column in NUMERIC_COLUMNS)
+CSV_ENGINE = 'pyarrow' if pyarrow is not None else 'c'
+# pandas' default NA markers, applied to the pyarrow reader as well.
+CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+ARROW_BLOCK_BYTES = 1024 * 1024
+_NULL_CONTEXT = nullcontext()
+
+
+def _canonical_column(name: str) -> Optional[str]:
+    stripped = name.strip()
+    if stripped.lower() in NUMERIC_COLUMNS or stripped.lower() in ('type', 'equipment name'):
+        return stripped.title()
+    return None
+
+
+def _read_layout(stream) -> Tuple[List[str], List[str]]:
+    """
+    Consume the header line and return (names for every column, known columns
+    to read). Unknown and repeated columns get placeholder names and are skipped.
+    """
+    line = stream.readline()
+    if not line.strip():
+        raise pd.errors.EmptyDataError('No columns to parse from file')
+    names: List[str] = []
+    selected: List[str] = []
+    for index, raw in enumerate(next(csv.reader([line.decode('utf-8-sig')]))):
+        canonical = _canonical_column(raw)
+        if canonical is not None and canonical not in selected:
+            selected.append(canonical)
+            names.append(canonical)
+        else:
+            names.append(f'_unused_{index}')
+    return names, selected
+
+
+def _as_float(series: pd.Series) -> pd.Series:
+    if series.dtype == np.float64:
+        return series
+    return pd.to_numeric(series, errors='coerce').astype(np.float64)
 
-def normalize_dataframe(file_like) -> pd.DataFrame:
-    df = pd.read_csv(file_like)
-    df.columns = [col.strip() for col in df.columns]
-    rename_map = {}
-    for col in df.columns:
-        lower = col.lower()
-        if lower in NUMERIC_COLUMNS or lower == 'type' or lower == 'equipment name':
-            rename_map[col] = col.title()
-    df = df.rename(columns=rename_map)
-    return df
+
+def _iter_chunks_c(stream, names: List[str], selected: List[str], chunksize: Optional[int]) -> Iterable[pd.DataFrame]:
+    # Numeric columns are left to the C parser's own float conversion; only
+    # columns holding junk come back as objects and go through to_numeric.
+    # (An explicit dtype map makes this parser slower and larger, not faster.)
+    options = {'header': None, 'names': names, 'usecols': selected or names[:1]}
+    if chunksize is None:
+        chunks: Iterable[pd.DataFrame] = [pd.read_csv(stream, **options)]
+    else:
+        chunks = pd.read_csv(stream, chunksize=chunksize, **options)
+    for chunk in chunks:
+        if list(chunk.columns) != selected:
+            chunk = chunk[selected]
+        for column in CSV_NUMERIC_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = _as_float(chunk[column])
+        yield chunk
+
+
+def _iter_chunks_arrow(stream, names: List[str], selected: List[str], chunksize: Optional[int]) -> Iterable[pd.DataFrame]:
+    # Everything is read as strings and numbers are cast in one vectorised
+    # step per batch; a batch whose cast fails falls back to to_numeric.
+    included = selected or names[:1]
+    reader = pyarrow.csv.open_csv(
+        stream,
+        read_options=pyarrow.csv.ReadOptions(column_names=names, block_size=ARROW_BLOCK_BYTES),
+        convert_options=pyarrow.csv.ConvertOptions(
+            include_columns=included,
+            column_types={column: pyarrow.string() for column in included},
+            null_values=CSV_NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    offset = 0
+    for batch in reader:
+        step = chunksize or batch.num_rows
+        for start in range(0, batch.num_rows, step):
+            part = batch.slice(start, step)
+            data = {}
+            for column in selected:
+                values = part.column(column)
+                if column in CSV_NUMERIC_COLUMNS:
+                    try:
+                        data[column] = pyarrow.compute.cast(values, pyarrow.float64()).to_numpy(zero_copy_only=False)
+                    except pyarrow.ArrowInvalid:
+                        data[column] = _as_float(values.to_pandas()).to_numpy()
+                else:
+                    data[column] = values.to_numpy(zero_copy_only=False)
+            yield pd.DataFrame(data, index=pd.RangeIndex(offset, offset + part.num_rows), columns=selected)
+            offset += part.num_rows
+
+
+def iter_normalized_chunks(
+    file_like,
+    chunksize: Optional[int] = CSV_CHUNK_ROWS,
+    engine: Optional[str] = None,
+) -> Iterable[pd.DataFrame]:
+    """
+    Yield normalized DataFrames of at most ``chunksize`` rows from a (possibly
+    compressed) CSV; ``chunksize=None`` yields the whole file as one frame.
+
+    ``engine`` is 'pyarrow' or 'c' (default: pyarrow when installed). Where the
+    pyarrow reader rejects the file, e.g. at a ragged row, the file is re-read
+    with pandas and the rows already yielded are skipped, so the output is
+    what the C engine alone would give.
+    """
+    engine = engine or CSV_ENGINE
+    start = file_like.tell() if getattr(file_like, 'seekable', lambda: False)() else None
+    stream = open_csv_stream(file_like)
+    names, selected = _read_layout(stream)
+    yielded = 0
+    if engine == 'pyarrow':
+        try:
+            for chunk in _iter_chunks_arrow(stream, names, selected, chunksize):
+                yield chunk
+                yielded += len(chunk)
+            return
+        except pyarrow.ArrowInvalid as exc:
+            if start is None:
+                raise ValueError(str(exc)) from exc
+        file_like.seek(start)
+        stream = open_csv_stream(file_like)
+        _read_layout(stream)
+    for chunk in _iter_chunks_c(stream, names, selected, chunksize):
+        if yielded >= len(chunk):
+            yielded -= len(chunk)
+            continue
+        if yielded:
+            chunk = chunk.iloc[yielded:]
+            yielded = 0
+        yield chunk
+
+
+def normalize_dataframe(file_like, engine: Optional[str] = None) -> pd.DataFrame:
+    chunks = list(iter_normalized_chunks(file_like, chunksize=None, engine=engine))
+    if not chunks:
+        return pd.DataFrame()
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+
+
+# Sums are kept as exact integers in units of 2**-1074 (the smallest float64),
+# so a mean does not depend on how the rows were split into chunks or worker
+# ranges: serial and parallel summaries agree to the last bit.
+EXACT_SUM_SHIFT = 1074
+_HALF_BITS = 26
+# bincount adds in float64; 2**24 values of at most 2**27 stay below 2**53.
+_EXACT_SUM_BLOCK = 1 << 24
+
+
+def _exact_sum(values: np.ndarray) -> int:
+    """Exact sum of finite float64 ``values``, scaled by 2**EXACT_SUM_SHIFT."""
+    total = 0
+    for start in range(0, values.size, _EXACT_SUM_BLOCK):
+        bits = np.ascontiguousarray(values[start:start + _EXACT_SUM_BLOCK], dtype=np.float64).view(np.int64)
+        biased_exponent = (bits >> 52) & 0x7FF
+        mantissa = bits & ((1 << 52) - 1)
+        mantissa |= (biased_exponent > 0).astype(np.int64) << 52
+        np.negative(mantissa, out=mantissa, where=bits < 0)
+        # Sum the high and low halves of the mantissas per exponent.
+        high = mantissa >> _HALF_BITS
+        low = mantissa & ((1 << _HALF_BITS) - 1)
+        high_sums = np.bincount(biased_exponent, weights=high)
+        low_sums = np.bincount(biased_exponent, weights=low)
+        for exponent in np.flatnonzero((high_sums != 0) | (low_sums != 0)).tolist():
+            shift = max(exponent, 1) - 1
+            total += (int(high_sums[exponent]) << (shift + _HALF_BITS)) + (int(low_sums[exponent]) << shift)
+    return total
+
+
+class SummaryAccumulator:
+    """
+    Mergeable partial aggregates for ``compute_summary``.
+
+    Each chunk (or worker) keeps counts, sums, quantile sketches and type
+    counters; partials are combined with ``merge`` and turned into the summary
+    dict by ``result``.
+    """
+
+    def __init__(self):
+        self.total_records = 0
+        # Exact sums of the finite values (see ``_exact_sum``) plus a plain
+        # float sum of any infinities.
+        self.sums = {column: 0 for column in NUMERIC_COLUMNS}
+        self.non_finite = {column: 0.0 for column in NUMERIC_COLUMNS}
+        self.counts = {column: 0 for column in NUMERIC_COLUMNS}
+        self.sketches = {column: QuantileSketch() for column in NUMERIC_COLUMNS}
+        self.type_counts: Counter = Counter()
+        self.has_type_column = False
+
+    def update(self, df: pd.DataFrame) -> 'SummaryAccumulator':
+        self.total_records += int(len(df))
+
+        for column in NUMERIC_COLUMNS:
+            formatted_column = column.title()
+            if formatted_column in df.columns:
+                values = _as_float(df[formatted_column]).to_numpy()
+                values = values[~np.isnan(values)]
+                finite = np.isfinite(values)
+                if not finite.all():
+                    self.non_finite[column] += float(values[~finite].sum())
+                    values = values[finite]
+                self.sums[column] += _exact_sum(values)
+                self.sketches[column].update(values)
+                self.counts[column] += int(finite.size)
+
+        type_column = next((c for c in df.columns if c.lower() == 'type'), None)
+        if type_column:
+            self.has_type_column = True
+            self.type_counts.update(
+                df[type_column]
+                .fillna('Unknown')
+                .astype(str)
+                .str.strip()
+                .value_counts()
+                .to_dict()
+            )
+        return self
+
+    def merge(self, other: 'SummaryAccumulator') -> 'SummaryAccumulator':
+        self.total_records += other.total_records
+        for column in NUMERIC_COLUMNS:
+            self.sums[column] += other.sums[column]
+            self.non_finite[column] += other.non_finite[column]
+            self.sketches[column].merge(other.sketches[column])
+            self.counts[column] += other.counts[column]
+        self.type_counts.update(other.type_counts)
+        self.has_type_column = self.has_type_column or other.has_type_column
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        summary = {
+            'total_records': self.total_records,
+            'avg_flowrate': None,
+            'avg_pressure': None,
+            'avg_temperature': None,
+            'type_distribution': {},
+            'distributions': {},
+        }
+        for column, summary_key in NUMERIC_COLUMNS.items():
+            sketch = self.sketches[column]
+            if sketch.count:
+                summary['distributions'][column.title()] = {
+                    'sketch': sketch.to_dict(),
+                    'histogram': sketch.histogram(HISTOGRAM_BINS),
+                }
+            count = self.counts[column]
+            if count:
+                if self.non_finite[column]:
+                    mean = self.non_finite[column]
+                else:
+                    # int / int is correctly rounded, however large the sum.
+                    mean = self.sums[column] / (count << EXACT_SUM_SHIFT)
+                summary[summary_key] = round(mean, 2)
+        if self.has_type_column:
+            # Ties are broken by label so the order does not depend on which
+            # chunk saw a type first.
+            summary['type_distribution'] = dict(
+                sorted(self.type_counts.items(), key=lambda item: (-item[1], item[0]))
+            )
+        return summary
 
 
 def compute_summary(df: pd.DataFrame) -> Dict[str, Any]:
-    summary = {
-        'total_records': int(len(df)),
-        'avg_flowrate': None,
-        'avg_pressure': None,
-        'avg_temperature': None,
-        'type_distribution': {},
-    }
-
-    for column, summary_key in NUMERIC_COLUMNS.items():
-        formatted_column = column.title()
-        if formatted_column in df.columns:
-            numeric_series = pd.to_numeric(df[formatted_column], errors='coerce')
-            if not numeric_series.dropna().empty:
-                summary[summary_key] = round(float(numeric_series.mean()), 2)
-
-    type_column = next((c for c in df.columns if c.lower() == 'type'), None)
-    if type_column:
-        distribution = (
-            df[type_column]
-            .fillna('Unknown')
-            .astype(str)
-            .str.strip()
-            .value_counts()
-            .to_dict()
-        )
-        summary['type_distribution'] = distribution
-
-    return summary
+    """
+    The dataset summary. ``distributions`` (per-column sketches and histograms)
+    is stored on ``Dataset.distributions`` for the stats endpoints and is not
+    part of the serialized dataset.
+    """
+    return SummaryAccumulator().update(df).result()
+
+
+def summarize_csv(
+    file_like,
+    chunksize: int = CSV_CHUNK_ROWS,
+    on_chunk: Optional[Callable[[pd.DataFrame], None]] = None,
+    engine: Optional[str] = None,
+    clock: Optional[Callable[[str], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Compute the ``compute_summary`` result for a CSV without loading it whole.
+
+    See ``accumulate_csv`` for the arguments.
+    """
+    return accumulate_csv(file_like, chunksize, on_chunk, engine, clock).result()
+
+
+def accumulate_csv(
+    file_like,
+    chunksize: int = CSV_CHUNK_ROWS,
+    on_chunk: Optional[Callable[[pd.DataFrame], None]] = None,
+    engine: Optional[str] = None,
+    clock: Optional[Callable[[str], Any]] = None,
+) -> SummaryAccumulator:
+    """
+    Stream a CSV into a ``SummaryAccumulator`` (mergeable with others).
+
+    Memory use is bounded by ``chunksize`` rows regardless of file size.
+    ``on_chunk`` receives every normalized chunk, so other per-row outputs
+    (e.g. the columnar sidecar) can be built in the same pass. ``clock(name)``
+    returns a context manager timing the 'parse', 'summarize' and 'on_chunk'
+    steps (see ``equipment.metrics.clock``).
+    """
+    clock = clock or _untimed
+    accumulator = SummaryAccumulator()
+    chunks = iter(iter_normalized_chunks(file_like, chunksize=chunksize, engine=engine))
+    while True:
+        with clock('parse'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with clock('summarize'):
+            accumulator.update(chunk)
+        if on_chunk is not None:
+            with clock('on_chunk'):
+                on_chunk(chunk)
+    return accumulator
+
+
+def _untimed(name: str):
+    return _NULL_CONTEXT
+
+
+# Columnar sidecar
+#
+# Each dataset gets a directory of raw little-endian column files next to the
+# CSV: float64 for numeric columns, int32 codes plus a JSON category list for
+# text columns (-1 marks a missing value).  ``meta.json`` records row count and
+# layout so ``open_columnar`` can memory-map exactly the columns a query needs.
+
+COLUMNAR_NUMERIC = [column.title() for column in NUMERIC_COLUMNS]
+COLUMNAR_CATEGORICAL = ['Type', 'Equipment Name']
+COLUMNAR_META = 'meta.json'
+COLUMNAR_VERSION = 1
+
+
+def columnar_dir(dataset_id) -> Path:
+    return Path(settings.MEDIA_ROOT) / 'columns' / str(dataset_id)
+
+
+def _column_slug(column: str) -> str:
+    return column.lower().replace(' ', '_')
+
+
+class ColumnarWriter:
+    """Appends normalized chunks to per-column files; pass ``write`` as ``on_chunk``."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.num_rows = 0
+        self._handles = {}
+        self._categories: Dict[str, Dict[str, int]] = {}
+
+    def _handle(self, filename: str):
+        if filename not in self._handles:
+            self._handles[filename] = open(self.directory / filename, 'wb')
+        return self._handles[filename]
+
+    def write(self, df: pd.DataFrame) -> None:
+        for column in COLUMNAR_NUMERIC:
+            if column in df.columns:
+                values = _as_float(df[column]).to_numpy(dtype='<f8', na_value=np.nan)
+                values.tofile(self._handle(f'{_column_slug(column)}.f64'))
+        for column in COLUMNAR_CATEGORICAL:
+            if column in df.columns:
+                self._encode(column, df[column]).tofile(self._handle(f'{_column_slug(column)}.codes.i32'))
+        self.num_rows += int(len(df))
+
+    def _encode(self, column: str, series: pd.Series) -> np.ndarray:
+        mapping = self._categories.setdefault(column, {})
+        local_codes, uniques = pd.factorize(series.astype('string').str.strip())
+        if not len(uniques):
+            return np.full(len(series), -1, dtype='<i4')
+        global_codes = np.array([mapping.setdefault(value, len(mapping)) for value in uniques], dtype='<i4')
+        return np.where(local_codes >= 0, global_codes[local_codes], -1).astype('<i4')
+
+    def append(self, part: 'ColumnarDataset') -> None:
+        """Append another sidecar's rows, re-coding its categories onto this writer's."""
+        for column in COLUMNAR_NUMERIC:
+            if column in part.columns:
+                part.numeric(column).tofile(self._handle(f'{_column_slug(column)}.f64'))
+        for column in COLUMNAR_CATEGORICAL:
+            if column in part.columns:
+                mapping = self._categories.setdefault(column, {})
+                codes = part.codes(column)
+                lookup = np.array(
+                    [mapping.setdefault(value, len(mapping)) for value in part.categories(column)] + [-1],
+                    dtype='<i4',
+                )
+                # Missing values (-1) index the trailing -1.
+                lookup[codes].astype('<i4').tofile(self._handle(f'{_column_slug(column)}.codes.i32'))
+        self.num_rows += part.num_rows
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+        columns = {}
+        for column in COLUMNAR_NUMERIC:
+            filename = f'{_column_slug(column)}.f64'
+            if filename in self._handles:
+                columns[column] = {'kind': 'numeric', 'dtype': '<f8', 'file': filename}
+        for column, mapping in self._categories.items():
+            slug = _column_slug(column)
+            categories_file = f'{slug}.categories.json'
+            with open(self.directory / categories_file, 'w', encoding='utf-8') as handle:
+                # json.dumps encodes in one C call; json.dump to a file goes
+                # through the pure-Python iterator (slow for large dictionaries).
+                handle.write(json.dumps(list(mapping)))
+            columns[column] = {
+                'kind': 'categorical',
+                'dtype': '<i4',
+                'file': f'{slug}.codes.i32',
+                'categories': categories_file,
+            }
+        meta = {'version': COLUMNAR_VERSION, 'num_rows': self.num_rows, 'columns': columns}
+        with open(self.directory / COLUMNAR_META, 'w', encoding='utf-8') as handle:
+            json.dump(meta, handle)
+
+    def abort(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ColumnarDataset:
+    """Read-only, memory-mapped view over a dataset's columnar sidecar."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / COLUMNAR_META, encoding='utf-8') as handle:
+            self.meta = json.load(handle)
+        self.num_rows: int = self.meta['num_rows']
+        self._category_cache: Dict[str, List[str]] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.meta['columns'])
+
+    def _spec(self, column: str) -> Dict[str, Any]:
+        try:
+            return self.meta['columns'][column]
+        except KeyError as exc:
+            raise KeyError(f'Column {column!r} is not stored for this dataset') from exc
+
+    def _map(self, spec: Dict[str, Any]) -> np.ndarray:
+        if self.num_rows == 0:
+            return np.empty(0, dtype=spec['dtype'])
+        return np.memmap(self.directory / spec['file'], dtype=spec['dtype'], mode='r', shape=(self.num_rows,))
+
+    def numeric(self, column: str) -> np.ndarray:
+        """Zero-copy float64 view of a numeric column (NaN for unparseable values)."""
+        return self._map(self._spec(column))
+
+    def codes(self, column: str) -> np.ndarray:
+        """Zero-copy int32 dictionary codes of a categorical column (-1 = missing)."""
+        return self._map(self._spec(column))
+
+    def categories(self, column: str) -> List[str]:
+        if column not in self._category_cache:
+            spec = self._spec(column)
+            with open(self.directory / spec['categories'], encoding='utf-8') as handle:
+                self._category_cache[column] = json.load(handle)
+        return self._category_cache[column]
+
+    def categorical(self, column: str) -> pd.Categorical:
+        return pd.Categorical.from_codes(self.codes(column), categories=self.categories(column))
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        data = {}
+        for column in columns or self.columns:
+            if self._spec(column)['kind'] == 'categorical':
+                data[column] = self.categorical(column)
+            else:
+                data[column] = self.numeric(column)
+        return pd.DataFrame(data)
+
+
+def open_columnar(dataset_id) -> Optional[ColumnarDataset]:
+    """Open the sidecar for ``dataset_id``, or return None if it was never built."""
+    directory = columnar_dir(dataset_id)
+    if not (directory / COLUMNAR_META).exists():
+        return None
+    return ColumnarDataset(directory)
+
+
+# Grouped statistics
+
+STATS_METRICS = ('count', 'mean', 'min', 'max', 'std', 'sum', 'median')
+STATS_GROUP_COLUMNS = ('Type',)
+MISSING_TYPE_LABEL = 'Unknown'
+
+
+def parse_stats_metrics(raw: str) -> List[str]:
+    """
+    Validate a comma separated metric list such as ``mean,p95,max``.
+
+    ``pNN`` requests the NN-th percentile (1-99). Raises ValueError on unknown names.
+    """
+    metrics = [item.strip().lower() for item in raw.split(',') if item.strip()]
+    if not metrics:
+        raise ValueError('At least one metric is required.')
+    for metric in metrics:
+        if metric in STATS_METRICS:
+            continue
+        if metric.startswith('p') and metric[1:].isdigit() and 1 <= int(metric[1:]) <= 99:
+            continue
+        raise ValueError(f'Unsupported metric {metric!r}. Use {", ".join(STATS_METRICS)} or pNN.')
+    return list(dict.fromkeys(metrics))
+
+
+def _clean_stat(value) -> Optional[float]:
+    if value is None or pd.isna(value):
+        return None
+    return float(value)
+
+
+def compute_grouped_stats(
+    frame: pd.DataFrame,
+    columns: List[str],
+    metrics: List[str],
+    group_by: Optional[str] = None,
+) -> Dict[str, Dict[str, Dict[str, Optional[float]]]]:
+    """
+    Return ``{group: {column: {metric: value}}}`` for the numeric ``columns``.
+
+    Plain aggregates run as one cythonized ``groupby().agg`` call and all
+    percentiles as one ``groupby().quantile`` call. Without ``group_by`` the
+    whole dataset is reported under the key ``"all"``.
+    """
+    if group_by:
+        keys = frame[group_by]
+        if isinstance(keys.dtype, pd.CategoricalDtype):
+            if MISSING_TYPE_LABEL not in keys.cat.categories:
+                keys = keys.cat.add_categories(MISSING_TYPE_LABEL)
+            keys = keys.fillna(MISSING_TYPE_LABEL)
+        else:
+            keys = keys.fillna(MISSING_TYPE_LABEL).astype(str).str.strip()
+    else:
+        keys = pd.Series('all', index=frame.index)
+    grouped = frame[columns].groupby(keys, observed=True, sort=True)
+
+    plain = [metric for metric in metrics if metric in STATS_METRICS]
+    percentiles = [metric for metric in metrics if metric not in STATS_METRICS]
+    aggregated = grouped.agg(plain) if plain else None
+    quantiles = grouped.quantile([int(metric[1:]) / 100 for metric in percentiles]) if percentiles else None
+
+    result: Dict[str, Dict[str, Dict[str, Optional[float]]]] = {}
+    for group in grouped.groups:
+        group_stats = {}
+        for column in columns:
+            column_stats = {}
+            for metric in metrics:
+                if metric in STATS_METRICS:
+                    column_stats[metric] = _clean_stat(aggregated.at[group, (column, metric)])
+                else:
+                    column_stats[metric] = _clean_stat(quantiles.at[(group, int(metric[1:]) / 100), column])
+            if 'count' in column_stats and column_stats['count'] is not None:
+                column_stats['count'] = int(column_stats['count'])
+            group_stats[column] = column_stats
+        result[str(group)] = group_stats
+    return result
 
 
 def generate_pdf(summary: Dict[str, Any], dataset_name: str) -> BytesIO:
+    """The summary report as an in-memory PDF; workers stream it to storage with ``reports.render_report``."""
     buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    margin = 50
-    y = height - margin
-
-    c.setFont('Helvetica-Bold', 18)
-    c.drawString(margin, y, 'Chemical Equipment Summary Report')
-    y -= 30
-
-    c.setFont('Helvetica', 12)
-    c.drawString(margin, y, f"Dataset: {dataset_name}")
-    y -= 18
-    c.drawString(margin, y, f"Generated: {datetime.utcnow():%Y-%m-%d %H:%M UTC}")
-    y -= 24
-
-    c.setFont('Helvetica-Bold', 14)
-    c.drawString(margin, y, 'Key Metrics')
-    y -= 20
-    c.setFont('Helvetica', 12)
-    metrics = [
-        ('Total Records', summary.get('total_records', 0)),
-        ('Average Flowrate', summary.get('avg_flowrate', 'N/A')),
-        ('Average Pressure', summary.get('avg_pressure', 'N/A')),
-        ('Average Temperature', summary.get('avg_temperature', 'N/A')),
-    ]
-
-    for label, value in metrics:
-        c.drawString(margin + 10, y, f"{label}: {value if value is not None else 'N/A'}")
-        y -= 16
-
-    y -= 6
-    c.setFont('Helvetica-Bold', 14)
-    c.drawString(margin, y, 'Equipment Type Distribution')
-    y -= 20
-    c.setFont('Helvetica', 12)
-    distribution = summary.get('type_distribution', {})
-    if not distribution:
-        c.drawString(margin + 10, y, 'No type information available.')
-        y -= 16
-    else:
-        for equipment_type, count in distribution.items():
-            c.drawString(margin + 10, y, f"{equipment_type}: {count}")
-            y -= 16
-            if y < margin:
-                c.showPage()
-                y = height - margin
-                c.setFont('Helvetica', 12)
-
-    c.save()
+    write_report(buffer, summary, dataset_name)
     buffer.seek(0)
     return buffer
@@ -1,20 +1,192 @@
 from __future__ import annotations
 
-from io import BytesIO
+import os
+import time
+import uuid
+from typing import Optional
 
-from django.core.files.base import ContentFile
-from django.http import FileResponse, Http404
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import content_disposition_header, quote_etag
 from rest_framework import generics, status
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import ParseError
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import Dataset
-from .serializers import DatasetSerializer
-from .utils import compute_summary, generate_pdf, normalize_dataframe
+from . import metrics, parallel, upload_sessions
+from .authentication import issue_token, token_expires_at
+from .downloads import immutable_file_response
+from .exports import EXPORT_FORMATS, ExportUnavailable, check_format_available, export_chunks, export_filename, zip_chunks
+from .ingest import ingest_records
+from .jobs import enqueue_report
+from .retention import enforce_retention
+from .rollups import TREND_BUCKETS, TREND_DEFAULT_LIMIT, TREND_MAX_LIMIT, store_rollups, trend_points
+from .models import Dataset, HistoryVersion, UploadSession
+from .pagination import HistoryPagination
+from .serializers import DatasetSerializer, UploadSessionSerializer, dataset_rows
+from .sketches import DEFAULT_PERCENTILES, HISTOGRAM_BINS, QuantileSketch, describe_distribution, parse_bins, parse_percentiles
+from .uploadhandlers import uploaded_file_sha256
+from .utils import (
+    COLUMNAR_NUMERIC,
+    COMPRESSION_CONTENT_TYPES,
+    CSV_PARSE_ERRORS,
+    STATS_GROUP_COLUMNS,
+    ColumnarDataset,
+    ColumnarWriter,
+    SummaryAccumulator,
+    columnar_dir,
+    compute_grouped_stats,
+    normalize_dataframe,
+    open_columnar,
+    parse_stats_metrics,
+    sniff_compression,
+    strip_compression_suffix,
+    summarize_csv,
+)
 
 
-HISTORY_LIMIT = 5
+class ObtainTokenView(ObtainAuthToken):
+    """
+    POST username/password once to get an expiring token; DELETE revokes it.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+        return Response({'token': token.key, 'expires_at': token_expires_at(token)})
+
+    def delete(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return Response({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _find_duplicate(content_sha256: str) -> Optional[Dataset]:
+    return Dataset.objects.filter(content_sha256=content_sha256).first()
+
+
+def _duplicate_response(existing: Dataset) -> Response:
+    # Byte-identical upload: reuse the stored summary, report and blob.
+    return Response(
+        {
+            'message': 'Identical CSV already uploaded; reusing stored results.',
+            'dataset': DatasetSerializer(existing).data,
+            'duplicate': True,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def process_upload(uploaded_file, content_sha256: str, declared_compression: Optional[str] = None) -> Response:
+    """
+    Summarize, store and ingest one complete CSV.
+
+    Shared by the one-shot multipart upload and finalized upload sessions.
+    gzip/zstd files are parsed through a streaming decompressor and stored
+    compressed; ``declared_compression`` is checked against the magic bytes.
+    Large uncompressed files on disk are summarized by a process pool (see
+    ``equipment.parallel``).
+    """
+    started = time.perf_counter()
+    compression = sniff_compression(uploaded_file)
+    if declared_compression is not None and declared_compression != compression:
+        return Response(
+            {'detail': f'File was declared as {declared_compression} but is not {declared_compression}-compressed.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    with metrics.stage('dedup'):
+        existing = _find_duplicate(content_sha256)
+    if existing is not None:
+        return _duplicate_response(existing)
+
+    dataset = Dataset(
+        original_filename=strip_compression_suffix(uploaded_file.name, compression),
+        content_sha256=content_sha256,
+        data_size=uploaded_file.size,
+    )
+    # Stored first and parsed from storage, so the upload is read once: files
+    # Django spooled to disk (and finished upload sessions) are moved into
+    # place rather than copied.
+    with metrics.stage('store'):
+        dataset.data_file.save(uploaded_file.name, uploaded_file, save=False)
+    # The columnar sidecar is written in the same pass as the summary.
+    columnar = ColumnarWriter(columnar_dir(dataset.id))
+    clock = metrics.clock()
+
+    def write_sidecar(chunk):
+        with clock('sidecar'):
+            columnar.write(chunk)
+
+    try:
+        try:
+            path = parallel.parallel_path(dataset.data_file, compression)
+            if path is not None:
+                summary = parallel.summarize_csv_parallel(path, writer=columnar, clock=clock)
+            else:
+                with dataset.data_file.open('rb') as stored:
+                    summary = summarize_csv(stored, on_chunk=write_sidecar, clock=clock)
+            with clock('sidecar'):
+                columnar.close()
+        except CSV_PARSE_ERRORS as exc:
+            columnar.abort()
+            dataset.data_file.delete(save=False)
+            return Response({'detail': f'Unable to parse CSV: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            clock.finish()
+
+        dataset.total_records = summary['total_records']
+        dataset.avg_flowrate = summary['avg_flowrate']
+        dataset.avg_pressure = summary['avg_pressure']
+        dataset.avg_temperature = summary['avg_temperature']
+        dataset.type_distribution = summary['type_distribution']
+        dataset.distributions = summary['distributions']
+
+        # The PDF is rendered by `manage.py run_report_worker`; the client sees
+        # report_status='pending' until it is ready.
+        try:
+            with metrics.stage('db'), transaction.atomic():
+                dataset.save()
+                stored_columns = ColumnarDataset(columnar.directory)
+                ingest_records(dataset, stored_columns)
+                store_rollups(dataset, stored_columns)
+                enqueue_report(dataset)
+                HistoryVersion.bump([dataset.pk])
+        except IntegrityError:
+            # An identical upload committed first (content_sha256 is unique).
+            existing = _find_duplicate(content_sha256)
+            if existing is None:
+                raise
+            columnar.abort()
+            dataset.data_file.delete(save=False)
+            return _duplicate_response(existing)
+    except BaseException:
+        # Infrastructure failures still surface as 500s, without leaving files behind.
+        columnar.abort()
+        if dataset.data_file:
+            dataset.data_file.delete(save=False)
+        raise
+
+    with metrics.stage('retention'):
+        # The dataset in this response stays, even alone over the byte budget.
+        enforce_retention(keep=[dataset.pk])
+    metrics.observe_upload(dataset.data_size, dataset.total_records, time.perf_counter() - started)
+
+    serializer = DatasetSerializer(dataset)
+    return Response(
+        {'message': 'CSV processed successfully.', 'dataset': serializer.data, 'duplicate': False},
+        status=status.HTTP_201_CREATED,
+    )
 
 
 class UploadDatasetView(APIView):
@@ -25,56 +197,465 @@ class UploadDatasetView(APIView):
         if uploaded_file is None:
             return Response({'detail': 'CSV file is required under the "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        declared_compression = COMPRESSION_CONTENT_TYPES.get(uploaded_file.content_type)
+        with metrics.stage('hash'):
+            content_sha256 = uploaded_file_sha256(uploaded_file)
+        return process_upload(uploaded_file, content_sha256, declared_compression)
+
+
+def _get_upload_session(request, session_id, lock: bool = False) -> UploadSession:
+    sessions = UploadSession.objects.select_for_update() if lock else UploadSession.objects
+    try:
+        return sessions.get(pk=session_id, user=request.user)
+    except UploadSession.DoesNotExist as exc:
+        raise Http404('Upload session not found') from exc
+
+
+def _offset_conflict(session: UploadSession, detail: str) -> Response:
+    # The client resumes from `received_bytes`.
+    return Response(
+        {'detail': detail, 'session': UploadSessionSerializer(session).data},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _chunk_conflict(session: UploadSession, offset: int) -> Optional[Response]:
+    if session.status == UploadSession.FINALIZED:
+        return _offset_conflict(session, 'Upload session is already finalized.')
+    if session.status != UploadSession.OPEN:
+        return _offset_conflict(session, 'Upload session is being finalized.')
+    if offset != session.received_bytes:
+        return _offset_conflict(session, f'Expected offset {session.received_bytes}.')
+    return None
+
+
+class UploadSessionCreateView(APIView):
+    """
+    Start a resumable upload: POST ``{"filename": ..., "size": ...}``, then PUT
+    the bytes to ``uploads/<id>/?offset=N`` and POST ``uploads/<id>/finalize/``.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(APIView):
+    # The chunk body is read raw from the request stream, never parsed.
+    parser_classes = []
+
+    def get(self, request, session_id, *args, **kwargs):
+        session = _get_upload_session(request, session_id)
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, session_id, *args, **kwargs):
         try:
-            file_bytes = uploaded_file.read()
-            dataframe = normalize_dataframe(BytesIO(file_bytes))
-        except Exception as exc:  # pragma: no cover - defensive
-            return Response({'detail': f'Unable to parse CSV: {exc}'}, status=status.HTTP_400_BAD_REQUEST)
+            offset = int(request.query_params.get('offset', ''))
+        except ValueError:
+            return Response({'detail': 'offset must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_bytes = settings.UPLOAD_SESSION_MAX_CHUNK_BYTES
+        declared = request.META.get('CONTENT_LENGTH')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            return Response(
+                {'detail': f'Chunks are limited to {max_bytes} bytes.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
 
-        summary = compute_summary(dataframe)
+        # Checked without a lock first so a doomed body is not read at all.
+        session = _get_upload_session(request, session_id)
+        conflict = _chunk_conflict(session, offset)
+        if conflict is not None:
+            return conflict
+        # The body is read before the row lock, so a slow client holds neither.
+        try:
+            with metrics.stage('read'):
+                spooled = upload_sessions.spool_chunk(request._request, max_bytes)
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
 
-        dataset = Dataset(
-            original_filename=uploaded_file.name,
-            total_records=summary['total_records'],
-            avg_flowrate=summary['avg_flowrate'],
-            avg_pressure=summary['avg_pressure'],
-            avg_temperature=summary['avg_temperature'],
-            type_distribution=summary['type_distribution'],
-        )
-        dataset.data_file.save(uploaded_file.name, ContentFile(file_bytes), save=False)
+        with spooled, transaction.atomic():
+            # Serializes concurrent PUTs to one session where the database can.
+            session = _get_upload_session(request, session_id, lock=True)
+            conflict = _chunk_conflict(session, offset)
+            if conflict is not None:
+                return conflict
+            size = os.fstat(spooled.fileno()).st_size
+            if session.expected_size is not None and offset + size > session.expected_size:
+                return Response(
+                    {'detail': f'Upload exceeds the declared size of {session.expected_size} bytes.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            with metrics.stage('write'):
+                session.received_bytes = upload_sessions.write_chunk(session, offset, spooled)
+            session.save(update_fields=['received_bytes', 'updated_at'])
+        return Response(UploadSessionSerializer(session).data)
 
-        pdf_buffer = generate_pdf(summary, uploaded_file.name)
-        dataset.summary_pdf.save(f"{dataset.id}_summary.pdf", ContentFile(pdf_buffer.read()), save=False)
-        dataset.save()
+    def delete(self, request, session_id, *args, **kwargs):
+        with transaction.atomic():
+            session = _get_upload_session(request, session_id, lock=True)
+            if session.status == UploadSession.FINALIZING:
+                return _offset_conflict(session, 'Upload session is being finalized.')
+            upload_sessions.discard(session)
+            session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        self._trim_history()
 
-        serializer = DatasetSerializer(dataset)
-        return Response({'message': 'CSV processed successfully.', 'dataset': serializer.data}, status=status.HTTP_201_CREATED)
+class UploadSessionFinalizeView(APIView):
+    def post(self, request, session_id, *args, **kwargs):
+        # Claimed under the row lock: of several concurrent finalizes, one
+        # processes the file and the rest see FINALIZING or FINALIZED.
+        with transaction.atomic():
+            session = _get_upload_session(request, session_id, lock=True)
+            if session.status == UploadSession.FINALIZED:
+                # A retried finalize after a lost response.
+                if session.dataset is None:
+                    raise Http404('Dataset for this upload no longer exists')
+                return Response(
+                    {
+                        'message': 'Upload session already finalized.',
+                        'dataset': DatasetSerializer(session.dataset).data,
+                        'duplicate': True,
+                    },
+                    status=status.HTTP_200_OK,
+                )
+            if session.status == UploadSession.FINALIZING:
+                return _offset_conflict(session, 'Upload session is being finalized.')
+            if session.expected_size is not None and session.received_bytes != session.expected_size:
+                return _offset_conflict(
+                    session, f'Received {session.received_bytes} of {session.expected_size} bytes.'
+                )
+            if not upload_sessions.partial_path(session).exists():
+                return _offset_conflict(session, 'No data has been uploaded.')
+            session.status = UploadSession.FINALIZING
+            session.save(update_fields=['status', 'updated_at'])
 
-    @staticmethod
-    def _trim_history():
-        datasets = Dataset.objects.order_by('-uploaded_at')
-        if datasets.count() <= HISTORY_LIMIT:
-            return
-        for extra in datasets[HISTORY_LIMIT:]:
-            extra.delete()
+        response = None
+        try:
+            with metrics.stage('hash'):
+                session_file, content_sha256 = upload_sessions.finished_file(session)
+            try:
+                response = process_upload(session_file, content_sha256)
+            finally:
+                session_file.close()
+        finally:
+            if response is None or response.status_code >= 400:
+                # Reopened for another attempt; a rejected file was removed
+                # with its upload, so the client starts again from zero.
+                if not upload_sessions.partial_path(session).exists():
+                    upload_sessions.discard(session)
+                    session.received_bytes = 0
+                session.status = UploadSession.OPEN
+                session.save(update_fields=['status', 'received_bytes', 'updated_at'])
+        if response.status_code >= 400:
+            return response
+
+        upload_sessions.discard(session)
+        session.status = UploadSession.FINALIZED
+        session.dataset_id = response.data['dataset']['id']
+        session.save(update_fields=['status', 'dataset', 'updated_at'])
+        return response
 
 
 class DatasetHistoryView(generics.ListAPIView):
+    """
+    Newest datasets first, a page at a time (see ``HistoryPagination``).
+
+    ``?fields=id,original_filename,...`` returns only those fields and selects
+    only their columns, so list views can skip the JSON columns.
+    """
+
     serializer_class = DatasetSerializer
+    pagination_class = HistoryPagination
+
+    def requested_fields(self) -> Optional[list]:
+        """The ``?fields=`` list, parsed once per request."""
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self._parse_fields(self.request.query_params.get('fields'))
+        return self._requested_fields
+
+    @staticmethod
+    def _parse_fields(raw: Optional[str]) -> Optional[list]:
+        if raw is None:
+            return None
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = sorted(set(fields) - set(DatasetSerializer.Meta.fields))
+        if not fields or unknown:
+            raise ParseError(f"fields must be a comma separated subset of: {', '.join(DatasetSerializer.Meta.fields)}.")
+        return list(dict.fromkeys(fields))
 
     def get_queryset(self):
-        return Dataset.objects.order_by('-uploaded_at')[:HISTORY_LIMIT]
+        fields = self.requested_fields() or DatasetSerializer.Meta.fields
+        # The cursor needs id and uploaded_at, incremental sync change_seq.
+        return Dataset.objects.values(*dict.fromkeys([*fields, 'id', 'uploaded_at', 'change_seq']))
+
+    def list(self, request, *args, **kwargs):
+        raw_since = request.query_params.get('since_version')
+        if raw_since is not None and not raw_since.isdigit():
+            return Response({'detail': 'since_version must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        fields = self.requested_fields()
+        if raw_since is None:
+            # values() rows through dataset_rows: the same JSON as DatasetSerializer
+            # without building a model instance and serializer fields per row.
+            page = self.paginate_queryset(self.get_queryset())
+            return self.get_paginated_response(dataset_rows(page, fields, request))
+
+        # Incremental sync: the rows of this page changed after the client's
+        # version, plus the page's ids so it can drop expired entries. The
+        # version (read by get() for the ETag) comes first, so anything
+        # committed later is sent again.
+        version = self.history_version
+        page = self.paginate_queryset(self.get_queryset())
+        since = int(raw_since)
+        # since_version=0 is a full sync, including rows never stamped with a version.
+        changed = [row for row in page if row['change_seq'] > since] if since else page
+        return self.get_paginated_response({
+            'version': version,
+            'datasets': dataset_rows(changed, fields, request),
+            'live_ids': [str(row['id']) for row in page],
+        })
+
+    def get(self, request, *args, **kwargs):
+        # Runs after DRF authentication, so a 304 is never sent to anonymous clients.
+        # Last-Modified is not sent: timestamps are taken before commit, so
+        # they can go backwards, where the version cannot.
+        with metrics.stage('validators'):
+            self.history_version = HistoryVersion.current()
+        etag = quote_etag(f'v{self.history_version}')
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        else:
+            with metrics.stage('query'):
+                response = super().get(request, *args, **kwargs)
+        response.headers['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def _get_dataset(dataset_id) -> Dataset:
+    try:
+        return Dataset.objects.get(pk=dataset_id)
+    except Dataset.DoesNotExist as exc:  # pragma: no cover - defensive
+        raise Http404('Dataset not found') from exc
 
 
 class DatasetReportView(APIView):
     def get(self, request, dataset_id: str, *args, **kwargs):
-        try:
-            dataset = Dataset.objects.get(pk=dataset_id)
-        except Dataset.DoesNotExist as exc:  # pragma: no cover - defensive
-            raise Http404('Dataset not found') from exc
+        dataset = _get_dataset(dataset_id)
 
         if not dataset.summary_pdf:
             raise Http404('Report not available yet')
-        return FileResponse(dataset.summary_pdf.open('rb'), as_attachment=True, filename=f"{dataset.original_filename}_summary.pdf")
+        return immutable_file_response(request, dataset.summary_pdf, f"{dataset.original_filename}_summary.pdf")
+
+
+def _export_format_error(export_format: str) -> Optional[Response]:
+    if export_format not in EXPORT_FORMATS:
+        return Response(
+            {'detail': f"Unknown export format; choose one of: {', '.join(EXPORT_FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        check_format_available(export_format)
+    except ExportUnavailable as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return None
+
+
+def _attachment(chunks, content_type: str, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response.headers['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+class DatasetExportView(APIView):
+    """Streams a dataset's normalized rows as ``csv``, ``jsonl`` or ``parquet``."""
+
+    def get(self, request, dataset_id: str, export_format: str, *args, **kwargs):
+        error = _export_format_error(export_format)
+        if error is not None:
+            return error
+        dataset = _get_dataset(dataset_id)
+        return _attachment(
+            export_chunks(dataset, export_format),
+            EXPORT_FORMATS[export_format].content_type,
+            export_filename(dataset, export_format),
+        )
+
+
+class DatasetBulkExportView(APIView):
+    """
+    Streams a ZIP of several datasets (``?ids=<uuid>,<uuid>``; default all),
+    each exported in ``export_format`` next to its PDF report.
+    ``?reports=false`` leaves the reports out.
+    """
+
+    def get(self, request, export_format: str, *args, **kwargs):
+        error = _export_format_error(export_format)
+        if error is not None:
+            return error
+        datasets = Dataset.objects.only('id', 'original_filename', 'uploaded_at', 'data_file', 'summary_pdf')
+        raw_ids = request.query_params.get('ids')
+        if raw_ids is not None:
+            try:
+                ids = [uuid.UUID(item.strip()) for item in raw_ids.split(',') if item.strip()]
+            except ValueError:
+                return Response({'detail': 'ids must be a comma separated list of dataset ids.'}, status=status.HTTP_400_BAD_REQUEST)
+            datasets = datasets.filter(pk__in=ids)
+        datasets = list(datasets.order_by('-uploaded_at'))
+        if not datasets:
+            raise Http404('No datasets to export')
+        include_reports = request.query_params.get('reports', 'true').lower() not in ('0', 'false', 'no')
+        return _attachment(
+            zip_chunks(datasets, export_format, include_reports),
+            'application/zip',
+            f'datasets-{timezone.now():%Y%m%d-%H%M%S}.zip',
+        )
+
+
+class DatasetStatsView(APIView):
+    """
+    Grouped statistics, e.g. ``?group_by=Type&metrics=mean,p95,max&columns=Flowrate``.
+
+    Datasets never change after upload, so results are cached per (dataset, query).
+    """
+
+    DEFAULT_METRICS = 'count,mean,min,max'
+
+    def get(self, request, dataset_id: str, *args, **kwargs):
+        group_by = request.query_params.get('group_by') or None
+        if group_by is not None and group_by not in STATS_GROUP_COLUMNS:
+            return Response(
+                {'detail': f'group_by must be one of: {", ".join(STATS_GROUP_COLUMNS)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            stat_metrics = parse_stats_metrics(request.query_params.get('metrics', self.DEFAULT_METRICS))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        requested = request.query_params.get('columns')
+        columns = [column.strip().title() for column in requested.split(',')] if requested else list(COLUMNAR_NUMERIC)
+        unknown = [column for column in columns if column not in COLUMNAR_NUMERIC]
+        if unknown:
+            return Response({'detail': f'Unknown column(s): {", ".join(unknown)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dataset = _get_dataset(dataset_id)
+        cache_key = f"dataset-stats:{dataset.pk}:{group_by}:{','.join(stat_metrics)}:{','.join(columns)}"
+        with metrics.stage('cache'):
+            payload = cache.get(cache_key)
+        if payload is None:
+            with metrics.stage('load'):
+                frame = self._load_frame(dataset, columns, group_by)
+            present = [column for column in columns if column in frame.columns]
+            if group_by is not None and group_by not in frame.columns:
+                groups = {}
+            else:
+                with metrics.stage('compute'):
+                    groups = compute_grouped_stats(frame, present, stat_metrics, group_by)
+            payload = {
+                'dataset': str(dataset.pk),
+                'group_by': group_by,
+                'metrics': stat_metrics,
+                'columns': present,
+                'groups': groups,
+            }
+            cache.set(cache_key, payload, timeout=None)
+        return Response(payload)
+
+    @staticmethod
+    def _load_frame(dataset: Dataset, columns, group_by):
+        wanted = list(columns) + ([group_by] if group_by else [])
+        columnar = open_columnar(dataset.pk)
+        if columnar is not None:
+            return columnar.to_frame([column for column in wanted if column in columnar.columns])
+        # Datasets uploaded before sidecars existed fall back to the CSV.
+        with dataset.data_file.open('rb') as handle:
+            frame = normalize_dataframe(handle)
+        return frame[[column for column in wanted if column in frame.columns]]
+
+
+class DatasetDistributionView(APIView):
+    """
+    Percentiles and histograms per numeric column, e.g.
+    ``?columns=Flowrate&percentiles=50,90,99.9&bins=40``.
+
+    Answered from the sketches stored at upload, so the cost does not depend
+    on the dataset's size. Datasets uploaded before sketches existed get them
+    built once from the sidecar (or CSV) on first request.
+    """
+
+    def get(self, request, dataset_id: str, *args, **kwargs):
+        try:
+            percentiles = parse_percentiles(
+                request.query_params.get('percentiles', ','.join(f'{value:g}' for value in DEFAULT_PERCENTILES))
+            )
+            bins = parse_bins(request.query_params.get('bins', str(HISTOGRAM_BINS)))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        requested = request.query_params.get('columns')
+        columns = [column.strip().title() for column in requested.split(',')] if requested else list(COLUMNAR_NUMERIC)
+        unknown = [column for column in columns if column not in COLUMNAR_NUMERIC]
+        if unknown:
+            return Response({'detail': f'Unknown column(s): {", ".join(unknown)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dataset = _get_dataset(dataset_id)
+        distributions = dataset.distributions
+        if not distributions and dataset.total_records:
+            with metrics.stage('load'):
+                frame = DatasetStatsView._load_frame(dataset, COLUMNAR_NUMERIC, None)
+            distributions = SummaryAccumulator().update(frame).result()['distributions']
+            # update() leaves updated_at alone: nothing clients sync has changed.
+            Dataset.objects.filter(pk=dataset.pk).update(distributions=distributions)
+
+        described = {}
+        with metrics.stage('compute'):
+            for column in columns:
+                stored = distributions.get(column)
+                if stored is None:
+                    continue
+                described[column] = describe_distribution(QuantileSketch.from_dict(stored['sketch']), percentiles, bins)
+                if bins == HISTOGRAM_BINS:
+                    described[column]['histogram'] = stored['histogram']
+        return Response({'dataset': str(dataset.pk), 'columns': described})
+
+
+class DatasetTrendsView(APIView):
+    """
+    Averages and type mix across datasets over time, e.g.
+    ``?bucket=week&type=Pump&since=2024-01-01T00:00:00Z&limit=52``.
+
+    Served from the rollup rows written at upload; no CSV is read.
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        bucket = params.get('bucket', 'dataset')
+        if bucket not in TREND_BUCKETS:
+            return Response(
+                {'detail': f'bucket must be one of: {", ".join(TREND_BUCKETS)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        raw_limit = params.get('limit', str(TREND_DEFAULT_LIMIT))
+        if not raw_limit.isdigit() or not 1 <= int(raw_limit) <= TREND_MAX_LIMIT:
+            return Response(
+                {'detail': f'limit must be an integer from 1 to {TREND_MAX_LIMIT}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        bounds = {}
+        for name in ('since', 'until'):
+            raw = params.get(name)
+            if raw is None:
+                continue
+            try:
+                value = parse_datetime(raw)
+            except ValueError:
+                value = None
+            if value is None:
+                return Response({'detail': f'{name} must be an ISO 8601 timestamp.'}, status=status.HTTP_400_BAD_REQUEST)
+            bounds[name] = timezone.make_aware(value) if timezone.is_naive(value) else value
+        equipment_type = params.get('type') or None
+
+        with metrics.stage('query'):
+            points = trend_points(bucket, equipment_type, limit=int(raw_limit), **bounds)
+        return Response({'bucket': bucket, 'type': equipment_type, 'points': points})
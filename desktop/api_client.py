@@ -0,0 +1,370 @@
+"""
+HTTP layer for the desktop client.
+
+``ApiClient`` owns one keep-alive ``requests.Session`` plus the API token and is
+safe to call from worker threads. It has no Qt dependency; ``main.py`` runs its
+methods on a QThreadPool and marshals results back through signals.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+try:
+    import zstandard
+except ImportError:  # gzip from the standard library is used instead
+    zstandard = None
+
+from local_cache import LocalCache
+
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 120
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# The server's largest history page, so a sync takes as few requests as possible.
+SYNC_PAGE_SIZE = 100
+# Files at least this large go through a resumable upload session.
+RESUMABLE_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+SESSION_CHUNK_BYTES = 4 * 1024 * 1024
+SESSION_CHUNK_RETRIES = 3
+# Leading bytes of files that are already compressed and are sent as-is.
+COMPRESSED_MAGIC = (b'\x1f\x8b', b'\x28\xb5\x2f\xfd')
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class UploadCancelled(Exception):
+    """Raised from inside an upload when the user cancels it."""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class MultipartFileBody:
+    """
+    A ``multipart/form-data`` body with one file field, read lazily from disk.
+
+    It exposes ``__len__`` so requests sends a Content-Length (no chunked
+    encoding), reports progress as it is read, and aborts the transfer once
+    its CancelToken is cancelled.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        field: str = 'file',
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        filename: Optional[str] = None,
+        content_type: str = 'application/octet-stream',
+    ):
+        self.boundary = uuid.uuid4().hex
+        filename = (filename or os.path.basename(path)).replace('"', '')
+        self._preamble = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self._epilogue = f'\r\n--{self.boundary}--\r\n'.encode()
+        self._file_size = os.path.getsize(path)
+        self._handle = open(path, 'rb')
+        self._progress = progress
+        self._cancel = cancel
+        self._position = 0
+        self._total = len(self._preamble) + self._file_size + len(self._epilogue)
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self) -> int:
+        return self._total
+
+    def read(self, size: int = -1) -> bytes:
+        if self._cancel is not None and self._cancel.cancelled:
+            raise UploadCancelled('Upload cancelled')
+        if size is None or size < 0:
+            size = self._total - self._position
+        size = min(size, UPLOAD_CHUNK_BYTES)
+        out = b''
+        preamble_end = len(self._preamble)
+        file_end = preamble_end + self._file_size
+        while len(out) < size and self._position < self._total:
+            wanted = size - len(out)
+            if self._position < preamble_end:
+                piece = self._preamble[self._position:self._position + wanted]
+            elif self._position < file_end:
+                piece = self._handle.read(wanted)
+                if not piece:
+                    raise IOError('File shrank while uploading')
+            else:
+                offset = self._position - file_end
+                piece = self._epilogue[offset:offset + wanted]
+            out += piece
+            self._position += len(piece)
+        if self._progress is not None:
+            self._progress(self._position, self._total)
+        return out
+
+    def close(self):
+        self._handle.close()
+
+
+def compress_for_upload(path: str) -> Tuple[str, str, str]:
+    """
+    Compress ``path`` to a temporary file for sending.
+
+    Uses zstd when the zstandard package is installed, gzip otherwise. Returns
+    (path to send, filename, content type); files that are already gzip or
+    zstd are sent unchanged. The caller removes the temporary file.
+    """
+    filename = os.path.basename(path)
+    with open(path, 'rb') as source:
+        if source.read(4).startswith(COMPRESSED_MAGIC):
+            return path, filename, 'application/octet-stream'
+        source.seek(0)
+        handle = tempfile.NamedTemporaryFile(prefix='upload-', delete=False)
+        try:
+            with handle:
+                if zstandard is not None:
+                    zstandard.ZstdCompressor(level=3).copy_stream(source, handle)
+                    return handle.name, f'{filename}.zst', 'application/zstd'
+                # Fixed mtime and no embedded name keep the output reproducible.
+                with gzip.GzipFile(filename='', mode='wb', fileobj=handle, compresslevel=6, mtime=0) as compressor:
+                    shutil.copyfileobj(source, compressor, UPLOAD_CHUNK_BYTES)
+                return handle.name, f'{filename}.gz', 'application/gzip'
+        except BaseException:
+            os.unlink(handle.name)
+            raise
+
+
+class ApiClient:
+    def __init__(self):
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.base_url = ''
+        self.username = ''
+        self.password = ''
+        # API token from /auth/token/, keyed by (API base, username) it was issued for.
+        self.token: Optional[str] = None
+        self.token_identity: Optional[Tuple[str, str]] = None
+        self.token_expires_at: Optional[datetime] = None
+
+    def configure(self, base_url: str, username: str, password: str):
+        """Called on the GUI thread with the current connection fields."""
+        with self._lock:
+            self.base_url = base_url.rstrip('/')
+            self.username = username
+            self.password = password
+
+    def url(self, path: str) -> str:
+        # Absolute URLs come from the server's pagination links.
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path}"
+
+    def _auth_headers(self) -> Dict[str, str]:
+        """Log in once per (API, user) and reuse the token until it expires."""
+        with self._lock:
+            if not self.username or not self.password:
+                raise ValueError('Username and password are required')
+            identity = (self.base_url, self.username)
+            expired = self.token_expires_at is not None and self.token_expires_at <= datetime.now(timezone.utc)
+            if self.token is None or self.token_identity != identity or expired:
+                response = self.session.post(
+                    self.url('auth/token/'),
+                    data={'username': self.username, 'password': self.password},
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                )
+                response.raise_for_status()
+                payload = response.json()
+                self.token = payload['token']
+                self.token_identity = identity
+                expires_at = payload.get('expires_at')
+                self.token_expires_at = (
+                    datetime.fromisoformat(expires_at.replace('Z', '+00:00')) if expires_at else None
+                )
+            return {'Authorization': f'Token {self.token}'}
+
+    def request(self, method: str, path: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+        response = self.session.request(method, self.url(path), headers={**(headers or {}), **self._auth_headers()}, **kwargs)
+        if response.status_code == 401:
+            # Revoked or expired server-side: log in again next time, and
+            # retry now when the request body can be replayed.
+            with self._lock:
+                self.token = None
+            if method == 'GET':
+                response = self.session.request(
+                    method, self.url(path), headers={**(headers or {}), **self._auth_headers()}, **kwargs
+                )
+        return response
+
+    def sync_history(self, cache: LocalCache) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Pull history rows changed since the cache's version into ``cache``.
+
+        Every page is fetched, since ``live_ids`` from all of them decide which
+        cached rows still exist. The version and ETag of the first page are
+        stored: changes committed while paging are pulled again next time.
+
+        Returns (all cached datasets, whether anything changed).
+        """
+        version = cache.version
+        headers = {'If-None-Match': cache.etag} if version is not None and cache.etag else {}
+        params = {'since_version': version or 0, 'page_size': SYNC_PAGE_SIZE}
+        response = self.request('GET', 'history/', headers=headers, params=params)
+        if response.status_code == 304:
+            return cache.datasets(), False
+        etag = response.headers.get('ETag')
+        changed: List[Dict[str, Any]] = []
+        live_ids: List[str] = []
+        synced_version = None
+        while True:
+            response.raise_for_status()
+            payload = response.json()
+            if synced_version is None:
+                synced_version = payload['version']
+            changed.extend(payload['datasets'])
+            live_ids.extend(payload['live_ids'])
+            next_url = response.links.get('next', {}).get('url')
+            if next_url is None:
+                break
+            response = self.request('GET', next_url)
+        cache.apply_sync(changed, live_ids, synced_version, etag)
+        return cache.datasets(), True
+
+    def download_report(self, dataset_id: str, cache: LocalCache) -> Path:
+        cached = cache.cached_report(dataset_id)
+        if cached is not None:
+            return cached
+        response = self.request('GET', f'datasets/{dataset_id}/report/', stream=True)
+        with response:
+            response.raise_for_status()
+            return cache.store_report(dataset_id, response.iter_content(chunk_size=64 * 1024))
+
+    def upload(
+        self,
+        path: str,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        cache: Optional[LocalCache] = None,
+    ) -> Dict[str, Any]:
+        send_path, filename, content_type = compress_for_upload(path)
+        try:
+            if cache is not None and os.path.getsize(send_path) >= RESUMABLE_UPLOAD_THRESHOLD:
+                return self._upload_resumable(send_path, filename, path, cache, progress, cancel)
+            body = MultipartFileBody(
+                send_path, progress=progress, cancel=cancel, filename=filename, content_type=content_type
+            )
+            try:
+                response = self.request('POST', 'upload/', data=body, headers={'Content-Type': body.content_type})
+            except requests.exceptions.RequestException:
+                if cancel is not None and cancel.cancelled:
+                    raise UploadCancelled('Upload cancelled')
+                raise
+            finally:
+                body.close()
+            response.raise_for_status()
+            return response.json()
+        finally:
+            if send_path != path:
+                os.unlink(send_path)
+
+    def _upload_resumable(
+        self,
+        path: str,
+        filename: str,
+        source_path: str,
+        cache: LocalCache,
+        progress: Optional[ProgressCallback],
+        cancel: Optional[CancelToken],
+    ) -> Dict[str, Any]:
+        """
+        Send ``path`` through /uploads/ in SESSION_CHUNK_BYTES pieces.
+
+        The session id is remembered in the cache against the source file's
+        path, size and mtime, so a cancelled or interrupted upload of the same
+        file picks up from the server's offset instead of starting over.
+        Compression is deterministic, so the recompressed bytes line up.
+        """
+        source = os.stat(source_path)
+        stat = os.stat(path)
+        fingerprint = f'{os.path.abspath(source_path)}:{source.st_size}:{source.st_mtime_ns}:{stat.st_size}'
+        meta_key = 'upload-session:' + hashlib.sha256(fingerprint.encode()).hexdigest()
+        session_id, offset = self._resume_session(cache.get_meta(meta_key))
+        if session_id is None:
+            response = self.request(
+                'POST', 'uploads/', json={'filename': filename, 'size': stat.st_size}
+            )
+            response.raise_for_status()
+            session_id, offset = response.json()['id'], 0
+            cache.set_meta(meta_key, session_id)
+
+        failures = 0
+        with open(path, 'rb') as handle:
+            while offset < stat.st_size:
+                if cancel is not None and cancel.cancelled:
+                    raise UploadCancelled('Upload cancelled')
+                handle.seek(offset)
+                chunk = handle.read(SESSION_CHUNK_BYTES)
+                try:
+                    response = self.request(
+                        'PUT', f'uploads/{session_id}/', params={'offset': offset}, data=chunk,
+                        headers={'Content-Type': 'application/octet-stream'},
+                    )
+                    if response.status_code not in (401, 409):
+                        response.raise_for_status()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    response = None
+                if response is None or response.status_code in (401, 409):
+                    # Lost connection, token expiry or an offset disagreement:
+                    # ask the server where it is and carry on from there.
+                    failures += 1
+                    if failures > SESSION_CHUNK_RETRIES:
+                        raise IOError('Upload keeps failing; try again later to resume it.')
+                    _, offset = self._resume_session(session_id)
+                    if offset is None:
+                        cache.set_meta(meta_key, None)
+                        raise IOError('Upload session expired on the server; please upload again.')
+                    continue
+                failures = 0
+                offset = response.json()['received_bytes']
+                if progress is not None:
+                    progress(offset, stat.st_size)
+
+        response = self.request('POST', f'uploads/{session_id}/finalize/')
+        response.raise_for_status()
+        cache.set_meta(meta_key, None)
+        return response.json()
+
+    def _resume_session(self, session_id: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+        """Return (session id, server offset), or (None, None) if it cannot be resumed."""
+        if not session_id:
+            return None, None
+        response = self.request('GET', f'uploads/{session_id}/')
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+        payload = response.json()
+        if payload['status'] != 'open':
+            return None, None
+        return session_id, payload['received_bytes']
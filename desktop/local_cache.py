@@ -0,0 +1,126 @@
+"""
+On-disk cache of dataset metadata and report PDFs for the desktop client.
+
+One directory per API base URL holds ``cache.sqlite3`` (dataset rows as JSON,
+plus the synced history version and ETag) and ``reports/<dataset id>.pdf``. Reports never
+change once generated, so a cached PDF is valid until its dataset disappears
+from history.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_ROOT = Path(os.environ.get('CHEMICAL_EQUIPMENT_CACHE', Path.home() / '.chemical_equipment_cache'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id TEXT PRIMARY KEY,
+    uploaded_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class LocalCache:
+    def __init__(self, api_base: str, root: Path = DEFAULT_CACHE_ROOT):
+        key = hashlib.sha256(api_base.rstrip('/').encode()).hexdigest()[:16]
+        self.directory = Path(root) / key
+        self.reports_dir = self.directory / 'reports'
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / 'cache.sqlite3'
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the cache usable from both
+        # the GUI thread and pool threads.
+        with self._lock:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                with connection:
+                    yield connection
+            finally:
+                connection.close()
+
+    # Metadata
+    def datasets(self) -> List[Dict[str, Any]]:
+        with self._connect() as connection:
+            rows = connection.execute('SELECT payload FROM datasets ORDER BY uploaded_at DESC').fetchall()
+        return [json.loads(payload) for (payload,) in rows]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: Optional[str]) -> None:
+        with self._connect() as connection:
+            if value is None:
+                connection.execute('DELETE FROM meta WHERE key = ?', (key,))
+            else:
+                connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    @property
+    def version(self) -> Optional[int]:
+        """History version of the last complete sync; sent as ``since_version`` on the next."""
+        value = self.get_meta('version')
+        return int(value) if value is not None else None
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.get_meta('etag')
+
+    def apply_sync(
+        self, changed: Iterable[Dict[str, Any]], live_ids: Iterable[str], version: int, etag: Optional[str]
+    ) -> None:
+        """Store one complete sync: ``live_ids`` must cover every page of the history."""
+        changed = list(changed)
+        live_ids = set(live_ids)
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO datasets (id, uploaded_at, updated_at, payload) VALUES (?, ?, ?, ?)',
+                [(row['id'], row['uploaded_at'], row['updated_at'], json.dumps(row)) for row in changed],
+            )
+            stale = [
+                dataset_id
+                for (dataset_id,) in connection.execute('SELECT id FROM datasets').fetchall()
+                if dataset_id not in live_ids
+            ]
+            connection.executemany('DELETE FROM datasets WHERE id = ?', [(dataset_id,) for dataset_id in stale])
+            connection.executemany(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                [('version', str(version)), ('etag', etag)],
+            )
+        for dataset_id in stale:
+            self.report_path(dataset_id).unlink(missing_ok=True)
+
+    # Reports
+    def report_path(self, dataset_id: str) -> Path:
+        return self.reports_dir / f'{dataset_id}.pdf'
+
+    def cached_report(self, dataset_id: str) -> Optional[Path]:
+        path = self.report_path(dataset_id)
+        return path if path.exists() else None
+
+    def store_report(self, dataset_id: str, chunks: Iterable[bytes]) -> Path:
+        path = self.report_path(dataset_id)
+        partial = path.with_suffix('.part')
+        with open(partial, 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+        os.replace(partial, path)
+        return path
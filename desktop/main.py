@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import os
 import sys
-from typing import List, Dict, Any
+from typing import Any, Callable, Dict, List
 
-import requests
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from PyQt5 import QtCore, QtWidgets, QtGui
 
+from api_client import ApiClient, CancelToken, UploadCancelled
+from local_cache import LocalCache
+
 ASSETS_SAMPLE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'assets', 'sample_equipment_data.csv'))
 DEFAULT_API_BASE = 'http://127.0.0.1:8000/api'
 
@@ -32,6 +34,43 @@ class PieChartCanvas(FigureCanvas):
         self.draw_idle()
 
 
+class TaskSignals(QtCore.QObject):
+    succeeded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(object)
+    progress = QtCore.pyqtSignal(int, int)
+
+
+class ApiTask(QtCore.QRunnable):
+    """
+    Runs one ApiClient call on the thread pool; results come back through
+    ``signals``, which live on the GUI thread, so slots run there.
+    """
+
+    def __init__(self, func: Callable[..., Any], *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancel_token = CancelToken()
+        self._last_percent = -1
+
+    def report_progress(self, done: int, total: int):
+        # Called for every socket write; only forward whole-percent changes.
+        percent = int(done * 100 / total) if total else 100
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as exc:  # pragma: no cover - surfaced to the UI
+            self.signals.failed.emit(exc)
+        else:
+            self.signals.succeeded.emit(result)
+
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
@@ -39,6 +78,16 @@ class MainWindow(QtWidgets.QMainWindow):
         self.resize(1100, 720)
         self.datasets: List[Dict[str, Any]] = []
         self.selected_file_path: str | None = None
+        self.api = ApiClient()
+        self.cache: LocalCache | None = None
+        self.cache_base: str | None = None
+        self.thread_pool = QtCore.QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(4)
+        # Keeps running tasks (and their signal objects) alive until they finish.
+        self.tasks: set[ApiTask] = set()
+        self.history_task: ApiTask | None = None
+        self.upload_task: ApiTask | None = None
+        self.upload_progress: QtWidgets.QProgressDialog | None = None
 
         central = QtWidgets.QWidget()
         self.setCentralWidget(central)
@@ -55,6 +104,7 @@ class MainWindow(QtWidgets.QMainWindow):
         content_split.addWidget(self._build_chart_panel())
 
         self.statusBar().showMessage('Enter credentials and click "Refresh" to load history.')
+        self._show_cached_history()
 
     def _build_connection_row(self):
         row = QtWidgets.QHBoxLayout()
@@ -151,45 +201,69 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self.selected_file_path:
             self._show_message('Choose a CSV file first.')
             return
+        if self.upload_task is not None:
+            self._show_message('An upload is already in progress.')
+            return
         try:
-            with open(self.selected_file_path, 'rb') as file_handle:
-                files = {'file': file_handle}
-                response = requests.post(
-                    self._url('upload/'),
-                    files=files,
-                    auth=self._auth(),
-                    timeout=30,
-                )
-            response.raise_for_status()
-            self._show_message('Upload successful. History updated.', success=True)
-            self.fetch_history()
-        except Exception as exc:  # pragma: no cover - user feedback
-            self._show_message(f'Upload failed: {exc}')
+            self._configure_api()
+        except ValueError as exc:
+            self._show_message(str(exc))
+            return
+
+        task = ApiTask(self.api.upload, self.selected_file_path)
+        task.kwargs.update(progress=task.report_progress, cancel=task.cancel_token, cache=self._current_cache())
+        task.signals.progress.connect(self._upload_progressed)
+        task.signals.succeeded.connect(self._upload_succeeded)
+        task.signals.failed.connect(self._upload_failed)
+        self.upload_task = task
+
+        self.upload_progress = QtWidgets.QProgressDialog(
+            f'Uploading {os.path.basename(self.selected_file_path)}...', 'Cancel', 0, 100, self
+        )
+        self.upload_progress.setWindowModality(QtCore.Qt.WindowModal)
+        self.upload_progress.setAutoClose(False)
+        self.upload_progress.setAutoReset(False)
+        self.upload_progress.canceled.connect(task.cancel_token.cancel)
+        self.upload_progress.show()
+        self._start(task)
 
     def fetch_history(self):
+        if self.history_task is not None:
+            return
         try:
-            response = requests.get(self._url('history/'), auth=self._auth(), timeout=30)
-            response.raise_for_status()
-            self.datasets = response.json()
-            self._populate_table()
-            if self.datasets:
-                self._update_summary(self.datasets[0])
-            else:
-                self._update_summary(None)
-        except Exception as exc:  # pragma: no cover - user feedback
+            self._configure_api()
+        except ValueError as exc:
             self._show_message(f'Unable to fetch history: {exc}')
+            return
+        task = ApiTask(self.api.sync_history, self._current_cache())
+        task.signals.succeeded.connect(self._history_loaded)
+        task.signals.failed.connect(self._history_failed)
+        self.history_task = task
+        self.statusBar().showMessage('Refreshing history...')
+        self._start(task)
 
     def open_selected_report(self):
         row = self.history_table.currentRow()
         if row < 0:
             return
         dataset = self.datasets[row]
-        pdf_path = dataset.get('summary_pdf')
-        if not pdf_path:
+        if not dataset.get('summary_pdf'):
             self._show_message('Selected dataset has no PDF yet.')
             return
-        full_url = self._root_url() + pdf_path
-        QtGui.QDesktopServices.openUrl(QtCore.QUrl(full_url))
+        cached = self._current_cache().cached_report(dataset['id'])
+        if cached is not None:
+            self._open_local_file(cached)
+            return
+        try:
+            self._configure_api()
+        except ValueError as exc:
+            self._show_message(str(exc))
+            return
+        task = ApiTask(self.api.download_report, dataset['id'], self._current_cache())
+        task.signals.succeeded.connect(self._open_local_file)
+        task.signals.failed.connect(lambda exc: self._show_message(f'Unable to download report: {exc}'))
+        self.statusBar().showMessage('Downloading report...')
+        self._start(task)
 
     # Helpers
     def _populate_table(self):
@@ -202,13 +276,18 @@ class MainWindow(QtWidgets.QMainWindow):
                 self._format_metric(dataset.get('avg_flowrate')),
                 self._format_metric(dataset.get('avg_pressure')),
                 self._format_metric(dataset.get('avg_temperature')),
-                'Available' if dataset.get('summary_pdf') else 'Pending',
+                self._format_report_status(dataset),
             ]
             for col, value in enumerate(values):
                 item = QtWidgets.QTableWidgetItem(value)
                 self.history_table.setItem(row, col, item)
         self.open_report_button.setEnabled(bool(self.datasets))
 
+    def _format_report_status(self, dataset: Dict[str, Any]):
+        if dataset.get('summary_pdf'):
+            return 'Available'
+        return 'Failed' if dataset.get('report_status') == 'failed' else 'Pending'
+
     def _format_metric(self, value):
         return '—' if value is None else f'{value}'
 
@@ -228,16 +307,6 @@ class MainWindow(QtWidgets.QMainWindow):
         row = self.history_table.currentRow()
         self.open_report_button.setEnabled(row >= 0 and bool(self.datasets[row].get('summary_pdf')))
 
-    def _url(self, path: str):
-        base = self.api_input.text().rstrip('/')
-        return f"{base}/{path}"
-
-    def _root_url(self):
-        base = self.api_input.text().rstrip('/')
-        if base.endswith('/api'):
-            base = base[:-4]
-        return base
-
     def _auth(self):
         username = self.username_input.text().strip()
         password = self.password_input.text().strip()
@@ -245,6 +314,86 @@ class MainWindow(QtWidgets.QMainWindow):
             raise ValueError('Username and password are required')
         return (username, password)
 
+    def _current_cache(self) -> LocalCache:
+        base = self.api_input.text().rstrip('/')
+        if self.cache is None or self.cache_base != base:
+            self.cache = LocalCache(base)
+            self.cache_base = base
+        return self.cache
+
+    def _show_cached_history(self):
+        datasets = self._current_cache().datasets()
+        if datasets:
+            self._show_datasets(datasets)
+            self.statusBar().showMessage('Showing cached history. Click "Refresh" to sync.')
+
+    def _show_datasets(self, datasets: List[Dict[str, Any]]):
+        self.datasets = datasets
+        self._populate_table()
+        if self.datasets:
+            self._update_summary(self.datasets[0])
+        else:
+            self._update_summary(None)
+
+    def _configure_api(self):
+        username, password = self._auth()
+        self.api.configure(self.api_input.text(), username, password)
+
+    def _start(self, task: ApiTask):
+        self.tasks.add(task)
+        task.signals.succeeded.connect(lambda _result: self.tasks.discard(task))
+        task.signals.failed.connect(lambda _exc: self.tasks.discard(task))
+        self.thread_pool.start(task)
+
+    # Task results (run on the GUI thread)
+    def _history_loaded(self, result):
+        self.history_task = None
+        datasets, changed = result
+        if not changed:
+            self.statusBar().showMessage('History is up to date.', 3000)
+            return
+        self.statusBar().showMessage('History updated.', 3000)
+        self._show_datasets(datasets)
+
+    def _history_failed(self, exc: Exception):
+        self.history_task = None
+        if self.datasets:
+            self.statusBar().showMessage(f'Offline, showing cached history ({exc}).', 8000)
+            return
+        self._show_message(f'Unable to fetch history: {exc}')
+
+    def _open_local_file(self, path):
+        self.statusBar().clearMessage()
+        QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(str(path)))
+
+    def _upload_progressed(self, done: int, total: int):
+        if self.upload_progress is not None and total:
+            self.upload_progress.setValue(int(done * 100 / total))
+
+    def _finish_upload(self):
+        self.upload_task = None
+        if self.upload_progress is not None:
+            self.upload_progress.close()
+            self.upload_progress = None
+
+    def _upload_succeeded(self, _payload):
+        self._finish_upload()
+        self._show_message('Upload successful. History updated.', success=True)
+        self.fetch_history()
+
+    def _upload_failed(self, exc: Exception):
+        cancelled = self.upload_task is not None and self.upload_task.cancel_token.cancelled
+        self._finish_upload()
+        if cancelled or isinstance(exc, UploadCancelled):
+            self.statusBar().showMessage('Upload cancelled.', 5000)
+            return
+        self._show_message(f'Upload failed: {exc}')
+
+    def closeEvent(self, event):
+        if self.upload_task is not None:
+            self.upload_task.cancel_token.cancel()
+        super().closeEvent(event)
+
     def _show_message(self, text: str, success: bool = False):
         self.statusBar().showMessage(text, 5000)
         if success: